@@ -0,0 +1,175 @@
+"""Microbenchmark: batched NurbsCurve evaluation vs. the per-point NURBS Book evaluation.
+
+    python -m dwgimport.bench_nurbs [--splines N] [--samples S] [--tolerance T] [--repeat R]
+
+Builds random cubic splines (half of them rational, a quarter closed/unclamped) and samples
+each at S + 1 evenly spaced parameters (default: the parser's rule, 4 per control point within
+16..256), then with the parser's adaptive sampling to a chord tolerance T. Reports the time
+per spline for both evaluators and the largest distance between their points.
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import time
+from typing import List
+
+from dwgimport.dxf import _adaptive_points
+from dwgimport.nurbs import NurbsCurve
+
+
+def _reference_curve(p: int, ctrl, U: List[float], W):
+    # The evaluation _flush_spline used before NurbsCurve: Algorithms A2.1/A2.2 of The NURBS
+    # Book, one span search and one basis-function pass per sample.
+    n = len(ctrl) - 1
+    m = len(U) - 1
+
+    def find_span(u: float) -> int:
+        if u >= U[n + 1]:
+            return n
+        if u <= U[p]:
+            return p
+        low = p
+        high = n + 1
+        mid = (low + high) // 2
+        while u < U[mid] or u >= U[mid + 1]:
+            if u < U[mid]:
+                high = mid
+            else:
+                low = mid
+            mid = (low + high) // 2
+        return mid
+
+    def basis_funs(span: int, u: float) -> List[float]:
+        N = [0.0] * (p + 1)
+        left = [0.0] * (p + 1)
+        right = [0.0] * (p + 1)
+        N[0] = 1.0
+        for j in range(1, p + 1):
+            left[j] = u - U[span + 1 - j]
+            right[j] = U[span + j] - u
+            saved = 0.0
+            for r in range(0, j):
+                denom = right[r + 1] + left[j - r]
+                if denom == 0.0:
+                    temp = 0.0
+                else:
+                    temp = N[r] / denom
+                N[r] = saved + right[r + 1] * temp
+                saved = left[j - r] * temp
+            N[j] = saved
+        return N
+
+    def curve_point(u: float):
+        span = find_span(u)
+        N = basis_funs(span, u)
+        cx = 0.0
+        cy = 0.0
+        cw = 0.0
+        for j in range(0, p + 1):
+            i = span - p + j
+            bx, by = ctrl[i]
+            wj = W[i] if W is not None else 1.0
+            Nj = N[j] * wj
+            cx += Nj * bx
+            cy += Nj * by
+            cw += Nj
+        if cw == 0.0:
+            return None
+        return (cx / cw, cy / cw)
+
+    return curve_point, U[p], U[m - p]
+
+
+def _reference_points(p: int, ctrl, U: List[float], W, count: int):
+    curve_point, u0, u1 = _reference_curve(p, ctrl, U, W)
+    return [curve_point(u0 + (u1 - u0) * (float(si) / float(count))) for si in range(count + 1)]
+
+
+def _knot_params(p: int, U: List[float]) -> List[float]:
+    # Initial parameters of the parser's adaptive sampling: two per knot span.
+    m = len(U) - 1
+    u0, u1 = U[p], U[m - p]
+    ts = [u0]
+    for u in sorted(set(U[p:m - p + 1])):
+        if u0 < u <= u1 and u > ts[-1]:
+            ts.append((ts[-1] + u) * 0.5)
+            ts.append(u)
+    return ts
+
+
+def _random_spline(rng: random.Random, degree: int = 3):
+    n_ctrl = rng.randint(degree + 1, 24)
+    ctrl = [(rng.uniform(0, 5000), rng.uniform(0, 5000)) for _ in range(n_ctrl)]
+    W = [rng.uniform(0.3, 3.0) for _ in range(n_ctrl)] if rng.random() < 0.5 else None
+    inner = n_ctrl - degree - 1
+    if rng.random() < 0.25:
+        # Unclamped uniform knots, as written for closed (periodic) splines.
+        U = [float(i) for i in range(n_ctrl + degree + 1)]
+    else:
+        mids = sorted(rng.uniform(0, 1) for _ in range(inner))
+        U = [0.0] * (degree + 1) + mids + [1.0] * (degree + 1)
+    return degree, ctrl, U, W
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--splines', type=int, default=2000)
+    ap.add_argument('--samples', type=int, default=0)
+    ap.add_argument('--tolerance', type=float, default=10.0)
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--seed', type=int, default=1)
+    args = ap.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    splines = []
+    for _ in range(args.splines):
+        p, ctrl, U, W = _random_spline(rng)
+        samples = args.samples if args.samples > 0 else max(16, min(256, len(ctrl) * 4))
+        splines.append((p, ctrl, U, W, samples))
+
+    def _time(fn) -> float:
+        best = math.inf
+        for _ in range(args.repeat):
+            t = time.perf_counter()
+            for sp in splines:
+                fn(sp)
+            best = min(best, time.perf_counter() - t)
+        return best
+
+    t_ref = _time(lambda sp: _reference_points(sp[0], sp[1], sp[2], sp[3], sp[4]))
+    t_new = _time(lambda sp: NurbsCurve(sp[0], sp[1], sp[2], sp[3]).linspace(sp[4]))
+
+    max_err = 0.0
+    for sp in splines:
+        a = _reference_points(sp[0], sp[1], sp[2], sp[3], sp[4])
+        b = NurbsCurve(sp[0], sp[1], sp[2], sp[3]).linspace(sp[4])
+        for pa, pb in zip(a, b):
+            if pa is not None and pb is not None:
+                max_err = max(max_err, math.hypot(pa[0] - pb[0], pa[1] - pb[1]))
+
+    def _adaptive_ref(sp):
+        curve_point = _reference_curve(sp[0], sp[1], sp[2], sp[3])[0]
+        return _adaptive_points(curve_point, _knot_params(sp[0], sp[2]), args.tolerance, 1025)
+
+    def _adaptive_new(sp):
+        curve = NurbsCurve(sp[0], sp[1], sp[2], sp[3])
+        return _adaptive_points(curve.point, _knot_params(sp[0], sp[2]), args.tolerance, 1025)
+
+    t_ref_tol = _time(_adaptive_ref)
+    t_new_tol = _time(_adaptive_new)
+    n_tol = sum(len(_adaptive_new(sp)) for sp in splines)
+
+    per = 1e6 / len(splines)
+    print('%d splines, %.1f samples each (best of %d)' % (len(splines), sum(sp[4] + 1 for sp in splines) / len(splines), args.repeat))
+    print('  per-point A2.1/A2.2: %8.1f us/spline' % (t_ref * per))
+    print('  NurbsCurve batched:  %8.1f us/spline  (%.1fx)' % (t_new * per, t_ref / t_new if t_new else 0.0))
+    print('  max point difference: %.3g drawing units' % max_err)
+    print('adaptive to %g drawing units, %.1f points each' % (args.tolerance, n_tol / len(splines)))
+    print('  per-point A2.1/A2.2: %8.1f us/spline' % (t_ref_tol * per))
+    print('  NurbsCurve:          %8.1f us/spline  (%.1fx)' % (t_new_tol * per, t_ref_tol / t_new_tol if t_new_tol else 0.0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+"""Spatial crop for the DWG -> Plan2D import.
+
+A `ClipRegion` is a rectangle or polygon in drawing units. The DXF parser uses it to skip
+entities and INSERTs whose bounds lie outside the region before they are tessellated or
+expanded, and to cut the segments that cross its boundary.
+"""
+from __future__ import annotations
+
+from typing import List, Optional, Tuple
+
+
+def parse_clip(value) -> Optional['ClipRegion']:
+    """ClipRegion from a request value, or None when no clip is given.
+
+    Accepts [xmin, ymin, xmax, ymax], "xmin,ymin,xmax,ymax", a polygon [[x, y], ...] or
+    { "rect": [...] } / { "polygon": [...] }. Raises ValueError for anything else.
+    """
+    if value is None or value == '' or value == []:
+        return None
+    if isinstance(value, dict):
+        if value.get('polygon') is not None:
+            return parse_clip([list(p) for p in value.get('polygon')])
+        if value.get('rect') is not None:
+            return parse_clip(value.get('rect'))
+        raise ValueError('clip object needs "rect" or "polygon"')
+    if isinstance(value, str):
+        value = [v for v in value.split(',') if v.strip()]
+    if not isinstance(value, (list, tuple)):
+        raise ValueError('clip must be a rectangle or a polygon')
+    if len(value) == 4 and not any(isinstance(v, (list, tuple, dict)) for v in value):
+        xmin, ymin, xmax, ymax = (float(v) for v in value)
+        return ClipRegion(rect=(xmin, ymin, xmax, ymax))
+    pts = []
+    for p in value:
+        if not isinstance(p, (list, tuple)) or len(p) < 2:
+            raise ValueError('clip polygon points must be [x, y]')
+        pts.append((float(p[0]), float(p[1])))
+    return ClipRegion(polygon=pts)
+
+
+def _rect_span(x0: float, y0: float, x1: float, y1: float, xmin: float, ymin: float, xmax: float, ymax: float):
+    # Liang-Barsky: parameter range (t0, t1) of the segment inside the rectangle, or None.
+    dx = x1 - x0
+    dy = y1 - y0
+    t0, t1 = 0.0, 1.0
+    for p, q in ((-dx, x0 - xmin), (dx, xmax - x0), (-dy, y0 - ymin), (dy, ymax - y0)):
+        if p == 0.0:
+            if q < 0.0:
+                return None
+            continue
+        t = q / p
+        if p < 0.0:
+            if t > t1:
+                return None
+            if t > t0:
+                t0 = t
+        else:
+            if t < t0:
+                return None
+            if t < t1:
+                t1 = t
+    return (t0, t1)
+
+
+class ClipRegion:
+    """Axis-aligned rectangle or simple polygon (even-odd rule) to crop the import to."""
+
+    __slots__ = ('xmin', 'ymin', 'xmax', 'ymax', 'polygon', '_edges')
+
+    def __init__(self, rect: Optional[tuple] = None, polygon: Optional[List[tuple]] = None):
+        if polygon is not None:
+            pts = [(float(x), float(y)) for (x, y) in polygon]
+            if len(pts) > 1 and pts[0] == pts[-1]:
+                pts.pop()
+            if len(pts) < 3:
+                raise ValueError('clip polygon needs at least 3 points')
+            xs = [p[0] for p in pts]
+            ys = [p[1] for p in pts]
+            rect = (min(xs), min(ys), max(xs), max(ys))
+            self.polygon = pts
+            self._edges = [(pts[i - 1][0], pts[i - 1][1], pts[i][0], pts[i][1]) for i in range(len(pts))]
+        else:
+            self.polygon = None
+            self._edges = None
+        if rect is None:
+            raise ValueError('clip needs a rectangle or a polygon')
+        x0, y0, x1, y1 = (float(v) for v in rect)
+        if not all(v - v == 0.0 for v in (x0, y0, x1, y1)):
+            raise ValueError('clip coordinates must be finite')
+        self.xmin, self.xmax = min(x0, x1), max(x0, x1)
+        self.ymin, self.ymax = min(y0, y1), max(y0, y1)
+        if self.xmin == self.xmax or self.ymin == self.ymax:
+            raise ValueError('clip region is empty')
+
+    def __getstate__(self):
+        return (self.xmin, self.ymin, self.xmax, self.ymax, self.polygon)
+
+    def __setstate__(self, state):
+        xmin, ymin, xmax, ymax, polygon = state
+        self.__init__(rect=(xmin, ymin, xmax, ymax), polygon=polygon)
+
+    def describe(self) -> dict:
+        out = { 'bounds': [self.xmin, self.ymin, self.xmax, self.ymax] }
+        if self.polygon is not None:
+            out['polygon'] = [list(p) for p in self.polygon]
+        return out
+
+    def outside(self, xmin: float, ymin: float, xmax: float, ymax: float) -> bool:
+        # True when a bounding box cannot touch the region (checked against the region's bounds).
+        return xmax < self.xmin or xmin > self.xmax or ymax < self.ymin or ymin > self.ymax
+
+    def covers(self, xmin: float, ymin: float, xmax: float, ymax: float) -> bool:
+        # True when a bounding box lies entirely inside the region, so nothing in it needs cutting.
+        if not (xmin >= self.xmin and xmax <= self.xmax and ymin >= self.ymin and ymax <= self.ymax):
+            return False
+        if self.polygon is None:
+            return True
+        # Inside when one corner is inside and no polygon edge passes through the box.
+        if not self._inside(xmin, ymin):
+            return False
+        return all(_rect_span(ax, ay, bx, by, xmin, ymin, xmax, ymax) is None for (ax, ay, bx, by) in self._edges)
+
+    def _inside(self, x: float, y: float) -> bool:
+        inside = False
+        for (ax, ay, bx, by) in self._edges:
+            if (ay > y) != (by > y) and x < ax + (y - ay) * (bx - ax) / (by - ay):
+                inside = not inside
+        return inside
+
+    def clip_segment(self, x0: float, y0: float, x1: float, y1: float) -> List[Tuple[float, float, float, float]]:
+        """Parts of the segment inside the region (empty when it lies outside)."""
+        xmin, ymin, xmax, ymax = self.xmin, self.ymin, self.xmax, self.ymax
+        if self.polygon is None and xmin <= x0 <= xmax and xmin <= x1 <= xmax and ymin <= y0 <= ymax and ymin <= y1 <= ymax:
+            return [(x0, y0, x1, y1)]
+        span = _rect_span(x0, y0, x1, y1, xmin, ymin, xmax, ymax)
+        if span is None:
+            return []
+        t0, t1 = span
+        dx = x1 - x0
+        dy = y1 - y0
+        if self.polygon is None:
+            return [(
+                x0 if t0 == 0.0 else x0 + dx * t0,
+                y0 if t0 == 0.0 else y0 + dy * t0,
+                x1 if t1 == 1.0 else x0 + dx * t1,
+                y1 if t1 == 1.0 else y0 + dy * t1,
+            )]
+
+        # Polygon: split at every edge crossing and keep the pieces whose midpoint is inside.
+        ts = [t0, t1]
+        for (ax, ay, bx, by) in self._edges:
+            ex = bx - ax
+            ey = by - ay
+            den = dx * ey - dy * ex
+            if den == 0.0:
+                continue
+            t = ((ax - x0) * ey - (ay - y0) * ex) / den
+            u = ((ax - x0) * dy - (ay - y0) * dx) / den
+            if t0 < t < t1 and 0.0 <= u <= 1.0:
+                ts.append(t)
+        ts.sort()
+        out = []
+        start = None
+        for i in range(len(ts) - 1):
+            a, b = ts[i], ts[i + 1]
+            if b <= a:
+                continue
+            m = (a + b) * 0.5
+            if self._inside(x0 + dx * m, y0 + dy * m):
+                if start is None:
+                    start = a
+                end = b
+            elif start is not None:
+                out.append((start, end))
+                start = None
+        if start is not None:
+            out.append((start, end))
+        # Keep the exact input endpoints where a piece starts or ends at one.
+        return [(
+            x0 if a == 0.0 else x0 + dx * a,
+            y0 if a == 0.0 else y0 + dy * a,
+            x1 if b == 1.0 else x0 + dx * b,
+            y1 if b == 1.0 else y0 + dy * b,
+        ) for (a, b) in out]
+
+    def clip_columns(self, xs0, ys0, xs1, ys1):
+        """Clip coordinate columns. Returns (x0, y0, x1, y1, src, cut) where src[i] is the
+        input row of output row i and cut counts the rows that were dropped or shortened."""
+        X0, Y0, X1, Y1, src = [], [], [], [], []
+        cut = 0
+        clip_segment = self.clip_segment
+        for i, (x0, y0, x1, y1) in enumerate(zip(xs0, ys0, xs1, ys1)):
+            pieces = clip_segment(x0, y0, x1, y1)
+            if len(pieces) != 1 or pieces[0] != (x0, y0, x1, y1):
+                cut += 1
+            for (a, b, c, d) in pieces:
+                X0.append(a)
+                Y0.append(b)
+                X1.append(c)
+                Y1.append(d)
+                src.append(i)
+        return X0, Y0, X1, Y1, src, cut
@@ -0,0 +1,2394 @@
+"""DXF parsing for the DWG -> Plan2D import (`POST /api/dwg/to-plan2d`).
+
+The server converts DWG uploads to DXF with an external converter and hands the file to
+`dxf_to_segments`, which flattens the drawing into 2D line segments: LINE, (LW)POLYLINE
+with bulges, ARC, CIRCLE, ELLIPSE and SPLINE are tessellated and INSERTs are expanded from
+their BLOCK definitions. ASCII and binary DXF are both supported.
+`dxf_to_block_instances` instead keeps each INSERT as a transform of its block's geometry.
+"""
+from __future__ import annotations
+
+import math
+import mmap
+import os
+import time
+from array import array
+from itertools import repeat
+from typing import Dict, List, Optional, Tuple
+
+from dwgimport.nurbs import NurbsCurve
+from dwgimport.segments import ACI_NONE, SegmentStore, aci_code
+
+
+# Group codes the entity state machine in _parse_pairs actually inspects. Every other
+# pair is dropped inside the tokenizer without decoding its value.
+_DXF_USED_CODES = frozenset((0, 2, 8, 10, 11, 20, 21, 40, 41, 42, 50, 51, 62, 67, 70, 71, 410, 420))
+# Codes whose values are compared as text; all other used codes are parsed as numbers,
+# and float()/int() accept the raw ASCII bytes directly.
+_DXF_STR_CODES = frozenset((0, 2, 8, 410))
+_DXF_READ_BLOCK = 1 << 23
+
+
+def _iter_dxf_pairs(fp, start: int = 0, end=None):
+    # ASCII DXF tokenizer. Reads the file in large blocks, splits each block into lines in
+    # one call and pairs them with zip(); code lines are mapped to ints through a table
+    # keyed by the raw line (so ' 10', '10' and '10\r' are each converted once).
+    # Yields (code:int, value) where value is str for _DXF_STR_CODES and raw bytes otherwise.
+    # `start`/`end` restrict reading to a byte range (see _dxf_section_index).
+    code_table = {}
+    used = _DXF_USED_CODES
+    str_codes = _DXF_STR_CODES
+
+    def _code_of(line: bytes):
+        try:
+            c = int(line)
+        except Exception:
+            c = -1
+        if c not in used:
+            c = -1
+        code_table[line] = c
+        return c
+
+    pending = None  # code line whose value starts the next block
+    tail = b''
+    fp.seek(start)
+    remaining = -1 if end is None else max(0, end - start)
+    while remaining != 0:
+        block = fp.read(_DXF_READ_BLOCK if remaining < 0 else min(_DXF_READ_BLOCK, remaining))
+        if not block:
+            break
+        if remaining > 0:
+            remaining -= len(block)
+        lines = (tail + block).split(b'\n')
+        tail = lines.pop()
+        start = 0
+        if pending is not None and lines:
+            c = code_table.get(pending)
+            if c is None:
+                c = _code_of(pending)
+            if c >= 0:
+                v = lines[0]
+                yield c, (v.decode('utf-8', errors='ignore').strip() if c in str_codes else v)
+            pending = None
+            start = 1
+        end = start + ((len(lines) - start) & ~1)
+        if end < len(lines):
+            pending = lines[end]
+        for cl, v in zip(lines[start:end:2], lines[start + 1:end:2]):
+            c = code_table.get(cl)
+            if c is None:
+                c = _code_of(cl)
+            if c < 0:
+                continue
+            if c in str_codes:
+                yield c, v.decode('utf-8', errors='ignore').strip()
+            else:
+                yield c, v
+    # A final value line without a trailing newline still completes its pair.
+    if pending is not None and tail:
+        c = code_table.get(pending)
+        if c is None:
+            c = _code_of(pending)
+        if c >= 0:
+            yield c, (tail.decode('utf-8', errors='ignore').strip() if c in str_codes else tail)
+
+
+# Binary DXF (e.g. ODA "DXB" output) starts with this 22-byte sentinel.
+_DXF_BINARY_SENTINEL = b'AutoCAD Binary DXF\r\n\x1a\x00'
+
+
+def _dxf_binary_value_kind(code: int) -> str:
+    # Value encoding per group code range (DXF reference, "Binary DXF").
+    # d=double, h=int16, i=int32, q=int64, b=bool/byte, x=binary chunk, s=NUL-terminated string
+    if 10 <= code <= 59 or 110 <= code <= 149 or 210 <= code <= 239 or 460 <= code <= 469 or 1010 <= code <= 1059:
+        return 'd'
+    if 60 <= code <= 79 or 170 <= code <= 179 or 270 <= code <= 289 or 370 <= code <= 389 or 400 <= code <= 409 or 1060 <= code <= 1070:
+        return 'h'
+    if 90 <= code <= 99 or 420 <= code <= 429 or 440 <= code <= 459 or code == 1071:
+        return 'i'
+    if 160 <= code <= 169:
+        return 'q'
+    if 290 <= code <= 299:
+        return 'b'
+    if 310 <= code <= 319 or code == 1004:
+        return 'x'
+    return 's'
+
+
+# Value width in bytes per kind; strings (-1) and binary chunks (-2) are variable length.
+_DXF_BINARY_WIDTH = { 'd': 8, 'h': 2, 'i': 4, 'q': 8, 'b': 1, 's': -1, 'x': -2 }
+
+
+def _iter_dxf_binary_pairs(buf, pos: int = 0, end=None):
+    # Yields (code:int, value) with numbers already decoded (float/int) and strings as str,
+    # so the entity state machine can consume ASCII and binary DXF alike. `buf` may be an
+    # mmap; values of codes outside _DXF_USED_CODES are skipped without being decoded.
+    import struct
+    n = len(buf) if end is None else min(len(buf), end)
+    # R13+ writes 2-byte group codes; R12 writes 1 byte with 255 as an escape for a 2-byte code.
+    # Ranges always start at a code 0 record, which is 00 00 only in the 2-byte form.
+    wide = buf[pos:pos + 2] == b'\x00\x00'
+    used = _DXF_USED_CODES
+    widths = [_DXF_BINARY_WIDTH[_dxf_binary_value_kind(c)] for c in range(1072)]
+    find = buf.find
+    unpack_h = struct.Struct('<h').unpack_from
+    unpack_i = struct.Struct('<i').unpack_from
+    unpack_d = struct.Struct('<d').unpack_from
+    while pos < n:
+        if pos + 2 > n:
+            return
+        if wide:
+            code = buf[pos] | (buf[pos + 1] << 8)
+            pos += 2
+        else:
+            code = buf[pos]
+            pos += 1
+            if code == 255:
+                code = buf[pos] | (buf[pos + 1] << 8)
+                pos += 2
+        w = widths[code] if code < 1072 else -1
+        if w == -1:
+            end = find(b'\x00', pos)
+            if end < 0:
+                return
+            if code in used:
+                yield code, buf[pos:end].decode('utf-8', errors='ignore').strip()
+            pos = end + 1
+            continue
+        if w == -2:
+            if pos >= n:
+                return
+            pos += 1 + buf[pos]
+            continue
+        if pos + w > n:
+            # Truncated file: stop at the last complete record.
+            return
+        if code in used:
+            if w == 8:
+                yield code, unpack_d(buf, pos)[0]
+            elif w == 2:
+                yield code, unpack_h(buf, pos)[0]
+            elif w == 4:
+                yield code, unpack_i(buf, pos)[0]
+            elif w == 1:
+                yield code, buf[pos]
+        pos += w
+
+
+# Sections the entity parser needs; HEADER, CLASSES, OBJECTS, THUMBNAILIMAGE etc. are skipped.
+_DXF_PARSED_SECTIONS = ('TABLES', 'BLOCKS', 'ENTITIES')
+
+
+def _dxf_section_index(buf, is_binary: bool):
+    # Fast pre-scan for SECTION/ENDSEC markers using plain substring search (no tokenizing).
+    # Returns [(name, start, end)] byte ranges covering "0 SECTION ... 0 ENDSEC", or None when
+    # the layout is not recognised and the caller should tokenize the whole file.
+    out = []
+    n = len(buf)
+    if is_binary:
+        # Only R13+ (2-byte group codes). R12 binary DXF has no CLASSES/OBJECTS to skip.
+        head = b'\x00\x00SECTION\x00\x02\x00'
+        tail = b'\x00\x00ENDSEC\x00'
+        pos = len(_DXF_BINARY_SENTINEL)
+        if buf[pos:pos + len(head)] != head:
+            return None
+        while True:
+            i = buf.find(head, pos)
+            if i < 0:
+                break
+            name_end = buf.find(b'\x00', i + len(head))
+            if name_end < 0:
+                return None
+            name = bytes(buf[i + len(head):name_end]).decode('ascii', errors='ignore').strip().upper()
+            j = buf.find(tail, name_end + 1)
+            if j < 0:
+                return None
+            end = j + len(tail)
+            out.append((name, i, end))
+            pos = end
+        return out or None
+
+    def _line_at(i: int):
+        # (line_start, line_end_incl_newline, stripped_line) for the line containing offset i
+        ls = buf.rfind(b'\n', 0, i) + 1
+        le = buf.find(b'\n', i)
+        le = n if le < 0 else le + 1
+        return ls, le, bytes(buf[ls:le]).strip()
+
+    def _marker(word: bytes, pos: int):
+        # Next "0 / <word>" pair at or after pos -> (offset of the "0" line, end of the word line)
+        while True:
+            i = buf.find(word, pos)
+            if i < 0:
+                return None
+            ls, le, line = _line_at(i)
+            pos = i + len(word)
+            if line != word or ls == 0:
+                continue
+            ps, _pe, prev = _line_at(ls - 1)
+            if prev == b'0':
+                return ps, le
+
+    pos = 0
+    while True:
+        hit = _marker(b'SECTION', pos)
+        if hit is None:
+            break
+        start, after = hit
+        # Next two lines: group code 2 and the section name.
+        cs, ce, code_line = _line_at(after)
+        if code_line != b'2' or ce >= n:
+            return None
+        _ns, ne, name = _line_at(ce)
+        done = _marker(b'ENDSEC', ne)
+        if done is None:
+            return None
+        out.append((name.decode('ascii', errors='ignore').upper(), start, done[1]))
+        pos = done[1]
+    return out or None
+
+
+def _parse_float(s):
+    # Accepts ASCII DXF text as well as already-decoded binary DXF numbers.
+    try:
+        return float(s)
+    except Exception:
+        return None
+
+
+def _parse_int(s):
+    try:
+        return int(s)
+    except Exception:
+        return None
+
+
+# Upper bound on segments per curve when tessellating to a tolerance.
+_CURVE_TOL_MAX_SEGS = 1024
+
+
+def _tol_segments(radius: float, sweep: float, tol: float) -> int:
+    # Segments for a circular sweep so that no chord's sagitta, r * (1 - cos(step / 2)),
+    # exceeds tol. Steps are capped at a quarter turn.
+    if radius <= 0.0 or not (tol > 0.0):
+        return 1
+    step = math.pi / 2.0
+    if tol < radius:
+        step = min(step, 2.0 * math.acos(1.0 - tol / radius))
+    n = int(math.ceil(abs(sweep) / step - 1e-9))
+    return max(1, min(_CURVE_TOL_MAX_SEGS, n))
+
+
+# Vertex tables (cos, sin of k * sweep / n for k = 0..n) keyed by (n, sweep). Circles with the
+# same segment count and arcs with the same sweep (door swings, fillets) share one table.
+_ANGLE_TABLES: Dict[Tuple[int, float], Tuple[List[float], List[float]]] = {}
+_ANGLE_TABLES_MAX = 4096
+
+
+def _angle_table(n: int, sweep: float) -> Tuple[List[float], List[float]]:
+    key = (n, sweep)
+    tab = _ANGLE_TABLES.get(key)
+    if tab is None:
+        if len(_ANGLE_TABLES) >= _ANGLE_TABLES_MAX:
+            _ANGLE_TABLES.clear()
+        step = sweep / float(n)
+        tab = _ANGLE_TABLES[key] = ([math.cos(step * i) for i in range(n + 1)], [math.sin(step * i) for i in range(n + 1)])
+    return tab
+
+
+def _adaptive_points(point_at, ts: List[float], tol: float, max_pts: int) -> list:
+    """Points of a parametric curve with chord deviation below tol, by recursive bisection.
+
+    `ts` are the initial parameters (sorted; e.g. two per knot span so S-shaped pieces are
+    split up front). An interval is bisected while its midpoint or quarter points lie more than
+    tol off the chord. point_at(t) returns (x, y) or None; intervals with an undefined point are
+    kept as is.
+    """
+    def _dev(pa, pb, pt) -> float:
+        dx = pb[0] - pa[0]
+        dy = pb[1] - pa[1]
+        ex = pt[0] - pa[0]
+        ey = pt[1] - pa[1]
+        chord = math.hypot(dx, dy)
+        return abs(dx * ey - dy * ex) / chord if chord > 0.0 else math.hypot(ex, ey)
+
+    pts = [(t, point_at(t)) for t in ts]
+    pts = [(t, pt) for (t, pt) in pts if pt is not None]
+    if len(pts) < 2:
+        return [pt for (_t, pt) in pts]
+    out = [pts[0][1]]
+    budget = max_pts - len(pts)
+    # Intervals are processed left to right; the stack holds the pending right parts.
+    stack = [(pts[i], pts[i + 1], 0) for i in range(len(pts) - 2, -1, -1)]
+    while stack:
+        (ta, pa), (tb, pb), depth = stack.pop()
+        if budget > 0 and depth < 24:
+            tm = (ta + tb) * 0.5
+            pm = point_at(tm)
+            if pm is not None:
+                split = _dev(pa, pb, pm) > tol
+                if not split:
+                    # The midpoint can sit on the chord of an S-shaped piece.
+                    for tq in ((ta + tm) * 0.5, (tm + tb) * 0.5):
+                        pq = point_at(tq)
+                        if pq is not None and _dev(pa, pb, pq) > tol:
+                            split = True
+                            break
+                if split:
+                    budget -= 1
+                    stack.append(((tm, pm), (tb, pb), depth + 1))
+                    stack.append(((ta, pa), (tm, pm), depth + 1))
+                    continue
+        out.append(pb)
+    return out
+
+
+def _aci_to_rgb_int(aci: int) -> int:
+    # Minimal AutoCAD Color Index mapping for common values.
+    # Prefer truecolor (DXF group 420) when present.
+    try:
+        a = int(aci)
+    except Exception:
+        return 0x111111
+    a = abs(a)
+    if a == 1:
+        return 0xFF0000
+    if a == 2:
+        return 0xFFFF00
+    if a == 3:
+        return 0x00FF00
+    if a == 4:
+        return 0x00FFFF
+    if a == 5:
+        return 0x0000FF
+    if a == 6:
+        return 0xFF00FF
+    if a == 7:
+        return 0x111111
+    return 0x111111
+
+
+def _resolve_layer_rgb(layer_rgb: Dict[str, int], layer: Optional[str], aci: Optional[int], rgb: Optional[int]) -> int:
+    # Effective rgb of an entity; 0 marks BYBLOCK, resolved when the block is inserted.
+    if rgb is not None:
+        try:
+            return int(rgb) & 0xFFFFFF
+        except Exception:
+            return 0x111111
+    if aci is not None:
+        try:
+            ai = int(aci)
+            if ai == 256:
+                # BYLAYER; without reading the LAYER table we can't resolve this perfectly.
+                if layer and layer in layer_rgb:
+                    return int(layer_rgb.get(layer) or 0x111111) & 0xFFFFFF
+                return 0x111111
+            if ai == 0:
+                # BYBLOCK (resolve at INSERT time)
+                return 0
+            return _aci_to_rgb_int(ai)
+        except Exception:
+            return 0x111111
+    return 0x111111
+
+
+class _BlockColumns:
+    """Local-space segments of one BLOCK definition stored as coordinate columns.
+
+    INSERT expansion transforms whole columns at once instead of unpacking a tuple per segment.
+    """
+    __slots__ = ('x0', 'y0', 'x1', 'y1', 'rgb', 'layer', 'aci', 'byblock', 'finite', 'resolved')
+
+    def __init__(self, segs=()):
+        # aci is stored as segments.aci_code() values, like SegmentStore.
+        self.x0 = array('d', [s[0] for s in segs])
+        self.y0 = array('d', [s[1] for s in segs])
+        self.x1 = array('d', [s[2] for s in segs])
+        self.y1 = array('d', [s[3] for s in segs])
+        self.rgb = array('I', [s[4] for s in segs])
+        self.layer = [s[5] for s in segs]
+        self.aci = array('h', [aci_code(s[6]) for s in segs])
+        self._finish()
+
+    def _finish(self) -> None:
+        # rgb 0 marks BYBLOCK segments, recolored by the referencing INSERT.
+        self.byblock = 0 in self.rgb
+        total = sum(self.x0) + sum(self.y0) + sum(self.x1) + sum(self.y1)
+        self.finite = (total - total) == 0.0
+        # BYBLOCK override -> (rgb, layer, aci) columns with the override applied.
+        self.resolved: Dict[tuple, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self.x0)
+
+    def head(self, n: int) -> '_BlockColumns':
+        cols = _BlockColumns()
+        cols.x0, cols.y0, cols.x1, cols.y1 = self.x0[:n], self.y0[:n], self.x1[:n], self.y1[:n]
+        cols.rgb, cols.layer, cols.aci = self.rgb[:n], self.layer[:n], self.aci[:n]
+        cols._finish()
+        return cols
+
+    def attrs(self, override: Optional[tuple]):
+        # rgb/layer/aci columns after BYBLOCK resolution with override = (layer, aci, rgb).
+        if override is None or not self.byblock:
+            return self.rgb, self.layer, self.aci
+        cached = self.resolved.get(override)
+        if cached is None:
+            o_layer, o_aci, o_rgb = override
+            o_aci = aci_code(o_aci)
+            rgb = self.rgb
+            cached = (
+                array('I', [o_rgb if r == 0 else r for r in rgb]),
+                [o_layer if r == 0 else v for r, v in zip(rgb, self.layer)],
+                array('h', [o_aci if r == 0 else v for r, v in zip(rgb, self.aci)]),
+            )
+            self.resolved[override] = cached
+        return cached
+
+
+def _insert_transform(ins: dict):
+    # (sx, sy, cos, sin, x, y) of an INSERT, or None without an insertion point.
+    try:
+        ix_raw = ins.get('x')
+        iy_raw = ins.get('y')
+        if ix_raw is None or iy_raw is None:
+            return None
+        ix = float(ix_raw)
+        iy = float(iy_raw)
+        sx = float(ins.get('sx') or 1.0)
+        sy = float(ins.get('sy') or 1.0)
+        if sx == 0.0:
+            sx = 1.0
+        if sy == 0.0:
+            sy = 1.0
+        ang = float(ins.get('rot') or 0.0) * math.pi / 180.0
+        return (sx, sy, math.cos(ang), math.sin(ang), ix, iy)
+    except Exception:
+        try:
+            return (1.0, 1.0, 1.0, 0.0, float(ins.get('x')), float(ins.get('y')))
+        except Exception:
+            return None
+
+
+def _compose_transform(t: tuple, m: Optional[tuple]) -> tuple:
+    # Affine matrix (a, b, c, d, e, f) of INSERT transform t applied after m (None = identity):
+    # x' = a*x + c*y + e, y' = b*x + d*y + f.
+    sx, sy, ca, sa, ix, iy = t
+    a, b, c, d = sx * ca, sx * sa, -sy * sa, sy * ca
+    if m is None:
+        return (a, b, c, d, ix, iy)
+    ma, mb, mc, md, me, mf = m
+    return (
+        a * ma + c * mb,
+        b * ma + d * mb,
+        a * mc + c * md,
+        b * mc + d * md,
+        a * me + c * mf + ix,
+        b * me + d * mf + iy,
+    )
+
+
+def _insert_override(ctx: dict, ins: dict) -> Optional[tuple]:
+    # BYBLOCK attributes an INSERT passes to its block: (layer, aci, rgb), or None without a color.
+    if ins.get('rgb') is None and ins.get('aci') is None:
+        return None
+    layer = ins.get('layer')
+    aci = ins.get('aci')
+    return (layer, aci, int(_resolve_layer_rgb(ctx['layer_rgb'], layer, aci, ins.get('rgb'))) & 0xFFFFFF)
+
+
+def _compose_override(inner: Optional[tuple], outer: Optional[tuple]) -> Optional[tuple]:
+    # An inner INSERT's color wins unless it is itself BYBLOCK (rgb 0).
+    if inner is not None and (inner[2] != 0 or outer is None):
+        return inner
+    return outer
+
+
+def _block_pieces(ctx: dict, name: str, depth: int = 0) -> list:
+    """BLOCK `name` as [(columns, matrix, override)] with nested INSERTs composed (memoized).
+
+    Each piece is the own geometry of some (possibly nested) block; `matrix` maps it into
+    `name`'s local space (None = identity) and `override` is the BYBLOCK color it inherits.
+    """
+    memo = ctx['flattened']
+    if not name:
+        return []
+    if name in memo:
+        return memo[name]
+    if depth > 8:
+        memo[name] = []
+        return []
+    blk = ctx['blocks'].get(name)
+    if not blk:
+        memo[name] = []
+        return []
+
+    meta = ctx['meta']
+    max_segments = ctx['opts']['max_segments']
+    pieces = []
+    base = blk.get('segs') or []
+    total = len(base)
+    if base:
+        pieces.append((_BlockColumns(base), None, None))
+    for ins in (blk.get('inserts') or []):
+        try:
+            child = str(ins.get('name') or '')
+        except Exception:
+            child = ''
+        if not child:
+            continue
+        child_pieces = _block_pieces(ctx, child, depth + 1)
+        if not child_pieces:
+            continue
+        if meta.get('truncated'):
+            break
+        t = _insert_transform(ins)
+        if t is None:
+            continue
+        override = _insert_override(ctx, ins)
+        for (cols, m, inner) in child_pieces:
+            if total >= max_segments:
+                meta['truncated'] = True
+                break
+            if total + len(cols) > max_segments:
+                cols = cols.head(max_segments - total)
+            pieces.append((cols, _compose_transform(t, m), _compose_override(inner, override)))
+            total += len(cols)
+    memo[name] = pieces
+    return pieces
+
+
+def _transform_piece(cols: _BlockColumns, t: tuple, m: Optional[tuple], lo: int, hi: int, step: int):
+    # Transformed coordinate columns of cols[lo:hi:step]. Pieces in the block's own space use the
+    # INSERT's scale/rotate/translate directly; nested pieces apply the composed matrix once.
+    if lo == 0 and hi >= len(cols) and step == 1:
+        X0, Y0, X1, Y1 = cols.x0, cols.y0, cols.x1, cols.y1
+    else:
+        X0, Y0, X1, Y1 = cols.x0[lo:hi:step], cols.y0[lo:hi:step], cols.x1[lo:hi:step], cols.y1[lo:hi:step]
+    if m is None:
+        sx, sy, ca, sa, ix, iy = t
+        return (
+            [x * sx * ca - y * sy * sa + ix for x, y in zip(X0, Y0)],
+            [x * sx * sa + y * sy * ca + iy for x, y in zip(X0, Y0)],
+            [x * sx * ca - y * sy * sa + ix for x, y in zip(X1, Y1)],
+            [x * sx * sa + y * sy * ca + iy for x, y in zip(X1, Y1)],
+        )
+    a, b, c, d, e, f = _compose_transform(t, m)
+    return (
+        [a * x + c * y + e for x, y in zip(X0, Y0)],
+        [b * x + d * y + f for x, y in zip(X0, Y0)],
+        [a * x + c * y + e for x, y in zip(X1, Y1)],
+        [b * x + d * y + f for x, y in zip(X1, Y1)],
+    )
+
+
+def _expand_block_insert(ctx: dict, pieces: list, ins: dict, out: SegmentStore, *, max_out: int, allow_downsample: bool, clip=None) -> bool:
+    """Append the block geometry `pieces` placed by INSERT `ins` to out (at most max_out segments).
+
+    Large blocks are downsampled to about maxInsertSegs segments when allow_downsample is set,
+    and cut to `clip` (clip.ClipRegion) when given.
+    Returns False if the INSERT has no insertion point.
+    """
+    t = _insert_transform(ins)
+    if t is None:
+        return False
+    meta = ctx['meta']
+    max_insert_segs = ctx['opts']['max_insert_segs']
+    total = sum(len(cols) for (cols, _m, _o) in pieces)
+
+    step = 1
+    if allow_downsample and max_insert_segs > 0 and total > max_insert_segs:
+        step = max(1, int((total + max_insert_segs - 1) / max_insert_segs))
+    n_sel = (total + step - 1) // step
+    budget = n_sel
+    if n_sel > max_out:
+        meta['truncated'] = True
+        budget = max_out
+    room = max_out - len(out)
+    override = _insert_override(ctx, ins)
+
+    offset = 0
+    for (cols, m, inner) in pieces:
+        if budget <= 0 or room <= 0:
+            break
+        n = len(cols)
+        lo = (-offset) % step
+        offset += n
+        if lo >= n:
+            continue
+        k = min((n - lo + step - 1) // step, budget)
+        budget -= k
+        hi = lo + (k - 1) * step + 1
+        xs0, ys0, xs1, ys1 = _transform_piece(cols, t, m, lo, hi, step)
+        rgb, layer, aci = cols.attrs(_compose_override(inner, override))
+        layer_ids = out.layer_ids(layer)
+        if lo or hi < n or step != 1:
+            rgb, layer_ids, aci = rgb[lo:hi:step], layer_ids[lo:hi:step], aci[lo:hi:step]
+        if not (cols.finite and all(v - v == 0.0 for v in (t[0], t[1], t[4], t[5]))):
+            keep = [i for i in range(k) if xs0[i] == xs0[i] and ys0[i] == ys0[i] and xs1[i] == xs1[i] and ys1[i] == ys1[i]]
+            xs0, ys0, xs1, ys1 = [xs0[i] for i in keep], [ys0[i] for i in keep], [xs1[i] for i in keep], [ys1[i] for i in keep]
+            rgb, layer_ids, aci = [rgb[i] for i in keep], [layer_ids[i] for i in keep], [aci[i] for i in keep]
+        if clip is not None:
+            xs0, ys0, xs1, ys1, src, cut = clip.clip_columns(xs0, ys0, xs1, ys1)
+            rgb, layer_ids, aci = [rgb[i] for i in src], [layer_ids[i] for i in src], [aci[i] for i in src]
+            meta['clipCut'] += cut
+        if len(xs0) > room:
+            xs0, ys0, xs1, ys1 = xs0[:room], ys0[:room], xs1[:room], ys1[:room]
+            rgb, layer_ids, aci = rgb[:room], layer_ids[:room], aci[:room]
+            meta['truncated'] = True
+        out.extend_columns(xs0, ys0, xs1, ys1, rgb, layer_ids, aci)
+        room -= len(xs0)
+    if budget > 0 and room <= 0:
+        meta['truncated'] = True
+    return True
+
+
+def _insert_bounds(ctx: dict, name: str, ins: dict) -> Optional[tuple]:
+    # (xmin, ymin, xmax, ymax) of BLOCK `name` placed by INSERT `ins` (a box around the
+    # transformed local bounds), or None when it is unknown or not finite.
+    memo = ctx['block_bounds']
+    if name in memo:
+        local = memo[name]
+    else:
+        local = None
+        for (cols, m, _inner) in _block_pieces(ctx, name):
+            if not len(cols) or not cols.finite:
+                if len(cols):
+                    local = None
+                    break
+                continue
+            xs = (min(min(cols.x0), min(cols.x1)), max(max(cols.x0), max(cols.x1)))
+            ys = (min(min(cols.y0), min(cols.y1)), max(max(cols.y0), max(cols.y1)))
+            corners = [(x, y) for x in xs for y in ys]
+            if m is not None:
+                a, b, c, d, e, f = m
+                corners = [(a * x + c * y + e, b * x + d * y + f) for (x, y) in corners]
+            bx = [x for (x, _y) in corners]
+            by = [y for (_x, y) in corners]
+            box = (min(bx), min(by), max(bx), max(by))
+            if local is None:
+                local = box
+            else:
+                local = (min(local[0], box[0]), min(local[1], box[1]), max(local[2], box[2]), max(local[3], box[3]))
+        memo[name] = local
+    if local is None:
+        return None
+    t = _insert_transform(ins)
+    if t is None:
+        return None
+    a, b, c, d, e, f = _compose_transform(t, None)
+    corners = [(a * x + c * y + e, b * x + d * y + f) for x in (local[0], local[2]) for y in (local[1], local[3])]
+    bx = [x for (x, _y) in corners]
+    by = [y for (_x, y) in corners]
+    box = (min(bx), min(by), max(bx), max(by))
+    if not all(v - v == 0.0 for v in box):
+        return None
+    return box
+
+
+def _flatten_block(ctx: dict, name: str) -> list:
+    # Segments of BLOCK `name` in its local space with nested INSERTs expanded.
+    out = []
+    for (cols, m, inner) in _block_pieces(ctx, name):
+        rgb, layer, aci = cols.attrs(inner)
+        aci = [None if a == ACI_NONE else a for a in aci]
+        if m is None:
+            out.extend(zip(cols.x0, cols.y0, cols.x1, cols.y1, rgb, layer, aci))
+            continue
+        a, b, c, d, e, f = m
+        out.extend(zip(
+            [a * x + c * y + e for x, y in zip(cols.x0, cols.y0)],
+            [b * x + d * y + f for x, y in zip(cols.x0, cols.y0)],
+            [a * x + c * y + e for x, y in zip(cols.x1, cols.y1)],
+            [b * x + d * y + f for x, y in zip(cols.x1, cols.y1)],
+            rgb, layer, aci))
+    return out
+
+
+def _new_parse_context(opts: dict) -> dict:
+    """Empty accumulator for _parse_pairs: output segments, counters, LAYER colors and BLOCKs."""
+    ctx = {
+        'opts': opts,
+        'segs': SegmentStore(),
+        'meta': {
+            'truncated': False,
+            'segments': 0,
+            'blocks': 0,
+            'insertsExpanded': 0,
+            'colors': 0,
+            'arcs': 0,
+            'circles': 0,
+            'ellipses': 0,
+            'splines': 0,
+            'bulgeArcs': 0,
+            'excludedEntities': 0,
+            'clipCulled': 0,
+            'clipCut': 0,
+            # Time spent tessellating curves and expanding INSERTs (ns; parseTimes in the end).
+            'tessellateNs': 0,
+            'flattenNs': 0,
+        },
+        # Layer table colors (name -> rgb int). Used to resolve BYLAYER (ACI 256).
+        'layer_rgb': {},
+        'blocks': {},
+        # Block geometry with nested INSERTs composed (memoized, see _block_pieces).
+        'flattened': {},
+        # Top-level INSERTs kept as references when opts['instance_inserts'] is set.
+        'inserts': [],
+        # Block name -> local-space bounding box (see _insert_bounds).
+        'block_bounds': {},
+        # Analytic curve records when opts['native_curves'] is set (see _parse_pairs).
+        'curves': [],
+    }
+    if opts.get('layer_filter'):
+        # Excluded entity count per layer name, and the count of entities the filter let through.
+        ctx['meta']['excludedLayers'] = {}
+        ctx['meta']['keptEntities'] = 0
+    return ctx
+
+
+def _parse_pairs(pairs, ctx: dict, section: Optional[str] = None) -> None:
+    """Run the DXF entity state machine over (code, value) pairs from one of the tokenizers.
+
+    Results accumulate in `ctx` (see _new_parse_context), so a file can be parsed in several
+    calls: TABLES and BLOCKS first, then ENTITIES whole or as chunks that each start at an
+    entity boundary (pass section='ENTITIES' for chunks without the SECTION header).
+    """
+    opts = ctx['opts']
+    max_segments = opts['max_segments']
+    expand_inserts = opts['expand_inserts']
+    instance_inserts = bool(opts.get('instance_inserts'))
+    curve_radius_frac = opts['curve_radius_frac']
+    curve_max_chord = opts['curve_max_chord']
+    curve_min_segs = opts['curve_min_segs']
+    curve_max_segs = opts['curve_max_segs']
+    spline_samples_per_ctrl = opts['spline_samples_per_ctrl']
+    spline_samples_min = opts['spline_samples_min']
+    spline_samples_max = opts['spline_samples_max']
+    # Maximum chord deviation (sagitta) in drawing units; 0 keeps the per-type heuristics above.
+    curve_tolerance = float(opts.get('curve_tolerance') or 0.0)
+    if not (curve_tolerance > 0.0 and curve_tolerance - curve_tolerance == 0.0):
+        curve_tolerance = 0.0
+    # layers.LayerFilter; entities on excluded layers are dropped when their group 8 is read.
+    layer_filter = opts.get('layer_filter') or None
+    # clip.ClipRegion; top-level geometry outside it is skipped or cut (block definitions are not).
+    clip = opts.get('clip')
+    # Keep top-level ARC/CIRCLE/ELLIPSE and bulges as curve records instead of tessellating them:
+    # (kind, cx, cy, rx, ry, rot, t0, t1, rgb, layer) with kind 'arc', 'circle' or 'ellipse',
+    # the sweep counter-clockwise from t0 to t1 (radians) and rot the major axis angle.
+    native_curves = bool(opts.get('native_curves'))
+    curves = ctx['curves']
+    # Progress hook set by _parse_dxf_file, called every `progress_every` records (code 0 pairs).
+    sample = ctx.get('sample')
+    sample_every = max(1, int(opts.get('progress_every') or _PROGRESS_EVERY))
+    sample_left = sample_every
+    clock = time.perf_counter_ns
+
+    segs = ctx['segs']
+    meta = ctx['meta']
+    layer_rgb: Dict[str, int] = ctx['layer_rgb']
+    blocks = ctx['blocks']
+    inserts = ctx['inserts']
+
+    in_entities = (section == 'ENTITIES')
+    in_blocks = False
+    in_tables = False
+    in_layer_table = False
+    current_layer_name: Optional[str] = None
+    current_layer_aci: Optional[int] = None
+    current_layer_true: Optional[int] = None
+    expecting_section_name = False
+
+    current_block_name = None
+    current_block_base = (0.0, 0.0)
+    current_block_segs = None
+    current_block_inserts = None
+    block_header_active = False
+
+    cur_type = None
+    line_ent: Dict[str, Optional[float]] = { 'x0': None, 'y0': None, 'x1': None, 'y1': None }
+    lw = { 'xs': [], 'ys': [], 'bulges': [], 'flags': 0 }
+
+    arc_ent: Dict[str, Optional[float]] = { 'cx': None, 'cy': None, 'r': None, 'a0': None, 'a1': None }
+    circ_ent: Dict[str, Optional[float]] = { 'cx': None, 'cy': None, 'r': None }
+    ellipse_ent: Dict[str, Optional[float]] = { 'cx': None, 'cy': None, 'mx': None, 'my': None, 'ratio': None, 't0': None, 't1': None }
+    spline_ent = {
+        'degree': None,
+        'flags': 0,
+        'knots': [],
+        'weights': [],
+        'ctrl': [],
+        'fit': []
+    }
+
+    # Per-entity visual attributes
+    cur_layer: Optional[str] = None
+    cur_aci: Optional[int] = None
+    cur_rgb: Optional[int] = None
+    cur_invisible: bool = False
+    # Per-entity space/layout: skip Paper Space (layout) entities to avoid scrambled imports.
+    # DXF: 67=1 indicates paper space; 410 indicates layout name ("Model" for model space).
+    cur_paperspace: bool = False
+    # Set when the current entity's layer is excluded: its remaining pairs are skipped.
+    cur_excluded: bool = False
+    # Set once the layer filter has seen the current entity's layer (group 8).
+    cur_filtered: bool = False
+
+    poly_active = False
+    vertex_active = False
+    poly_xs: List[float] = []
+    poly_ys: List[float] = []
+    poly_bulges: List[float] = []
+    poly_flags: int = 0
+    vertex: Dict[str, Optional[float]] = { 'x': None, 'y': None }
+    vertex_bulge: Optional[float] = None
+
+    insert_active = False
+    insert_ent = { 'name': None, 'x': None, 'y': None, 'sx': 1.0, 'sy': 1.0, 'rot': 0.0, 'layer': None, 'aci': None, 'rgb': None }
+
+    attr_codes = frozenset((8, 62, 67, 410, 420))
+
+    def _resolve_rgb(layer: Optional[str], aci: Optional[int], rgb: Optional[int]) -> int:
+        return _resolve_layer_rgb(layer_rgb, layer, aci, rgb)
+
+    def _flush_layer_table_record():
+        nonlocal current_layer_name, current_layer_aci, current_layer_true
+        try:
+            name = current_layer_name
+            if not name:
+                return
+            if current_layer_true is not None:
+                layer_rgb[name] = int(current_layer_true) & 0xFFFFFF
+                return
+            if current_layer_aci is not None:
+                ai = abs(int(current_layer_aci))
+                layer_rgb[name] = int(_aci_to_rgb_int(ai)) & 0xFFFFFF
+        except Exception:
+            return
+        finally:
+            current_layer_name = None
+            current_layer_aci = None
+            current_layer_true = None
+
+    # Output columns of the SegmentStore, appended to directly in _push_seg.
+    seg_x0, seg_y0, seg_x1, seg_y1 = segs.x0, segs.y0, segs.x1, segs.y1
+    seg_rgb, seg_aci = segs.rgb, segs.aci
+    seg_layer_ids: Dict[Optional[str], int] = {}
+
+    def _push_seg(out, x0, y0, x1, y1, *, layer: Optional[str], aci: Optional[int], rgb: Optional[int]):
+        if (len(seg_x0) if out is segs else len(out)) >= max_segments:
+            meta['truncated'] = True
+            return
+        if x0 is None or y0 is None or x1 is None or y1 is None:
+            return
+        if not (isinstance(x0, (int, float)) and isinstance(y0, (int, float)) and isinstance(x1, (int, float)) and isinstance(y1, (int, float))):
+            return
+        if not (x0 == x0 and y0 == y0 and x1 == x1 and y1 == y1):
+            return
+        if out is segs:
+            if clip is not None:
+                _push_clipped(x0, y0, x1, y1, layer, aci, rgb)
+                return
+            seg_x0.append(float(x0))
+            seg_y0.append(float(y0))
+            seg_x1.append(float(x1))
+            seg_y1.append(float(y1))
+            seg_rgb.append(int(_resolve_rgb(layer, aci, rgb)) & 0xFFFFFF)
+            lyr = str(layer) if layer else None
+            lid = seg_layer_ids.get(lyr)
+            if lid is None:
+                lid = seg_layer_ids[lyr] = segs.layer_index(lyr)
+            segs.layer_id.append(lid)
+            seg_aci.append(ACI_NONE if aci is None else aci_code(aci))
+            return
+        out.append((
+            float(x0),
+            float(y0),
+            float(x1),
+            float(y1),
+            int(_resolve_rgb(layer, aci, rgb)) & 0xFFFFFF,
+            (str(layer) if layer else None),
+            (int(aci) if aci is not None else None)
+        ))
+
+    def _push_clipped(x0, y0, x1, y1, layer, aci, rgb):
+        pieces = clip.clip_segment(float(x0), float(y0), float(x1), float(y1))
+        if len(pieces) != 1 or pieces[0] != (x0, y0, x1, y1):
+            meta['clipCut'] += 1
+        if not pieces:
+            return
+        rgb_v = int(_resolve_rgb(layer, aci, rgb)) & 0xFFFFFF
+        lyr = str(layer) if layer else None
+        lid = seg_layer_ids.get(lyr)
+        if lid is None:
+            lid = seg_layer_ids[lyr] = segs.layer_index(lyr)
+        aci_v = ACI_NONE if aci is None else aci_code(aci)
+        for (a, b, c, d) in pieces:
+            if len(seg_x0) >= max_segments:
+                meta['truncated'] = True
+                return
+            seg_x0.append(a)
+            seg_y0.append(b)
+            seg_x1.append(c)
+            seg_y1.append(d)
+            seg_rgb.append(rgb_v)
+            segs.layer_id.append(lid)
+            seg_aci.append(aci_v)
+
+    def _push_path(out, xs, ys, *, layer: Optional[str], aci: Optional[int], rgb: Optional[int]):
+        # Consecutive segments through the points (xs[i], ys[i]), appended as one batch with the
+        # color and layer resolved once. Points must be finite.
+        n = len(xs) - 1
+        if n < 1:
+            return
+        x0s, y0s, x1s, y1s = xs[:n], ys[:n], xs[1:], ys[1:]
+        if out is segs and clip is not None:
+            x0s, y0s, x1s, y1s, _src, cut = clip.clip_columns(x0s, y0s, x1s, y1s)
+            meta['clipCut'] += cut
+            n = len(x0s)
+            if not n:
+                return
+        room = max_segments - (len(seg_x0) if out is segs else len(out))
+        if n > room:
+            meta['truncated'] = True
+            if room <= 0:
+                return
+            n = room
+            x0s, y0s, x1s, y1s = x0s[:n], y0s[:n], x1s[:n], y1s[:n]
+        rgb_v = int(_resolve_rgb(layer, aci, rgb)) & 0xFFFFFF
+        lyr = str(layer) if layer else None
+        if out is segs:
+            lid = seg_layer_ids.get(lyr)
+            if lid is None:
+                lid = seg_layer_ids[lyr] = segs.layer_index(lyr)
+            seg_x0.extend(x0s)
+            seg_y0.extend(y0s)
+            seg_x1.extend(x1s)
+            seg_y1.extend(y1s)
+            seg_rgb.extend(repeat(rgb_v, n))
+            segs.layer_id.extend(repeat(lid, n))
+            seg_aci.extend(repeat(ACI_NONE if aci is None else aci_code(aci), n))
+            return
+        aci_v = int(aci) if aci is not None else None
+        out.extend(zip(x0s, y0s, x1s, y1s, repeat(rgb_v, n), repeat(lyr, n), repeat(aci_v, n)))
+
+    def _push_curve(kind, cx, cy, rx, ry, rot, t0, t1, *, layer, aci, rgb) -> bool:
+        # Record an analytic curve for the top-level output. Returns False when it has to be
+        # tessellated instead (crosses the clip boundary).
+        if clip is not None and not clip.covers(cx - max(rx, ry), cy - max(rx, ry), cx + max(rx, ry), cy + max(rx, ry)):
+            return False
+        if len(seg_x0) + len(curves) >= max_segments:
+            meta['truncated'] = True
+            return True
+        curves.append((kind, cx, cy, rx, ry, rot, t0, t1, int(_resolve_rgb(layer, aci, rgb)) & 0xFFFFFF, (str(layer) if layer else None)))
+        return True
+
+    def _arc_append(
+        out,
+        *,
+        cx: float,
+        cy: float,
+        r: float,
+        a0: float,
+        a1: float,
+        ccw: bool,
+        layer: Optional[str],
+        aci: Optional[int],
+        rgb: Optional[int],
+        kind: str = 'arc'
+    ):
+        try:
+            import math
+            # Defensive clamp of curve tessellation controls.
+            try:
+                radius_frac = float(curve_radius_frac)
+            except Exception:
+                radius_frac = 0.25
+            if not (radius_frac == radius_frac):
+                radius_frac = 0.25
+            radius_frac = max(0.01, min(1.0, radius_frac))
+            try:
+                chord_cap = float(curve_max_chord)
+            except Exception:
+                chord_cap = 500.0
+            if not (chord_cap == chord_cap) or chord_cap <= 0:
+                chord_cap = 500.0
+            try:
+                min_segs = int(curve_min_segs)
+            except Exception:
+                min_segs = 3
+            try:
+                max_segs = int(curve_max_segs)
+            except Exception:
+                max_segs = 96
+            if min_segs < 2:
+                min_segs = 2
+            if max_segs < min_segs:
+                max_segs = min_segs
+
+            if r <= 0 or not (r - r == 0.0 and cx - cx == 0.0 and cy - cy == 0.0 and a0 - a0 == 0.0 and a1 - a1 == 0.0):
+                return
+            if clip is not None and out is segs and clip.outside(cx - r, cy - r, cx + r, cy + r):
+                meta['clipCulled'] += 1
+                return
+            # Normalize angle span to direction
+            if ccw:
+                while a1 <= a0:
+                    a1 += math.tau
+            else:
+                while a1 >= a0:
+                    a1 -= math.tau
+            da = a1 - a0
+            if da == 0:
+                return
+            if native_curves and out is segs:
+                t0, t1 = (a0, a1) if ccw else (a1, a0)
+                if _push_curve(kind, cx, cy, r, r, 0.0, t0, t1, layer=layer, aci=aci, rgb=rgb):
+                    return
+
+            if curve_tolerance:
+                n = _tol_segments(abs(r), da, curve_tolerance)
+            else:
+                arc_len = abs(da) * abs(r)
+                # Target chord length in input units (usually mm).
+                # Use a larger cap than before so large-radius curves don't explode into hundreds of segments.
+                max_chord = max(1.0, min(chord_cap, abs(r) * radius_frac))
+                n = int(math.ceil(arc_len / max_chord))
+                n = max(min_segs, min(max_segs, n))
+            # Rotate the shared (n, da) vertex table to a0: r * cos(a0 + t), r * sin(a0 + t).
+            cos_t, sin_t = _angle_table(n, da)
+            rc = r * math.cos(a0)
+            rs = r * math.sin(a0)
+            xs = [cx + rc * c - rs * s for (c, s) in zip(cos_t, sin_t)]
+            ys = [cy + rs * c + rc * s for (c, s) in zip(cos_t, sin_t)]
+            _push_path(out, xs, ys, layer=layer, aci=aci, rgb=rgb)
+        except Exception:
+            return
+
+    def _bulge_to_arc(out, x0: float, y0: float, x1: float, y1: float, bulge: float, *, layer: Optional[str], aci: Optional[int], rgb: Optional[int]):
+        try:
+            import math
+            b = float(bulge)
+            if not (b == b) or b == 0.0:
+                _push_seg(out, x0, y0, x1, y1, layer=layer, aci=aci, rgb=rgb)
+                return
+            dx = x1 - x0
+            dy = y1 - y0
+            d = math.hypot(dx, dy)
+            if d <= 1e-12:
+                return
+            theta = 4.0 * math.atan(b)
+            if theta == 0.0:
+                _push_seg(out, x0, y0, x1, y1, layer=layer, aci=aci, rgb=rgb)
+                return
+
+            r = d / (2.0 * math.sin(abs(theta) / 2.0))
+            # Distance from chord midpoint to center
+            a = math.sqrt(max(0.0, r * r - (d * 0.5) * (d * 0.5)))
+            mx = (x0 + x1) * 0.5
+            my = (y0 + y1) * 0.5
+            # Left normal of chord
+            nx = -dy / d
+            ny = dx / d
+            sgn = 1.0 if b > 0 else -1.0
+            cx = mx + nx * a * sgn
+            cy = my + ny * a * sgn
+            a0 = math.atan2(y0 - cy, x0 - cx)
+            a1 = a0 + theta
+            _arc_append(out, cx=cx, cy=cy, r=r, a0=a0, a1=a1, ccw=(theta > 0), layer=layer, aci=aci, rgb=rgb)
+            meta['bulgeArcs'] = int(meta.get('bulgeArcs') or 0) + 1
+        except Exception:
+            _push_seg(out, x0, y0, x1, y1, layer=layer, aci=aci, rgb=rgb)
+
+    def _flush_arc():
+        if cur_type != 'ARC':
+            return
+        out = current_block_segs if (in_blocks and current_block_segs is not None) else segs
+        try:
+            if cur_invisible:
+                return
+            import math
+            cx = arc_ent.get('cx')
+            cy = arc_ent.get('cy')
+            r = arc_ent.get('r')
+            a0 = arc_ent.get('a0')
+            a1 = arc_ent.get('a1')
+            if cx is None or cy is None or r is None or a0 is None or a1 is None:
+                return
+            _arc_append(out, cx=float(cx), cy=float(cy), r=float(r), a0=float(a0), a1=float(a1), ccw=True, layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
+            meta['arcs'] = int(meta.get('arcs') or 0) + 1
+        except Exception:
+            return
+        finally:
+            arc_ent['cx'] = arc_ent['cy'] = arc_ent['r'] = arc_ent['a0'] = arc_ent['a1'] = None
+
+    def _flush_circle():
+        if cur_type != 'CIRCLE':
+            return
+        out = current_block_segs if (in_blocks and current_block_segs is not None) else segs
+        try:
+            if cur_invisible:
+                return
+            import math
+            cx = circ_ent.get('cx')
+            cy = circ_ent.get('cy')
+            r = circ_ent.get('r')
+            if cx is None or cy is None or r is None:
+                return
+            _arc_append(out, cx=float(cx), cy=float(cy), r=float(r), a0=0.0, a1=math.tau, ccw=True, layer=cur_layer, aci=cur_aci, rgb=cur_rgb, kind='circle')
+            meta['circles'] = int(meta.get('circles') or 0) + 1
+        except Exception:
+            return
+        finally:
+            circ_ent['cx'] = circ_ent['cy'] = circ_ent['r'] = None
+
+    def _flush_ellipse():
+        if cur_type != 'ELLIPSE':
+            return
+        out = current_block_segs if (in_blocks and current_block_segs is not None) else segs
+        try:
+            if cur_invisible:
+                return
+            import math
+            # Defensive clamp of curve tessellation controls.
+            try:
+                radius_frac = float(curve_radius_frac)
+            except Exception:
+                radius_frac = 0.25
+            if not (radius_frac == radius_frac):
+                radius_frac = 0.25
+            radius_frac = max(0.01, min(1.0, radius_frac))
+            try:
+                chord_cap = float(curve_max_chord)
+            except Exception:
+                chord_cap = 500.0
+            if not (chord_cap == chord_cap) or chord_cap <= 0:
+                chord_cap = 500.0
+            try:
+                min_segs = int(curve_min_segs)
+            except Exception:
+                min_segs = 3
+            try:
+                max_segs = int(curve_max_segs)
+            except Exception:
+                max_segs = 96
+            if min_segs < 2:
+                min_segs = 2
+            if max_segs < min_segs:
+                max_segs = min_segs
+            cx = ellipse_ent.get('cx')
+            cy = ellipse_ent.get('cy')
+            mx = ellipse_ent.get('mx')
+            my = ellipse_ent.get('my')
+            ratio = ellipse_ent.get('ratio')
+            t0 = ellipse_ent.get('t0')
+            t1 = ellipse_ent.get('t1')
+            if cx is None or cy is None or mx is None or my is None or ratio is None or t0 is None or t1 is None:
+                return
+            cx = float(cx)
+            cy = float(cy)
+            mx = float(mx)
+            my = float(my)
+            ratio = float(ratio)
+            if ratio <= 0:
+                return
+            if clip is not None and out is segs:
+                ext = math.hypot(mx, my) * max(1.0, ratio)
+                if clip.outside(cx - ext, cy - ext, cx + ext, cy + ext):
+                    meta['clipCulled'] += 1
+                    return
+            # minor axis vector is perpendicular to major and scaled by ratio
+            nx = -my * ratio
+            ny = mx * ratio
+            # parameter increases CCW from t0 to t1
+            t0 = float(t0)
+            t1 = float(t1)
+            if not (t0 - t0 == 0.0 and t1 - t1 == 0.0):
+                return
+            while t1 <= t0:
+                t1 += math.tau
+            dt = t1 - t0
+            maj_len = math.hypot(mx, my)
+            if native_curves and out is segs:
+                if _push_curve('ellipse', cx, cy, maj_len, maj_len * ratio, math.atan2(my, mx), t0, t1, layer=cur_layer, aci=cur_aci, rgb=cur_rgb):
+                    meta['ellipses'] = int(meta.get('ellipses') or 0) + 1
+                    return
+            # segment count based on major axis length and angle sweep
+            axis_len = max(maj_len, maj_len * ratio)
+            if curve_tolerance:
+                # The ellipse is an affine squash of the circle on its longer axis, which
+                # does not increase the chord deviation, so the circle's count is enough.
+                n = _tol_segments(axis_len, dt, curve_tolerance)
+            else:
+                approx_len = abs(dt) * max(1.0, maj_len)
+                max_chord = max(1.0, min(chord_cap, axis_len * radius_frac))
+                n = int(math.ceil(approx_len / max_chord))
+                n = max(max(8, min_segs * 2), min(max(192, max_segs * 2), n))
+            # P(t0 + s) = C + (M cos t0 + N sin t0) cos s + (N cos t0 - M sin t0) sin s, with the
+            # shared (n, dt) table for cos s / sin s.
+            cos_t, sin_t = _angle_table(n, dt)
+            c0 = math.cos(t0)
+            s0 = math.sin(t0)
+            ax = mx * c0 + nx * s0
+            bx = nx * c0 - mx * s0
+            ay = my * c0 + ny * s0
+            by = ny * c0 - my * s0
+            xs = [cx + ax * c + bx * s for (c, s) in zip(cos_t, sin_t)]
+            ys = [cy + ay * c + by * s for (c, s) in zip(cos_t, sin_t)]
+            if all(v - v == 0.0 for v in (ax, bx, ay, by, cx, cy)):
+                _push_path(out, xs, ys, layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
+            meta['ellipses'] = int(meta.get('ellipses') or 0) + 1
+        except Exception:
+            return
+        finally:
+            ellipse_ent['cx'] = ellipse_ent['cy'] = ellipse_ent['mx'] = ellipse_ent['my'] = ellipse_ent['ratio'] = ellipse_ent['t0'] = ellipse_ent['t1'] = None
+
+    def _flush_spline():
+        if cur_type != 'SPLINE':
+            return
+        out = current_block_segs if (in_blocks and current_block_segs is not None) else segs
+        try:
+            if cur_invisible:
+                return
+            import math
+
+            flags = int(spline_ent.get('flags') or 0)
+            is_closed = (flags & 1) == 1
+
+            fit = spline_ent.get('fit') or []
+            if isinstance(fit, list) and len(fit) >= 2 and (not spline_ent.get('ctrl')):
+                # Fit-point only fallback
+                pts = [(float(p[0]), float(p[1])) for p in fit if p and len(p) >= 2]
+                for i in range(len(pts) - 1):
+                    if len(out) >= max_segments:
+                        meta['truncated'] = True
+                        break
+                    _push_seg(out, pts[i][0], pts[i][1], pts[i + 1][0], pts[i + 1][1], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
+                if is_closed and len(pts) >= 3 and len(out) < max_segments:
+                    _push_seg(out, pts[-1][0], pts[-1][1], pts[0][0], pts[0][1], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
+                meta['splines'] = int(meta.get('splines') or 0) + 1
+                return
+
+            ctrl = spline_ent.get('ctrl') or []
+            knots = spline_ent.get('knots') or []
+            weights = spline_ent.get('weights') or []
+            p = spline_ent.get('degree')
+            if p is None:
+                return
+            p = int(p)
+            if p < 1:
+                return
+            if not (isinstance(ctrl, list) and isinstance(knots, list) and len(ctrl) >= p + 1 and len(knots) >= (len(ctrl) + p + 1)):
+                return
+
+            ctrl_pts = [(float(pt[0]), float(pt[1])) for pt in ctrl if pt and len(pt) >= 2]
+            if len(ctrl_pts) < p + 1:
+                return
+            if clip is not None and out is segs:
+                # The curve stays inside the control polygon's hull (positive weights).
+                cxs = [pt[0] for pt in ctrl_pts]
+                cys = [pt[1] for pt in ctrl_pts]
+                if clip.outside(min(cxs), min(cys), max(cxs), max(cys)):
+                    meta['clipCulled'] += 1
+                    return
+            U = [float(u) for u in knots]
+
+            W = None
+            if isinstance(weights, list) and len(weights) >= len(ctrl_pts):
+                try:
+                    W = [float(w) for w in weights[: len(ctrl_pts)]]
+                except Exception:
+                    W = None
+
+            m = len(U) - 1
+            u0 = U[p]
+            u1 = U[m - p]
+            if not (u0 == u0 and u1 == u1) or u1 <= u0:
+                return
+
+            try:
+                curve = NurbsCurve(p, ctrl_pts, U, W)
+            except (ValueError, ZeroDivisionError):
+                return
+            curve_point = curve.point
+
+            # Sampling resolution: bounded, scales with control points.
+            try:
+                per_ctrl = int(spline_samples_per_ctrl)
+            except Exception:
+                per_ctrl = 4
+            if per_ctrl < 1:
+                per_ctrl = 1
+            try:
+                smin = int(spline_samples_min)
+            except Exception:
+                smin = 16
+            try:
+                smax = int(spline_samples_max)
+            except Exception:
+                smax = 256
+            if smin < 4:
+                smin = 4
+            if smax < smin:
+                smax = smin
+            prev = None
+            if curve_tolerance:
+                # Adaptive: start from two samples per knot span, then bisect to the tolerance.
+                ts = [u0]
+                for u in sorted(set(U[p:m - p + 1])):
+                    if u0 < u <= u1 and u > ts[-1]:
+                        ts.append((ts[-1] + u) * 0.5)
+                        ts.append(u)
+                if len(ts) < 3:
+                    ts = [u0, (u0 + u1) * 0.5, u1]
+                for pt in _adaptive_points(curve_point, ts, curve_tolerance, _CURVE_TOL_MAX_SEGS + 1):
+                    if len(out) >= max_segments:
+                        meta['truncated'] = True
+                        break
+                    if prev is not None:
+                        _push_seg(out, prev[0], prev[1], pt[0], pt[1], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
+                    prev = pt
+            else:
+                samples = int(max(smin, min(smax, len(ctrl_pts) * per_ctrl)))
+                for pt in curve.points([u0 + (u1 - u0) * (float(si) / float(samples)) for si in range(samples + 1)]):
+                    if len(out) >= max_segments:
+                        meta['truncated'] = True
+                        break
+                    if pt is None:
+                        continue
+                    if prev is not None:
+                        _push_seg(out, prev[0], prev[1], pt[0], pt[1], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
+                    prev = pt
+            # Closed: connect endpoints if needed
+            if is_closed and prev is not None:
+                first = curve_point(u0)
+                if first is not None and len(out) < max_segments:
+                    _push_seg(out, prev[0], prev[1], first[0], first[1], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
+            meta['splines'] = int(meta.get('splines') or 0) + 1
+        except Exception:
+            return
+        finally:
+            spline_ent['degree'] = None
+            spline_ent['flags'] = 0
+            spline_ent['knots'] = []
+            spline_ent['weights'] = []
+            spline_ent['ctrl'] = []
+            spline_ent['fit'] = []
+
+    def _flush_line():
+        if cur_type != 'LINE':
+            return
+        out = current_block_segs if (in_blocks and current_block_segs is not None) else segs
+        if not cur_invisible:
+            _push_seg(out, line_ent['x0'], line_ent['y0'], line_ent['x1'], line_ent['y1'], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
+        line_ent['x0'] = line_ent['y0'] = line_ent['x1'] = line_ent['y1'] = None
+
+    def _flush_lwpoly():
+        if cur_type != 'LWPOLYLINE':
+            return
+        out = current_block_segs if (in_blocks and current_block_segs is not None) else segs
+        n = min(len(lw['xs']), len(lw['ys']))
+        if n >= 2 and not cur_invisible:
+            for i in range(n - 1):
+                if len(out) >= max_segments:
+                    meta['truncated'] = True
+                    break
+                try:
+                    bulge = 0.0
+                    if i < len(lw['bulges']):
+                        bulge = float(lw['bulges'][i] or 0.0)
+                    if bulge:
+                        _bulge_to_arc(out, float(lw['xs'][i]), float(lw['ys'][i]), float(lw['xs'][i + 1]), float(lw['ys'][i + 1]), bulge, layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
+                    else:
+                        _push_seg(out, lw['xs'][i], lw['ys'][i], lw['xs'][i + 1], lw['ys'][i + 1], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
+                except Exception:
+                    _push_seg(out, lw['xs'][i], lw['ys'][i], lw['xs'][i + 1], lw['ys'][i + 1], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
+            if (lw['flags'] & 1) == 1 and len(out) < max_segments:
+                try:
+                    bulge_last = 0.0
+                    if (n - 1) < len(lw['bulges']):
+                        bulge_last = float(lw['bulges'][n - 1] or 0.0)
+                    if bulge_last:
+                        _bulge_to_arc(out, float(lw['xs'][n - 1]), float(lw['ys'][n - 1]), float(lw['xs'][0]), float(lw['ys'][0]), bulge_last, layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
+                    else:
+                        _push_seg(out, lw['xs'][n - 1], lw['ys'][n - 1], lw['xs'][0], lw['ys'][0], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
+                except Exception:
+                    _push_seg(out, lw['xs'][n - 1], lw['ys'][n - 1], lw['xs'][0], lw['ys'][0], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
+        lw['xs'].clear()
+        lw['ys'].clear()
+        lw['bulges'].clear()
+        lw['flags'] = 0
+
+    def _flush_polyline():
+        nonlocal poly_active, vertex_active, poly_flags
+        if not poly_active:
+            return
+        out = current_block_segs if (in_blocks and current_block_segs is not None) else segs
+        n = min(len(poly_xs), len(poly_ys))
+        if n >= 2 and not cur_invisible:
+            for i in range(n - 1):
+                if len(out) >= max_segments:
+                    meta['truncated'] = True
+                    break
+                try:
+                    bulge = 0.0
+                    if i < len(poly_bulges):
+                        bulge = float(poly_bulges[i] or 0.0)
+                    if bulge:
+                        _bulge_to_arc(out, float(poly_xs[i]), float(poly_ys[i]), float(poly_xs[i + 1]), float(poly_ys[i + 1]), bulge, layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
+                    else:
+                        _push_seg(out, poly_xs[i], poly_ys[i], poly_xs[i + 1], poly_ys[i + 1], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
+                except Exception:
+                    _push_seg(out, poly_xs[i], poly_ys[i], poly_xs[i + 1], poly_ys[i + 1], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
+            if (poly_flags & 1) == 1 and len(out) < max_segments:
+                try:
+                    bulge_last = 0.0
+                    if (n - 1) < len(poly_bulges):
+                        bulge_last = float(poly_bulges[n - 1] or 0.0)
+                    if bulge_last:
+                        _bulge_to_arc(out, float(poly_xs[n - 1]), float(poly_ys[n - 1]), float(poly_xs[0]), float(poly_ys[0]), bulge_last, layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
+                    else:
+                        _push_seg(out, poly_xs[n - 1], poly_ys[n - 1], poly_xs[0], poly_ys[0], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
+                except Exception:
+                    _push_seg(out, poly_xs[n - 1], poly_ys[n - 1], poly_xs[0], poly_ys[0], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
+        poly_active = False
+        vertex_active = False
+        poly_xs.clear()
+        poly_ys.clear()
+        poly_bulges.clear()
+        poly_flags = 0
+        vertex['x'] = vertex['y'] = None
+
+    def _flush_curve_entities():
+        t0 = clock()
+        if cur_type == 'ARC':
+            _flush_arc()
+        elif cur_type == 'CIRCLE':
+            _flush_circle()
+        elif cur_type == 'ELLIPSE':
+            _flush_ellipse()
+        elif cur_type == 'SPLINE':
+            _flush_spline()
+        meta['tessellateNs'] += clock() - t0
+
+    def _exclude_entity(layer: Optional[str]):
+        # Drop the current entity before any of its coordinates are parsed.
+        nonlocal cur_type, cur_excluded, insert_active, poly_active, poly_flags
+        if cur_type is not None:
+            cur_type = None
+        elif insert_active:
+            insert_active = False
+        elif poly_active:
+            # POLYLINE header: VERTEX/SEQEND are ignored while no polyline is active.
+            poly_active = False
+            poly_xs.clear(); poly_ys.clear(); poly_bulges.clear(); poly_flags = 0
+        cur_excluded = True
+        meta['excludedEntities'] += 1
+        excluded = meta['excludedLayers']
+        excluded[layer] = int(excluded.get(layer) or 0) + 1
+
+    def _flush_insert():
+        nonlocal insert_active
+        if not insert_active:
+            return
+        insert_active = False
+
+        # If we are inside a BLOCK definition, keep the insert for later flattening (nested blocks).
+        if in_blocks and current_block_inserts is not None:
+            current_block_inserts.append(dict(insert_ent))
+            return
+
+        if not expand_inserts:
+            return
+        name = insert_ent.get('name')
+        if not name:
+            return
+        insert_clip = None
+        if clip is not None:
+            # Cull by the placed block's bounds before expanding; only INSERTs that cross
+            # the boundary have their segments cut.
+            bounds = _insert_bounds(ctx, name, insert_ent)
+            if bounds is not None:
+                if clip.outside(*bounds):
+                    meta['clipCulled'] += 1
+                    return
+                if not clip.covers(*bounds):
+                    insert_clip = clip
+            else:
+                insert_clip = clip
+        if instance_inserts and insert_clip is None:
+            # Keep the reference; the block geometry is returned once per definition.
+            if insert_ent.get('x') is not None and insert_ent.get('y') is not None:
+                inserts.append(dict(insert_ent))
+            return
+        # Nested inserts are composed into one transform per piece of block geometry.
+        t0 = clock()
+        try:
+            pieces = _block_pieces(ctx, name)
+            if not pieces:
+                return
+            if not _expand_block_insert(ctx, pieces, insert_ent, segs, max_out=max_segments, allow_downsample=True, clip=insert_clip):
+                return
+        finally:
+            meta['flattenNs'] += clock() - t0
+        meta['insertsExpanded'] = int(meta.get('insertsExpanded') or 0) + 1
+
+    for code, vtrim in pairs:
+        if meta['truncated']:
+            break
+
+        if code == 0:
+            if sample is not None:
+                sample_left -= 1
+                if sample_left <= 0:
+                    sample_left = sample_every
+                    sample()
+            # An entity, INSERT or POLYLINE header without a group 8 is on layer "0".
+            if layer_filter is not None and not cur_filtered and (in_entities or in_blocks) and (cur_type is not None or insert_active or (poly_active and not vertex_active)):
+                if layer_filter.excludes(None):
+                    _exclude_entity('0')
+                else:
+                    meta['keptEntities'] += 1
+            # boundary
+            if cur_type == 'LINE':
+                _flush_line()
+            if cur_type == 'LWPOLYLINE':
+                _flush_lwpoly()
+            if cur_type in ('ARC', 'CIRCLE', 'ELLIPSE', 'SPLINE'):
+                _flush_curve_entities()
+            if insert_active:
+                _flush_insert()
+            cur_type = None
+
+            # Reset per-entity attributes
+            cur_layer = None
+            cur_aci = None
+            cur_rgb = None
+            cur_invisible = False
+            cur_paperspace = False
+            cur_excluded = False
+            cur_filtered = False
+
+            if vtrim == 'SECTION':
+                expecting_section_name = True
+                continue
+            if vtrim == 'ENDSEC':
+                in_entities = False
+                in_blocks = False
+                in_tables = False
+                in_layer_table = False
+                _flush_layer_table_record()
+                expecting_section_name = False
+                continue
+
+            # TABLES parsing (minimal: LAYER colors)
+            if in_tables:
+                if vtrim == 'TABLE':
+                    # Table name arrives as group 2
+                    continue
+                if vtrim == 'ENDTAB':
+                    in_layer_table = False
+                    _flush_layer_table_record()
+                    continue
+                if in_layer_table:
+                    if vtrim == 'LAYER':
+                        _flush_layer_table_record()
+                        current_layer_name = None
+                        current_layer_aci = None
+                        current_layer_true = None
+                    continue
+
+            if in_blocks:
+                if vtrim == 'BLOCK':
+                    current_block_name = None
+                    current_block_base = (0.0, 0.0)
+                    current_block_segs = []
+                    current_block_inserts = []
+                    block_header_active = True
+                elif vtrim == 'ENDBLK':
+                    if current_block_name and current_block_segs is not None:
+                        bx, by = current_block_base
+                        if (bx != 0.0 or by != 0.0) and current_block_segs:
+                            # normalize relative to base
+                            norm = []
+                            for (x0, y0, x1, y1, rgb, lyr, aci) in current_block_segs:
+                                norm.append((x0 - bx, y0 - by, x1 - bx, y1 - by, rgb, lyr, aci))
+                            current_block_segs = norm
+                        blocks[current_block_name] = { 'base': current_block_base, 'segs': current_block_segs, 'inserts': (current_block_inserts or []) }
+                    current_block_name = None
+                    current_block_segs = None
+                    current_block_base = (0.0, 0.0)
+                    current_block_inserts = None
+                    block_header_active = False
+
+                # Inside block definitions, parse geometry similarly
+                if vtrim in ('LINE', 'LWPOLYLINE', 'ARC', 'CIRCLE', 'ELLIPSE', 'SPLINE'):
+                    cur_type = vtrim
+                    block_header_active = False
+                elif vtrim == 'POLYLINE':
+                    poly_active = True
+                    poly_xs.clear(); poly_ys.clear(); poly_flags = 0
+                    poly_bulges.clear()
+                    vertex_active = False
+                    block_header_active = False
+                elif vtrim == 'INSERT':
+                    insert_active = True
+                    insert_ent = { 'name': None, 'x': None, 'y': None, 'sx': 1.0, 'sy': 1.0, 'rot': 0.0, 'layer': None, 'aci': None, 'rgb': None }
+                    block_header_active = False
+                elif vtrim == 'VERTEX':
+                    if poly_active:
+                        vertex_active = True
+                        vertex['x'] = None
+                        vertex['y'] = None
+                        vertex_bulge = None
+                    block_header_active = False
+                elif vtrim == 'SEQEND':
+                    _flush_polyline()
+
+            if in_entities:
+                if vtrim == 'POLYLINE':
+                    poly_active = True
+                    poly_xs.clear(); poly_ys.clear(); poly_flags = 0
+                    vertex_active = False
+                elif vtrim == 'VERTEX':
+                    if poly_active:
+                        vertex_active = True
+                        vertex['x'] = None
+                        vertex['y'] = None
+                elif vtrim == 'SEQEND':
+                    _flush_polyline()
+
+                if vtrim in ('LINE', 'LWPOLYLINE', 'ARC', 'CIRCLE', 'ELLIPSE', 'SPLINE'):
+                    cur_type = vtrim
+                elif vtrim == 'INSERT':
+                    insert_active = True
+                    insert_ent = { 'name': None, 'x': None, 'y': None, 'sx': 1.0, 'sy': 1.0, 'rot': 0.0, 'layer': None, 'aci': None, 'rgb': None }
+                else:
+                    cur_type = None
+
+            continue
+
+        if expecting_section_name:
+            if code == 2:
+                in_entities = (vtrim == 'ENTITIES')
+                in_blocks = (vtrim == 'BLOCKS')
+                in_tables = (vtrim == 'TABLES')
+                in_layer_table = False
+                _flush_layer_table_record()
+                expecting_section_name = False
+            continue
+
+        # Parse layer table content when inside TABLES
+        if in_tables:
+            # Table name selection
+            if code == 2 and vtrim == 'LAYER':
+                in_layer_table = True
+                _flush_layer_table_record()
+                continue
+            if not in_layer_table:
+                continue
+            # Within a LAYER record
+            if code == 2:
+                current_layer_name = vtrim
+                continue
+            if code == 62:
+                current_layer_aci = _parse_int(vtrim)
+                continue
+            if code == 420:
+                current_layer_true = _parse_int(vtrim)
+                continue
+            continue
+
+        # Block header metadata (ONLY in the BLOCK header record).
+        # IMPORTANT: do NOT consume entity coordinate codes (10/20) inside blocks.
+        if in_blocks and current_block_segs is not None and block_header_active:
+            if current_block_name is None and code == 2:
+                current_block_name = vtrim
+                continue
+            if code == 10:
+                x = _parse_float(vtrim)
+                if x is not None:
+                    current_block_base = (x, current_block_base[1])
+                continue
+            if code == 20:
+                y = _parse_float(vtrim)
+                if y is not None:
+                    current_block_base = (current_block_base[0], y)
+                continue
+
+        if not in_entities and not in_blocks:
+            continue
+        if cur_excluded:
+            continue
+
+        # Common DXF entity attributes (one set lookup keeps coordinate pairs off this path)
+        if code in attr_codes:
+            if code == 8:
+                cur_layer = vtrim
+                if insert_active:
+                    insert_ent['layer'] = vtrim
+                # VERTEX records follow their POLYLINE; the BLOCK record itself is not an entity.
+                if layer_filter is not None and (cur_type is not None or insert_active or (poly_active and not vertex_active)):
+                    cur_filtered = True
+                    if layer_filter.excludes(vtrim):
+                        _exclude_entity(vtrim)
+                    else:
+                        meta['keptEntities'] += 1
+            elif code == 62:
+                cur_aci = _parse_int(vtrim)
+                try:
+                    if cur_aci is not None and int(cur_aci) < 0:
+                        cur_invisible = True
+                except Exception:
+                    pass
+                if insert_active:
+                    insert_ent['aci'] = cur_aci
+            elif code == 420:
+                cur_rgb = _parse_int(vtrim)
+                if insert_active:
+                    insert_ent['rgb'] = cur_rgb
+            elif code == 67:
+                # 0=model space, 1=paper space
+                cur_paperspace = (_parse_int(vtrim) == 1)
+                if cur_paperspace:
+                    cur_invisible = True
+            else:
+                # 410: layout name; treat non-Model layouts as paper space
+                name = str(vtrim or '').strip()
+                if name and name.lower() != 'model':
+                    cur_paperspace = True
+                    cur_invisible = True
+            continue
+
+        if cur_type == 'LINE':
+            if code == 10:
+                line_ent['x0'] = _parse_float(vtrim)
+            elif code == 20:
+                line_ent['y0'] = _parse_float(vtrim)
+            elif code == 11:
+                line_ent['x1'] = _parse_float(vtrim)
+            elif code == 21:
+                line_ent['y1'] = _parse_float(vtrim)
+            continue
+
+        if cur_type == 'LWPOLYLINE':
+            if code == 10:
+                x = _parse_float(vtrim)
+                if x is not None:
+                    lw['xs'].append(x)
+                    lw['bulges'].append(0.0)
+            elif code == 20:
+                y = _parse_float(vtrim)
+                if y is not None:
+                    lw['ys'].append(y)
+            elif code == 70:
+                n = _parse_int(vtrim)
+                lw['flags'] = n or 0
+            elif code == 42:
+                # Bulge applies to the most recent vertex
+                try:
+                    b = _parse_float(vtrim)
+                    if b is None:
+                        continue
+                    if lw['bulges'] and len(lw['bulges']) == len(lw['xs']):
+                        lw['bulges'][-1] = float(b)
+                except Exception:
+                    pass
+            continue
+
+        if cur_type == 'ARC':
+            if code == 10:
+                arc_ent['cx'] = _parse_float(vtrim)
+            elif code == 20:
+                arc_ent['cy'] = _parse_float(vtrim)
+            elif code == 40:
+                arc_ent['r'] = _parse_float(vtrim)
+            elif code == 50:
+                try:
+                    import math
+                    d = _parse_float(vtrim)
+                    arc_ent['a0'] = (float(d) * math.pi / 180.0) if d is not None else None
+                except Exception:
+                    arc_ent['a0'] = None
+            elif code == 51:
+                try:
+                    import math
+                    d = _parse_float(vtrim)
+                    arc_ent['a1'] = (float(d) * math.pi / 180.0) if d is not None else None
+                except Exception:
+                    arc_ent['a1'] = None
+            continue
+
+        if cur_type == 'CIRCLE':
+            if code == 10:
+                circ_ent['cx'] = _parse_float(vtrim)
+            elif code == 20:
+                circ_ent['cy'] = _parse_float(vtrim)
+            elif code == 40:
+                circ_ent['r'] = _parse_float(vtrim)
+            continue
+
+        if cur_type == 'ELLIPSE':
+            if code == 10:
+                ellipse_ent['cx'] = _parse_float(vtrim)
+            elif code == 20:
+                ellipse_ent['cy'] = _parse_float(vtrim)
+            elif code == 11:
+                ellipse_ent['mx'] = _parse_float(vtrim)
+            elif code == 21:
+                ellipse_ent['my'] = _parse_float(vtrim)
+            elif code == 40:
+                ellipse_ent['ratio'] = _parse_float(vtrim)
+            elif code == 41:
+                ellipse_ent['t0'] = _parse_float(vtrim)
+            elif code == 42:
+                ellipse_ent['t1'] = _parse_float(vtrim)
+            continue
+
+        if cur_type == 'SPLINE':
+            if code == 70:
+                spline_ent['flags'] = _parse_int(vtrim) or 0
+            elif code == 71:
+                spline_ent['degree'] = _parse_int(vtrim)
+            elif code == 40:
+                k = _parse_float(vtrim)
+                if k is not None:
+                    spline_ent['knots'].append(float(k))
+            elif code == 41:
+                w = _parse_float(vtrim)
+                if w is not None:
+                    spline_ent['weights'].append(float(w))
+            elif code == 10:
+                x = _parse_float(vtrim)
+                if x is not None:
+                    spline_ent['ctrl'].append([float(x), 0.0])
+            elif code == 20:
+                y = _parse_float(vtrim)
+                if y is not None and spline_ent['ctrl']:
+                    spline_ent['ctrl'][-1][1] = float(y)
+            elif code == 11:
+                x = _parse_float(vtrim)
+                if x is not None:
+                    spline_ent['fit'].append([float(x), 0.0])
+            elif code == 21:
+                y = _parse_float(vtrim)
+                if y is not None and spline_ent['fit']:
+                    spline_ent['fit'][-1][1] = float(y)
+            continue
+
+        if insert_active:
+            if code == 2:
+                insert_ent['name'] = vtrim
+            elif code == 10:
+                insert_ent['x'] = _parse_float(vtrim)
+            elif code == 20:
+                insert_ent['y'] = _parse_float(vtrim)
+            elif code == 41:
+                insert_ent['sx'] = _parse_float(vtrim) or 1.0
+            elif code == 42:
+                insert_ent['sy'] = _parse_float(vtrim) or 1.0
+            elif code == 50:
+                insert_ent['rot'] = _parse_float(vtrim) or 0.0
+            continue
+
+        if poly_active:
+            if not vertex_active:
+                if code == 70:
+                    poly_flags = _parse_int(vtrim) or 0
+            else:
+                if code == 10:
+                    vertex['x'] = _parse_float(vtrim)
+                elif code == 20:
+                    vertex['y'] = _parse_float(vtrim)
+                elif code == 42:
+                    vertex_bulge = _parse_float(vtrim)
+                vx = vertex.get('x')
+                vy = vertex.get('y')
+                if vx is not None and vy is not None:
+                    # poly_xs/poly_ys are lists of floats
+                    poly_xs.append(float(vx))
+                    poly_ys.append(float(vy))
+                    poly_bulges.append(float(vertex_bulge or 0.0))
+                    vertex['x'] = None
+                    vertex['y'] = None
+                    vertex_bulge = None
+
+    # trailing flush
+    if cur_type == 'LINE':
+        _flush_line()
+    if cur_type == 'LWPOLYLINE':
+        _flush_lwpoly()
+    if cur_type in ('ARC', 'CIRCLE', 'ELLIPSE', 'SPLINE'):
+        _flush_curve_entities()
+    if insert_active:
+        _flush_insert()
+    if poly_active:
+        _flush_polyline()
+
+
+# Counters that _parse_pairs increments per entity; summed across ENTITIES chunks.
+_ENTITY_COUNTERS = ('insertsExpanded', 'arcs', 'circles', 'ellipses', 'splines', 'bulgeArcs', 'excludedEntities', 'clipCulled', 'clipCut',
+                    'tessellateNs', 'flattenNs')
+# Entities that continue a preceding one (POLYLINE/INSERT sequences); never split before these.
+_DXF_SEQUENCE_TYPES = frozenset((b'VERTEX', b'SEQEND', b'ATTRIB'))
+# ENTITIES sections smaller than this are parsed in-process; starting workers would cost more.
+_PARALLEL_MIN_BYTES = 16 * 1024 * 1024
+_PARALLEL_MAX_WORKERS = 8
+# Chunks per worker, so one slow chunk (e.g. a dense spline region) does not idle the rest.
+_CHUNKS_PER_WORKER = 4
+
+# Default number of DXF records (code 0 pairs, about 10 pairs each) between two calls of a parse
+# `progress` callback.
+_PROGRESS_EVERY = 1 << 13
+
+# Per-process state of ENTITIES chunk workers (set by _init_entity_worker).
+_worker_shared: Optional[dict] = None
+_worker_flattened: Dict[str, list] = {}
+
+
+def _ascii_entity_boundary(buf, pos: int, end: int) -> Optional[int]:
+    # Offset of the first "0 / <TYPE>" line pair at or after pos that starts a top-level entity.
+    # A type line is never numeric, so its preceding "0" line must be a group code, not a value.
+    p = buf.find(b'\n', pos, end)
+    while 0 <= p < end:
+        ls = p + 1
+        le = buf.find(b'\n', ls, end)
+        if le < 0:
+            return None
+        if bytes(buf[ls:le]).strip() == b'0':
+            te = buf.find(b'\n', le + 1, end)
+            if te < 0:
+                return None
+            t = bytes(buf[le + 1:te]).strip()
+            if t[:1].isalpha() and t not in _DXF_SEQUENCE_TYPES:
+                return ls
+        p = le
+    return None
+
+
+def _binary_entity_boundary(buf, pos: int, end: int) -> Optional[int]:
+    # R13+ binary DXF writes every entity as code 0 (00 00), its NUL-terminated type, then
+    # code 5 (05 00) with the handle. Find that signature and check the type name looks valid.
+    while True:
+        i = buf.find(b'\x00\x05\x00', pos, end)
+        if i < 0:
+            return None
+        k = buf.rfind(b'\x00', max(pos, i - 48), i)
+        pos = i + 1
+        if k < 1 or buf[k - 1] != 0:
+            continue
+        t = bytes(buf[k + 1:i])
+        if t[:1].isalpha() and t.replace(b'_', b'').isalnum() and t.upper() == t and t not in _DXF_SEQUENCE_TYPES:
+            return k - 1
+
+
+def _entity_chunks(buf, is_binary: bool, start: int, end: int, n_chunks: int) -> List[Tuple[int, int]]:
+    # Split the ENTITIES byte range into about n_chunks ranges at entity boundaries.
+    bounds = [start]
+    step = max(1, (end - start) // max(1, n_chunks))
+    find = _binary_entity_boundary if is_binary else _ascii_entity_boundary
+    for k in range(1, n_chunks):
+        target = start + step * k
+        if target <= bounds[-1]:
+            continue
+        b = find(buf, target, end)
+        if b is None:
+            break
+        if b > bounds[-1]:
+            bounds.append(b)
+    bounds.append(end)
+    return [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1) if bounds[i + 1] > bounds[i]]
+
+
+def _block_nesting_ok(blocks: dict, limit: int = 8) -> bool:
+    # _block_pieces memoizes blocks that exceed the nesting limit as empty, so the result
+    # depends on which INSERT reaches them first. Only parse in parallel when that cannot happen.
+    depth_of: Dict[str, int] = {}
+
+    def _depth(name: str, stack: tuple) -> int:
+        if name in depth_of:
+            return depth_of[name]
+        if name in stack or len(stack) > limit:
+            return limit + 1
+        blk = blocks.get(name)
+        d = 0
+        for ins in ((blk or {}).get('inserts') or []):
+            child = str(ins.get('name') or '')
+            if child and child in blocks:
+                d = max(d, 1 + _depth(child, stack + (name,)))
+        depth_of[name] = d
+        return d
+
+    return all(_depth(name, ()) < limit for name in blocks)
+
+
+def _init_entity_worker(shared: dict) -> None:
+    global _worker_shared, _worker_flattened
+    _worker_shared = shared
+    _worker_flattened = {}
+
+
+def _parse_entity_chunk(dxf_path: str, is_binary: bool, start: int, end: int):
+    # Worker: parse one ENTITIES byte range against the shared LAYER colors and BLOCK definitions.
+    # The flattened-block memo is kept per worker process across its chunks.
+    shared = _worker_shared or {}
+    ctx = _new_parse_context(shared.get('opts') or {})
+    ctx['layer_rgb'] = shared.get('layer_rgb') or {}
+    ctx['blocks'] = shared.get('blocks') or {}
+    ctx['flattened'] = _worker_flattened
+    with open(dxf_path, 'rb') as fp:
+        if is_binary:
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                _parse_pairs(_iter_dxf_binary_pairs(mm, start, end), ctx, section='ENTITIES')
+        else:
+            _parse_pairs(_iter_dxf_pairs(fp, start, end), ctx, section='ENTITIES')
+    meta = ctx['meta']
+    return ctx['segs'], ctx['inserts'], ctx['curves'], { k: meta.get(k) for k in ('truncated', 'excludedLayers', 'keptEntities') + _ENTITY_COUNTERS }
+
+
+def _parse_entities_parallel(dxf_path: str, buf, is_binary: bool, fp, chunks, ctx: dict, workers: int) -> None:
+    # Chunks are parsed in a process pool and merged in file order. As soon as a chunk could
+    # have reached max_segments (or a block flatten truncated), the rest of ENTITIES is re-parsed
+    # in-process from that chunk on, so truncation and counters match the single-threaded parse.
+    import concurrent.futures
+    import multiprocessing
+
+    segs = ctx['segs']
+    meta = ctx['meta']
+    max_segments = ctx['opts']['max_segments']
+    # The progress callback stays in this process; it is called once per merged chunk.
+    shared = { 'opts': dict(ctx['opts'], progress=None), 'layer_rgb': ctx['layer_rgb'], 'blocks': ctx['blocks'] }
+    progress = ctx['opts'].get('progress')
+    # Not fork: the server parses on request threads, and a child forked while another thread holds
+    # a lock (logging, the import lock, an allocator) can hang. Workers get TABLES/BLOCKS pickled.
+    methods = multiprocessing.get_all_start_methods()
+    mp_ctx = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+    resume_at = None
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=mp_ctx, initializer=_init_entity_worker, initargs=(shared,)) as pool:
+        futures = [pool.submit(_parse_entity_chunk, dxf_path, is_binary, start, end) for (start, end) in chunks]
+        for (start, end), fut in zip(chunks, futures):
+            chunk_segs, chunk_inserts, chunk_curves, chunk_meta = fut.result()
+            if chunk_meta.get('truncated') or len(segs) + len(ctx['curves']) + len(chunk_segs) + len(chunk_curves) >= max_segments:
+                resume_at = start
+                break
+            segs.extend(chunk_segs)
+            ctx['inserts'].extend(chunk_inserts)
+            ctx['curves'].extend(chunk_curves)
+            for k in _ENTITY_COUNTERS:
+                meta[k] = int(meta.get(k) or 0) + int(chunk_meta.get(k) or 0)
+            for layer, n in (chunk_meta.get('excludedLayers') or {}).items():
+                meta['excludedLayers'][layer] = int(meta['excludedLayers'].get(layer) or 0) + int(n)
+            if 'keptEntities' in meta:
+                meta['keptEntities'] += int(chunk_meta.get('keptEntities') or 0)
+            if progress is not None:
+                meta['bytesRead'] = int(end)
+                progress(segs, meta)
+        if resume_at is not None:
+            for fut in futures:
+                fut.cancel()
+    if resume_at is not None:
+        meta['parallelResumedAt'] = int(resume_at)
+        end = chunks[-1][1]
+        if is_binary:
+            _parse_pairs(_iter_dxf_binary_pairs(buf, resume_at, end), ctx, section='ENTITIES')
+        else:
+            _parse_pairs(_iter_dxf_pairs(fp, resume_at, end), ctx, section='ENTITIES')
+
+
+def _parse_dxf_file(dxf_path: str, ctx: dict, workers: int, parallel_min_bytes: int) -> None:
+    # Tokenize and parse one DXF file into ctx (see _new_parse_context) and fill in the parse meta.
+    segs = ctx['segs']
+    meta = ctx['meta']
+
+    # ASCII DXF is read in large blocks; binary DXF (sentinel header) is memory-mapped.
+    # A substring pre-scan finds the section byte ranges so only TABLES, BLOCKS and
+    # ENTITIES are tokenized.
+    parse_t0 = time.perf_counter()
+    fp = open(dxf_path, 'rb')
+    mm = None
+    try:
+        is_binary = fp.read(len(_DXF_BINARY_SENTINEL)) == _DXF_BINARY_SENTINEL
+        meta['binary'] = bool(is_binary)
+        try:
+            mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            buf = mm
+        except (ValueError, OSError):
+            fp.seek(0)
+            buf = fp.read()
+
+        sections = None
+        try:
+            sections = _dxf_section_index(buf, is_binary)
+        except Exception:
+            sections = None
+        if sections:
+            named = [(name, start, end) for (name, start, end) in sections if name in _DXF_PARSED_SECTIONS]
+            skipped = {}
+            for (name, start, end) in sections:
+                if name not in _DXF_PARSED_SECTIONS:
+                    skipped[name] = int(skipped.get(name) or 0) + (end - start)
+            meta['sectionsSkipped'] = skipped
+            meta['skippedBytes'] = int(len(buf) - sum(end - start for (_name, start, end) in named))
+        else:
+            named = [('', len(_DXF_BINARY_SENTINEL) if is_binary else 0, len(buf))]
+            meta['sectionsSkipped'] = {}
+            meta['skippedBytes'] = 0
+
+        def _pairs(start: int, end: int):
+            if is_binary:
+                return _iter_dxf_binary_pairs(buf, start, end)
+            return _iter_dxf_pairs(fp, start, end)
+
+        progress = ctx['opts'].get('progress')
+        if progress is not None:
+            # Called by _parse_pairs every progress_every records. The file position is the end of
+            # the last block read (ASCII); a memory-mapped binary DXF only reports it per parallel
+            # ENTITIES chunk and at the end.
+            def _sample():
+                if not is_binary:
+                    meta['bytesRead'] = fp.tell()
+                progress(segs, meta)
+            ctx['sample'] = _sample
+
+        # Parallel ENTITIES parsing needs a single ENTITIES section after TABLES/BLOCKS,
+        # since those must be complete before any INSERT is expanded.
+        entities = [i for i, rec in enumerate(named) if rec[0] == 'ENTITIES']
+        # The pool is opt-in (workers > 1) and never larger than the CPU count.
+        n_workers = min(int(workers or 0), _PARALLEL_MAX_WORKERS, os.cpu_count() or 1)
+        chunks = []
+        if n_workers > 1 and len(entities) == 1 and entities[0] == len(named) - 1:
+            _name, ent_start, ent_end = named[-1]
+            if ent_end - ent_start >= max(1, int(parallel_min_bytes)):
+                chunks = _entity_chunks(buf, is_binary, ent_start, ent_end, n_workers * _CHUNKS_PER_WORKER)
+
+        if len(chunks) > 1:
+            for (_name, start, end) in named[:-1]:
+                _parse_pairs(_pairs(start, end), ctx)
+            if not meta['truncated'] and _block_nesting_ok(ctx['blocks']):
+                meta['parseWorkers'] = min(n_workers, len(chunks))
+                meta['parseChunks'] = len(chunks)
+                _parse_entities_parallel(dxf_path, buf, is_binary, fp, chunks, ctx, meta['parseWorkers'])
+            elif not meta['truncated']:
+                _parse_pairs(_pairs(named[-1][1], named[-1][2]), ctx)
+        else:
+            def _all_pairs():
+                for (_name, start, end) in named:
+                    yield from _pairs(start, end)
+            _parse_pairs(_all_pairs(), ctx)
+    finally:
+        if mm is not None:
+            mm.close()
+        fp.close()
+
+    meta['segments'] = len(segs)
+    meta['blocks'] = len(ctx['blocks'])
+    try:
+        parse_s = max(1e-9, time.perf_counter() - parse_t0)
+        dxf_bytes = os.path.getsize(dxf_path)
+        meta['dxfBytes'] = int(dxf_bytes)
+        meta['parseMs'] = int(round(parse_s * 1000.0))
+        meta['parseMBps'] = round(dxf_bytes / parse_s / 1e6, 2)
+    except Exception:
+        pass
+    # Parts of parseMs (summed over workers when parsed in parallel); the rest is tokenizing and
+    # the entity state machine.
+    meta['parseTimes'] = {
+        'tessellateMs': round(meta.pop('tessellateNs', 0) / 1e6, 1),
+        'flattenMs': round(meta.pop('flattenNs', 0) / 1e6, 1),
+    }
+    try:
+        meta['colors'] = len(set(segs.rgb))
+    except Exception:
+        meta['colors'] = 0
+    if ctx['opts'].get('progress') is not None:
+        meta['bytesRead'] = int(meta.get('dxfBytes') or 0)
+        ctx['opts']['progress'](segs, meta)
+        meta.pop('bytesRead', None)
+
+
+def _parse_dxf_filtered(dxf_path: str, opts: dict, workers: int, parallel_min_bytes: int) -> dict:
+    # Parse with opts['layer_filter'] and opts['clip']. When the only layer exclusions are the
+    # autoClean defaults and they leave almost nothing (the CAD-mode layer cleanup's rule, counted
+    # in entities: fewer than 500 kept and under 5% of the entities the filter looked at), the
+    # drawing is probably drawn on those layers, so it is parsed again without them.
+    ctx = _new_parse_context(opts)
+    _parse_dxf_file(dxf_path, ctx, workers, parallel_min_bytes)
+    layer_filter = opts.get('layer_filter')
+    relaxed = False
+    if layer_filter and layer_filter.default_exclude:
+        meta = ctx['meta']
+        kept = int(meta.get('keptEntities') or 0)
+        excluded = int(meta.get('excludedEntities') or 0)
+        if excluded and not meta['truncated'] and kept < 500 and kept < 0.05 * (kept + excluded):
+            layer_filter = layer_filter.without_defaults()
+            ctx = _new_parse_context(dict(opts, layer_filter=(layer_filter or None)))
+            _parse_dxf_file(dxf_path, ctx, workers, parallel_min_bytes)
+            relaxed = True
+    meta = ctx['meta']
+    if opts.get('layer_filter'):
+        meta['layerFilter'] = {
+            'include': [p.pattern for p in layer_filter.include],
+            'exclude': [p.pattern for p in layer_filter.exclude],
+            'autoCleanDefaults': bool(layer_filter.default_exclude),
+            'relaxed': relaxed,
+        }
+    if opts.get('clip') is not None:
+        meta['clip'] = opts['clip'].describe()
+    meta['curveTolerance'] = float(opts.get('curve_tolerance') or 0.0)
+    if opts.get('native_curves'):
+        meta['nativeCurves'] = len(ctx['curves'])
+    return ctx
+
+
+def dxf_to_segments(
+    dxf_path: str,
+    max_segments: int,
+    expand_inserts: bool,
+    max_insert_segs: int,
+    *,
+    curve_radius_frac: float = 0.25,
+    curve_max_chord: float = 500.0,
+    curve_min_segs: int = 3,
+    curve_max_segs: int = 96,
+    spline_samples_per_ctrl: int = 4,
+    spline_samples_min: int = 16,
+    spline_samples_max: int = 256,
+    curve_tolerance: float = 0.0,
+    workers: int = 1,
+    parallel_min_bytes: int = _PARALLEL_MIN_BYTES,
+    layer_filter=None,
+    clip=None,
+    curves: Optional[list] = None,
+    progress=None,
+    progress_every: int = _PROGRESS_EVERY,
+):
+    """Parse an ASCII or binary DXF into 2D line segments.
+
+    Returns (segments, meta): a segments.SegmentStore whose rows are (x0, y0, x1, y1, rgb, layer, aci).
+    `curve_tolerance` > 0 tessellates every curve type to that maximum chord deviation (in
+    drawing units) instead of the curve_*/spline_* segment-count heuristics.
+    `workers` > 1 parses large ENTITIES sections in a process pool (up to 8 and the CPU count);
+    the result is identical to the single-process parse.
+    `layer_filter` (layers.LayerFilter) drops entities on excluded layers before tessellation;
+    `clip` (clip.ClipRegion) crops the output to a rectangle or polygon in drawing units.
+    When a `curves` list is given, top-level ARC, CIRCLE, ELLIPSE and polyline bulges are appended
+    to it as (kind, cx, cy, rx, ry, rot, t0, t1, rgb, layer) records instead of being tessellated;
+    the sweep runs counter-clockwise from t0 to t1 in radians. Curves that cross `clip` are still
+    tessellated and cut. Records and segments share the `max_segments` budget.
+    `progress(segments, meta)` is called while parsing, every `progress_every` DXF records
+    (once per chunk when parsing in parallel) and when the parse ends, with the segments and
+    counters so far; during these calls meta also has `bytesRead`, the file position reached.
+    If the autoClean layer defaults are relaxed the file is parsed again into a new store, so
+    callers that keep an offset into `segments` should check its identity.
+    """
+    ctx = _parse_dxf_filtered(dxf_path, {
+        'max_segments': max_segments,
+        'expand_inserts': expand_inserts,
+        'max_insert_segs': max_insert_segs,
+        'curve_radius_frac': curve_radius_frac,
+        'curve_max_chord': curve_max_chord,
+        'curve_min_segs': curve_min_segs,
+        'curve_max_segs': curve_max_segs,
+        'spline_samples_per_ctrl': spline_samples_per_ctrl,
+        'spline_samples_min': spline_samples_min,
+        'spline_samples_max': spline_samples_max,
+        'curve_tolerance': curve_tolerance,
+        'layer_filter': layer_filter,
+        'clip': clip,
+        'native_curves': curves is not None,
+        'progress': progress,
+        'progress_every': progress_every,
+    }, workers, parallel_min_bytes)
+    if curves is not None:
+        curves.extend(ctx['curves'])
+    return ctx['segs'], ctx['meta']
+
+
+def dxf_to_block_instances(
+    dxf_path: str,
+    max_segments: int,
+    *,
+    curve_radius_frac: float = 0.25,
+    curve_max_chord: float = 500.0,
+    curve_min_segs: int = 3,
+    curve_max_segs: int = 96,
+    spline_samples_per_ctrl: int = 4,
+    spline_samples_min: int = 16,
+    spline_samples_max: int = 256,
+    curve_tolerance: float = 0.0,
+    workers: int = 1,
+    parallel_min_bytes: int = _PARALLEL_MIN_BYTES,
+    layer_filter=None,
+    clip=None,
+    curves: Optional[list] = None,
+    progress=None,
+    progress_every: int = _PROGRESS_EVERY,
+):
+    """Parse a DXF like dxf_to_segments, but keep top-level INSERTs as block references.
+
+    Returns (segments, blocks, inserts, meta):
+    - segments: geometry outside INSERTs, as in dxf_to_segments
+    - blocks: block name -> segments in the block's local space (nested INSERTs flattened);
+      rgb 0 marks BYBLOCK segments that take the color and layer of the referencing INSERT
+    - inserts: (name, x, y, sx, sy, rot_deg, layer, rgb) per INSERT, with rgb None when the
+      INSERT has no color of its own (BYBLOCK segments then keep rgb 0 and their own layer)
+    Only blocks that are referenced and contain geometry are returned. With `clip`, INSERTs
+    that cross the clip boundary are expanded into segments instead of being instanced.
+    `curves` collects top-level curves as in dxf_to_segments; block geometry stays tessellated.
+    `progress` and `progress_every` are as in dxf_to_segments.
+    """
+    ctx = _parse_dxf_filtered(dxf_path, {
+        'max_segments': max_segments,
+        'expand_inserts': True,
+        'instance_inserts': True,
+        'max_insert_segs': 0,
+        'curve_radius_frac': curve_radius_frac,
+        'curve_max_chord': curve_max_chord,
+        'curve_min_segs': curve_min_segs,
+        'curve_max_segs': curve_max_segs,
+        'spline_samples_per_ctrl': spline_samples_per_ctrl,
+        'spline_samples_min': spline_samples_min,
+        'spline_samples_max': spline_samples_max,
+        'curve_tolerance': curve_tolerance,
+        'layer_filter': layer_filter,
+        'clip': clip,
+        'native_curves': curves is not None,
+        'progress': progress,
+        'progress_every': progress_every,
+    }, workers, parallel_min_bytes)
+    if curves is not None:
+        curves.extend(ctx['curves'])
+    meta = ctx['meta']
+    layer_rgb = ctx['layer_rgb']
+
+    block_segs: Dict[str, list] = {}
+    inserts = []
+    expanded = 0
+    for ins in ctx['inserts']:
+        name = str(ins.get('name') or '')
+        if name not in block_segs:
+            block_segs[name] = _flatten_block(ctx, name)
+        bsegs = block_segs[name]
+        if not bsegs:
+            continue
+        try:
+            x = float(ins.get('x'))
+            y = float(ins.get('y'))
+        except Exception:
+            continue
+        sx = _parse_float(ins.get('sx')) or 1.0
+        sy = _parse_float(ins.get('sy')) or 1.0
+        rot = _parse_float(ins.get('rot')) or 0.0
+        rgb = None
+        if ins.get('rgb') is not None or ins.get('aci') is not None:
+            rgb = int(_resolve_layer_rgb(layer_rgb, ins.get('layer'), ins.get('aci'), ins.get('rgb'))) & 0xFFFFFF
+        inserts.append((name, x, y, sx, sy, rot, ins.get('layer'), rgb))
+        expanded += len(bsegs)
+
+    blocks = { name: bsegs for (name, bsegs) in block_segs.items() if bsegs }
+    meta['insertsInstanced'] = len(inserts)
+    meta['instancedBlocks'] = len(blocks)
+    meta['instancedBlockSegments'] = sum(len(b) for b in blocks.values())
+    # Segments the same INSERTs would have produced if flattened (before maxInsertSegs downsampling).
+    meta['instancedExpandedSegments'] = int(expanded)
+    return ctx['segs'], blocks, inserts, meta
@@ -0,0 +1,249 @@
+"""Layer-name filters and layer classification for the DWG -> Plan2D import.
+
+Filters are evaluated by the DXF parser when an entity's layer (group code 8) is read, so
+entities on excluded layers are never tessellated. Each distinct layer name is matched once.
+`classify_layers` labels each layer of an import from its name and its linework.
+"""
+from __future__ import annotations
+
+import math
+import re
+from typing import Dict, List, Optional
+
+# Layers dropped by autoClean: PDF underlay geometry, hatch, dimensions and annotation.
+# Many DWGs are produced by PDF-to-DWG conversion and contain huge "PDF*_Geometry" layers
+# that overwhelm the actual architectural layers.
+AUTO_CLEAN_PATTERNS = (
+    r'(?i)\bhatch\b',
+    r'(?i)pdf\d*_geometry',
+    r'(?i)\$0\$pdf',
+    r'(?i)\bdefpoints\b',
+    r'(?i)\bdim(ension)?\b',
+    r'(?i)\btext\b',
+    r'(?i)\banno(tation)?\b',
+)
+
+
+def parse_layer_patterns(value) -> Optional[List[str]]:
+    """Pattern list from a request value: a list of strings or one comma-separated string.
+
+    Returns None when the value is missing, so callers can tell "not given" from "empty".
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        items = value.split(',')
+    elif isinstance(value, (list, tuple)):
+        items = [str(v) for v in value if v is not None]
+    else:
+        return None
+    return [s.strip() for s in items if s and s.strip()]
+
+
+def compile_layer_patterns(patterns) -> list:
+    # Case-insensitive regex search per pattern; a pattern that is not a valid regex
+    # matches as a literal substring.
+    out = []
+    for p in (patterns or ()):
+        try:
+            out.append(re.compile(p, re.IGNORECASE))
+        except re.error:
+            out.append(re.compile(re.escape(p), re.IGNORECASE))
+    return out
+
+
+class LayerFilter:
+    """Include/exclude decision per layer name (exclusions win over inclusions).
+
+    With include patterns, only layers matching one of them are kept. Entities without a
+    layer are treated as layer "0", the DXF default.
+    """
+
+    __slots__ = ('include', 'exclude', 'default_exclude', '_cache')
+
+    def __init__(self, include=None, exclude=None, *, default_exclude: bool = False):
+        self.include = compile_layer_patterns(include)
+        self.exclude = compile_layer_patterns(exclude)
+        # True when the exclusions are the autoClean defaults rather than explicit patterns.
+        self.default_exclude = bool(default_exclude)
+        self._cache: Dict[Optional[str], bool] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.include or self.exclude)
+
+    def __getstate__(self):
+        return (self.include, self.exclude, self.default_exclude)
+
+    def __setstate__(self, state):
+        self.include, self.exclude, self.default_exclude = state
+        self._cache = {}
+
+    def excludes(self, layer: Optional[str]) -> bool:
+        hit = self._cache.get(layer)
+        if hit is not None:
+            return hit
+        name = layer or '0'
+        drop = False
+        if self.include and not any(p.search(name) for p in self.include):
+            drop = True
+        elif any(p.search(name) for p in self.exclude):
+            drop = True
+        self._cache[layer] = drop
+        return drop
+
+    def without_defaults(self) -> 'LayerFilter':
+        # Same include patterns, without the autoClean default exclusions.
+        out = LayerFilter()
+        out.include = self.include
+        if not self.default_exclude:
+            out.exclude = self.exclude
+        return out
+
+
+# Layer classes, in the order name rules are tried. Layers matching none are classified
+# from their geometry, or "other".
+LAYER_CLASSES = ('hatch', 'underlay', 'dimensions', 'text', 'openings', 'furniture', 'walls', 'other')
+
+# Name rules (case-insensitive), covering AIA/ISO-style names (A-WALL, A-DOOR, A-ANNO-DIMS)
+# and common free-form ones. A match must not start inside a word ("A-WALL", "WALLS", not "DRYWALLS").
+_NAME_RULES = (
+    ('hatch', r'(?<![a-z])(hatch|patt|poche|fill)'),
+    ('underlay', r'pdf\d*_geometry|\$0\$pdf|(?<![a-z])(xref|underlay|image|raster|scan|background)'),
+    ('dimensions', r'(?<![a-z])(dim|dimension|cota|bema)|defpoints'),
+    ('text', r'(?<![a-z])(text|txt|anno|annotation|label|note|notes|title|iden|tag)(?![a-z])'),
+    ('openings', r'(?<![a-z])(door|window|win(?![a-z])|glaz|glass|opening|fenster|tuer|porte)'),
+    ('furniture', r'(?<![a-z])(furn|fixt|equip|casework|sanit|plumb|appl|kitchen|toilet|mobili|moebel)'),
+    ('walls', r'(?<![a-z])(wall|wand|mur|partition|col(umn)?s?(?![a-z])|struct)'),
+)
+_NAME_PATTERNS = tuple((label, re.compile(rx, re.IGNORECASE)) for (label, rx) in _NAME_RULES)
+_NAME_CLASS_CACHE: Dict[str, Optional[str]] = {}
+
+# Segments per layer that feed the geometry statistics (the first ones in input order, so
+# polylines stay connected).
+STATS_SAMPLE = 4096
+
+
+def name_class(name: Optional[str]) -> Optional[str]:
+    """Layer class implied by the layer name alone, or None. Cached per name."""
+    name = name or '0'
+    hit = _NAME_CLASS_CACHE.get(name, False)
+    if hit is not False:
+        return hit
+    label = None
+    for (cls, pat) in _NAME_PATTERNS:
+        if pat.search(name):
+            label = cls
+            break
+    if len(_NAME_CLASS_CACHE) < 65536:
+        _NAME_CLASS_CACHE[name] = label
+    return label
+
+
+def layer_geometry_stats(x0, y0, x1, y1, lids, rows, n_layers: int, *, sample: int = STATS_SAMPLE) -> list:
+    """Per-layer linework statistics, indexed by layer id (None for layers without segments).
+
+    `rows` are the row indices to include. Each entry holds the segment count and total length
+    (all segments) and, over the first `sample` segments, the median and 90th-percentile
+    length, the orthogonal fraction (within 1 degree of an axis), the share of the most common
+    direction (1 degree bins) and the closed fraction (endpoints shared with another segment
+    of the layer).
+    """
+    counts = [0] * n_layers
+    totals = [0.0] * n_layers
+    lengths: List[Optional[list]] = [None] * n_layers
+    ends: List[Optional[dict]] = [None] * n_layers
+    ortho = [0] * n_layers
+    dirs: List[Optional[dict]] = [None] * n_layers
+    eps = math.sin(math.radians(1.0))
+    hypot = math.hypot
+    atan2 = math.atan2
+    for i in rows:
+        lid = lids[i]
+        ax, ay, bx, by = x0[i], y0[i], x1[i], y1[i]
+        dx = bx - ax
+        dy = by - ay
+        ln = hypot(dx, dy)
+        if not (ln == ln) or ln == math.inf:
+            continue
+        counts[lid] += 1
+        totals[lid] += ln
+        lens = lengths[lid]
+        if lens is None:
+            lens = lengths[lid] = []
+            ends[lid] = {}
+            dirs[lid] = {}
+        if len(lens) >= sample:
+            continue
+        lens.append(ln)
+        if abs(dx) <= eps * ln or abs(dy) <= eps * ln:
+            ortho[lid] += 1
+        d = dirs[lid]
+        q = int(math.degrees(atan2(dy, dx)) % 180.0 + 0.5) % 180
+        d[q] = d.get(q, 0) + 1
+        e = ends[lid]
+        e[(ax, ay)] = e.get((ax, ay), 0) + 1
+        e[(bx, by)] = e.get((bx, by), 0) + 1
+
+    out: List[Optional[dict]] = [None] * n_layers
+    for lid in range(n_layers):
+        lens = lengths[lid]
+        if not lens:
+            continue
+        n = len(lens)
+        lens.sort()
+        shared = sum(c for c in ends[lid].values() if c > 1)
+        out[lid] = {
+            'segments': counts[lid],
+            'length': totals[lid],
+            'median': lens[n // 2],
+            'p90': lens[min(n - 1, (n * 9) // 10)],
+            'orthogonal': ortho[lid] / n,
+            'dominant': max(dirs[lid].values()) / n,
+            'closed': shared / (2.0 * n),
+        }
+    return out
+
+
+def geometry_class(st: dict, unit_mm: float) -> str:
+    # Class from linework statistics alone (lengths converted to mm with unit_mm).
+    n = st['segments']
+    med = st['median'] * unit_mm
+    ortho = st['orthogonal']
+    closed = st['closed']
+    if n >= 20 and st['dominant'] >= 0.7 and ortho < 0.5 and st['p90'] * unit_mm < 5000.0:
+        # Many parallel diagonal strokes.
+        return 'hatch'
+    if n >= 50 and med < 100.0 and ortho < 0.6 and closed >= 0.5:
+        # Dense short connected strokes: exploded text.
+        return 'text'
+    if n >= 4 and ortho >= 0.85 and med >= 300.0 and closed >= 0.6:
+        return 'walls'
+    if n >= 4 and closed >= 0.8 and med < 600.0:
+        return 'furniture'
+    return 'other'
+
+
+def classify_layers(names, stats, *, unit_mm: float = 1.0) -> Dict[str, dict]:
+    """Class per layer with segments: {name: {class, by, segments, lengthM, medianMm,
+    orthogonal, closed}}. `names[lid]` and `stats[lid]` (layer_geometry_stats) are indexed by
+    layer id; the name rules win over the geometry rules ("by" tells which one decided)."""
+    out: Dict[str, dict] = {}
+    for lid, st in enumerate(stats):
+        if st is None:
+            continue
+        name = names[lid] or '0'
+        label = name_class(name)
+        by = 'name'
+        if label is None:
+            label = geometry_class(st, unit_mm)
+            by = 'geometry'
+        out[name] = {
+            'class': label,
+            'by': by,
+            'segments': st['segments'],
+            'lengthM': round(st['length'] * unit_mm / 1000.0, 3),
+            'medianMm': round(st['median'] * unit_mm, 1),
+            'orthogonal': round(st['orthogonal'], 3),
+            'closed': round(st['closed'], 3),
+        }
+    return out
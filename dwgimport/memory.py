@@ -0,0 +1,235 @@
+"""Memory accounting and disk spill for the DWG -> Plan2D import.
+
+`MemoryBudget` records the resident set size (RSS) around each pipeline stage and decides when
+the import should spill. Once RSS is over the budget, large typed columns (segment coordinates,
+colors, layer ids, weld and dedup tables) move to memory-mapped files in a temp directory
+(`spill_array`, `column`, `table`). The kernel can then drop their pages under pressure instead
+of the worker being killed. They are still indexed, sliced and iterated like the arrays they
+replace. `ElementSpill` keeps finished Plan2D elements in a temp file as JSON instead of a list.
+
+RSS and its peak come from /proc/self (Linux). With a budget, the peak is reset at each stage
+through /proc/self/clear_refs when the kernel allows it, so a stage's peak is its own. Imports
+running concurrently in one server process share these numbers. Without a budget, and outside
+Linux, the peak is the process's peak so far (getrusage where /proc is missing) and never resets.
+"""
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import tempfile
+from array import array
+from typing import Optional
+
+_MB = float(1 << 20)
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size, or None where /proc is not available."""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * mmap.PAGESIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size since the last reset_peak() (or since the process started)."""
+    try:
+        with open('/proc/self/status', 'rb') as f:
+            for line in f:
+                if line.startswith(b'VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return int(peak) if sys.platform == 'darwin' else int(peak) * 1024
+    except Exception:
+        return None
+
+
+def reset_peak() -> bool:
+    """Restart peak RSS tracking at the current RSS (Linux 4.0+); False where unsupported."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class MemoryBudget:
+    """RSS budget of one import, with per-stage peaks and the columns spilled to disk."""
+
+    def __init__(self, budget_mb: float, spill_dir: Optional[str] = None):
+        self.budget = max(0.0, float(budget_mb or 0.0)) * _MB
+        self.spill_dir = spill_dir
+        self.spill_bytes = 0
+        self.spilled = {}
+        self.stages = []
+        self.peak = 0
+        self.resettable = None
+        self._maps = []
+        self._current = None
+
+    @property
+    def bounded(self) -> bool:
+        # With a budget the heavy stages use their bounded variants (tables in columns that can
+        # spill, elements flushed as they are built), whether or not RSS is over it yet.
+        return bool(self.budget)
+
+    def over(self) -> bool:
+        # Without a budget (or without /proc) nothing spills.
+        if not self.budget:
+            return False
+        rss = rss_bytes()
+        return rss is not None and rss > self.budget
+
+    def enter(self, name: str) -> None:
+        # Start a stage, ending the current one (as progress.ImportProgress.enter does).
+        self.leave()
+        # clear_refs also resets the page reference bits the kernel uses to pick pages to reclaim,
+        # for the whole process; only imports that asked for a budget pay for per-stage peaks.
+        if self.budget:
+            resettable = reset_peak()
+            if self.resettable is None:
+                self.resettable = resettable
+        self._current = (name, rss_bytes(), self.spill_bytes)
+
+    def leave(self) -> None:
+        if self._current is None:
+            return
+        name, start, spill0 = self._current
+        self._current = None
+        peak = peak_rss_bytes() or 0
+        end = rss_bytes()
+        self.peak = max(self.peak, peak)
+        self.stages.append({
+            'stage': name,
+            'startMb': round(start / _MB, 1) if start is not None else None,
+            'endMb': round(end / _MB, 1) if end is not None else None,
+            'peakMb': round(peak / _MB, 1),
+            'spillMb': round((self.spill_bytes - spill0) / _MB, 2),
+        })
+
+    def _map(self, typecode: str, nbytes: int, name: str, values=None):
+        # Writable memoryview over a new temp file of nbytes (zero-filled, or a copy of values).
+        try:
+            fd, path = tempfile.mkstemp(prefix='spill-', dir=self.spill_dir)
+            try:
+                with os.fdopen(fd, 'w+b') as f:
+                    if values is not None:
+                        f.write(values)
+                        f.flush()
+                    else:
+                        f.truncate(nbytes)
+                    mm = mmap.mmap(f.fileno(), 0)
+            finally:
+                # The mapping keeps the data; the name is not needed any more.
+                os.unlink(path)
+        except (OSError, ValueError):
+            return None
+        self._maps.append(mm)
+        self.spill_bytes += nbytes
+        self.spilled[name] = int(self.spilled.get(name) or 0) + nbytes
+        return memoryview(mm).cast(typecode)
+
+    def spill_array(self, values, name: str = 'column'):
+        """Memory-mapped copy of an array('d'/'I'/'H'/'h'/'q'...) as a writable memoryview of the same
+        type; the array is returned as is when it is empty or the file cannot be mapped."""
+        if not isinstance(values, array) or not len(values):
+            return values
+        view = self._map(values.typecode, len(values) * values.itemsize, name, values)
+        return values if view is None else view
+
+    def column(self, values, typecode: str = 'd', name: str = 'column'):
+        """Copy of a typed column (array or memoryview of `typecode`): memory-mapped when over
+        budget, else an array."""
+        if len(values) and self.over():
+            view = self._map(typecode, len(values) * array(typecode).itemsize, name, values)
+            if view is not None:
+                return view
+        return array(typecode, values)
+
+    def table(self, typecode: str, size: int, name: str = 'table'):
+        """Zero-filled column of `size` items: memory-mapped when over budget, else an array."""
+        itemsize = array(typecode).itemsize
+        if size > 0 and self.over():
+            view = self._map(typecode, size * itemsize, name)
+            if view is not None:
+                return view
+        return array(typecode, bytes(itemsize * size))
+
+    def describe(self) -> dict:
+        self.leave()
+        return {
+            'budgetMb': round(self.budget / _MB, 1),
+            'peakMb': round(self.peak / _MB, 1),
+            'spillMb': round(self.spill_bytes / _MB, 2),
+            'spilled': { k: round(v / _MB, 2) for (k, v) in self.spilled.items() },
+            'stages': self.stages,
+            'peakPerStage': bool(self.resettable),
+        }
+
+    def close(self) -> None:
+        self.leave()
+        # Views into a map must be released before it closes; maps still in use stay open until
+        # garbage collected.
+        for mm in self._maps:
+            try:
+                mm.close()
+            except BufferError:
+                pass
+        self._maps = []
+
+
+class ElementSpill:
+    """Plan2D elements written to a temp file, as the items of one JSON array, as they are built.
+
+    Called with each batch of elements (it is the `emit` callback of
+    plan2d.segments_to_plan2d_cad_elements); `count` is the number written so far.
+    """
+
+    def __init__(self, spill_dir: Optional[str] = None):
+        self.count = 0
+        self.bytes = 0
+        self._file = None
+        self._spill_dir = spill_dir
+
+    def __call__(self, elements) -> None:
+        if not elements:
+            return
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(prefix='elements-', dir=self._spill_dir)
+        encode = json.JSONEncoder().encode
+        lines = [encode(el) for el in elements]
+        # Same separators as json.dumps, so the body matches an in-memory encode.
+        body = (', ' if self.count else '') + ', '.join(lines)
+        data = body.encode('utf-8')
+        self._file.write(data)
+        self.count += len(lines)
+        self.bytes += len(data)
+
+    def write_array(self, write, chunk: int = 1 << 20) -> int:
+        """Write the elements as a JSON array through write(bytes); returns the bytes written."""
+        write(b'[')
+        sent = 1
+        if self._file is not None:
+            self._file.flush()
+            self._file.seek(0)
+            while True:
+                data = self._file.read(chunk)
+                if not data:
+                    break
+                write(data)
+                sent += len(data)
+        write(b']')
+        return sent + 1
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,1329 @@
+"""Conversion of parsed DXF segments into Plan2D elements.
+
+Two output modes are supported by `POST /api/dwg/to-plan2d`:
+- "cad": 1:1 hairline linework that keeps layer and color (`segments_to_plan2d_cad_elements`)
+- "simplified": the longest quantized segments as plain walls (`simplify_to_plan2d_elements`)
+- "instances": CAD linework plus block definitions and INSERT transforms (`block_instances_to_plan2d`)
+CAD arcs, circles and ellipses can also be kept analytic (`curves_to_plan2d_elements`).
+"""
+from __future__ import annotations
+
+from array import array
+
+from dwgimport.layers import AUTO_CLEAN_PATTERNS, classify_layers, layer_geometry_stats
+from dwgimport.segments import SegmentStore
+from dwgimport.simplify import douglas_peucker, visvalingam
+
+
+def _rgb_int_to_hex(rgb: int) -> str:
+    try:
+        v = int(rgb) & 0xFFFFFF
+        return '#%06x' % v
+    except Exception:
+        return '#111111'
+
+
+def _as_store(segs) -> SegmentStore:
+    if isinstance(segs, SegmentStore):
+        return segs
+    store = SegmentStore()
+    for s in segs:
+        store.add(float(s[0]), float(s[1]), float(s[2]), float(s[3]), int(s[4]) & 0xFFFFFF, s[5], s[6])
+    return store
+
+
+class _DedupTable:
+    # Open-addressing set of dedup keys for the memory-bounded import: each slot holds the key's
+    # hash and 1 + the index of its segment in the kept columns, where the key is recomputed on a
+    # hash match. Both columns come from MemoryBudget.table (memory-mapped when over budget).
+
+    __slots__ = ('hashes', 'index', 'mask', 'cols')
+
+    def __init__(self, n: int, memory, cols):
+        size = 16
+        while size < 2 * n:
+            size <<= 1
+        self.hashes = memory.table('q', size, 'dedup')
+        self.index = memory.table('q', size, 'dedup')
+        self.mask = size - 1
+        self.cols = cols
+
+    def _key(self, j: int):
+        x0, y0, x1, y1, rgb = self.cols
+        ax0, ay0, ax1, ay1 = x0[j], y0[j], x1[j], y1[j]
+        if ax0 > ax1 or (ax0 == ax1 and ay0 > ay1):
+            ax0, ax1 = ax1, ax0
+            ay0, ay1 = ay1, ay0
+        return (round(ax0, 6), round(ay0, 6), round(ax1, 6), round(ay1, 6), rgb[j])
+
+    def add(self, key) -> bool:
+        # True when the key is new; it then belongs to the next segment appended to the columns.
+        h = hash(key)
+        hashes, index, mask = self.hashes, self.index, self.mask
+        slot = h & mask
+        while True:
+            j = index[slot]
+            if not j:
+                hashes[slot] = h
+                index[slot] = len(self.cols[0]) + 1
+                return True
+            if hashes[slot] == h and self._key(j - 1) == key:
+                return False
+            slot = (slot + 1) & mask
+
+
+def _weld_targets(group, point, tol: float):
+    # Split one single-linkage cluster (sorted point ids, coordinates from point(k)) into
+    # [(representative, members)]. A cluster whose members all lie within tol of the member
+    # nearest its centroid (ties broken by the smaller (x, y)) moves there whole. A longer chain,
+    # such as a densely sampled curve, is cut into seeds taken in (x, y) order, each collecting
+    # the remaining members within tol of it, so no point moves further than tol.
+    import math
+    pts = [point(k) for k in group]
+    tol2 = tol * tol
+    gx = math.fsum(p[0] for p in pts) / len(pts)
+    gy = math.fsum(p[1] for p in pts) / len(pts)
+    rep = min(range(len(pts)), key=lambda i: ((pts[i][0] - gx) ** 2 + (pts[i][1] - gy) ** 2, pts[i]))
+    rx, ry = pts[rep]
+    if all((x - rx) * (x - rx) + (y - ry) * (y - ry) <= tol2 for (x, y) in pts):
+        return [(group[rep], group)]
+    inv = 1.0 / tol
+    floor = math.floor
+    cells = {}
+    order = sorted(range(len(pts)), key=pts.__getitem__)
+    for i in order:
+        cells.setdefault((floor(pts[i][0] * inv), floor(pts[i][1] * inv)), []).append(i)
+    taken = bytearray(len(pts))
+    out = []
+    for i in order:
+        if taken[i]:
+            continue
+        taken[i] = 1
+        sx, sy = pts[i]
+        cx = floor(sx * inv)
+        cy = floor(sy * inv)
+        members = [group[i]]
+        for ox in (-1, 0, 1):
+            for oy in (-1, 0, 1):
+                for j in cells.get((cx + ox, cy + oy), ()):
+                    if not taken[j]:
+                        dx = pts[j][0] - sx
+                        dy = pts[j][1] - sy
+                        if dx * dx + dy * dy <= tol2:
+                            taken[j] = 1
+                            members.append(group[j])
+        out.append((group[i], members))
+    return out
+
+
+def _weld_endpoints(xs0, ys0, xs1, ys1, tol: float):
+    # Cluster segment endpoints closer than tol (single linkage, union-find over a grid of cell
+    # size tol) and move each cluster to its representative (see _weld_targets: every point
+    # stays within tol of where it was). Clusters and representatives depend only on the set of
+    # points, not on their order. Returns the new x0, y0, x1, y1 columns and counts.
+    import math
+    from itertools import chain
+    n = len(xs0)
+    # Coincident endpoints are one point.
+    ids = {}
+    setdefault = ids.setdefault
+    ends = [setdefault(p, len(ids)) for p in zip(chain(xs0, xs1), chain(ys0, ys1))]
+    pts = list(ids)
+    m = len(pts)
+
+    # Cell keys as single ints (column * stride + row); non-finite points are left alone.
+    inv = 1.0 / tol
+    floor = math.floor
+    try:
+        grid = range(m)
+        cxs = [floor(x * inv) for (x, _y) in pts]
+        cys = [floor(y * inv) for (_x, y) in pts]
+    except (OverflowError, ValueError):
+        grid = [k for (k, (x, y)) in enumerate(pts) if x * inv - x * inv == 0.0 and y * inv - y * inv == 0.0]
+        cxs = [floor(pts[k][0] * inv) for k in grid]
+        cys = [floor(pts[k][1] * inv) for k in grid]
+    if not grid:
+        return xs0, ys0, xs1, ys1, { 'points': m, 'clusters': 0, 'moved': 0, 'split': 0 }
+    cy0 = min(cys) - 1
+    stride = max(cys) - cy0 + 2
+    keys = [cx * stride + (cy - cy0) for (cx, cy) in zip(cxs, cys)]
+    # Most cells hold one point; only cells with several get a member list.
+    first = dict(zip(keys, grid))
+    shared = {}
+    for (k, c) in zip(grid, keys):
+        j = first[c]
+        if j != k:
+            bucket = shared.get(c)
+            if bucket is None:
+                shared[c] = [j, k]
+            else:
+                bucket.append(k)
+
+    parent = list(range(m))
+
+    def find(k):
+        root = k
+        while parent[root] != root:
+            root = parent[root]
+        while parent[k] != root:
+            parent[k], k = root, parent[k]
+        return root
+
+    tol2 = tol * tol
+    linked = set()
+
+    def link(bucket, other):
+        for a in bucket:
+            ax, ay = pts[a]
+            for b in other:
+                if b == a:
+                    continue
+                bx, by = pts[b]
+                dx = ax - bx
+                dy = ay - by
+                if dx * dx + dy * dy <= tol2:
+                    ra = find(a)
+                    rb = find(b)
+                    if ra != rb:
+                        parent[rb] = ra
+                        linked.add(a)
+                        linked.add(b)
+
+    # Each cell against itself and its four forward neighbours, so every pair is tested once.
+    offsets = (1, stride - 1, stride, stride + 1)
+    for c in first:
+        near = [c + o for o in offsets if c + o in first] if (c + 1 in first or c + stride - 1 in first or c + stride in first or c + stride + 1 in first) else ()
+        if not near and c not in shared:
+            continue
+        bucket = shared.get(c) or (first[c],)
+        if len(bucket) > 1:
+            link(bucket, bucket)
+        for d in near:
+            link(bucket, shared.get(d) or (first[d],))
+
+    members = {}
+    for k in sorted(linked):
+        members.setdefault(find(k), []).append(k)
+    moved = 0
+    clusters = 0
+    split = 0
+    if members:
+        target = {}
+        for group in members.values():
+            parts = _weld_targets(group, pts.__getitem__, tol)
+            split += len(parts) > 1
+            for (rep, part) in parts:
+                if len(part) < 2:
+                    continue
+                clusters += 1
+                for k in part:
+                    if k != rep:
+                        target[k] = pts[rep]
+                moved += len(part) - 1
+        xs0, ys0, xs1, ys1 = array('d', xs0), array('d', ys0), array('d', xs1), array('d', ys1)
+        get = target.get
+        for (pos, k) in enumerate(ends):
+            p = get(k)
+            if p is not None:
+                if pos < n:
+                    xs0[pos], ys0[pos] = p
+                else:
+                    xs1[pos - n], ys1[pos - n] = p
+    meta = { 'points': m, 'clusters': clusters, 'moved': moved, 'split': split }
+    return xs0, ys0, xs1, ys1, meta
+
+
+def _weld_endpoints_bounded(xs0, ys0, xs1, ys1, tol: float, memory):
+    # _weld_endpoints for the memory-bounded import, with the same result. Its tables are typed
+    # columns from MemoryBudget.table (memory-mapped when over budget) instead of dicts and lists
+    # of tuples: distinct points in an open-addressing table (coordinates, slot -> 1 + point id),
+    # the grid cells in another (cell x, cell y, slot -> 1 + first point, point -> 1 + next point
+    # in its cell) and the union-find parents as 1 + parent (0 for a root).
+    import math
+    n = len(xs0)
+    total = 2 * n
+    size = 16
+    while size < 2 * total:
+        size <<= 1
+    mask = size - 1
+    slots = memory.table('I', size, 'weld')
+    px = memory.table('d', total, 'weld')
+    py = memory.table('d', total, 'weld')
+    ends = memory.table('I', total, 'weld')
+    m = 0
+    for pos in range(total):
+        if pos < n:
+            x, y = xs0[pos], ys0[pos]
+        else:
+            x, y = xs1[pos - n], ys1[pos - n]
+        slot = hash((x, y)) & mask
+        while True:
+            j = slots[slot]
+            if not j:
+                px[m], py[m] = x, y
+                m += 1
+                slots[slot] = m
+                ends[pos] = m - 1
+                break
+            if px[j - 1] == x and py[j - 1] == y:
+                ends[pos] = j - 1
+                break
+            slot = (slot + 1) & mask
+    slots = None
+
+    inv = 1.0 / tol
+    floor = math.floor
+    size = 16
+    while size < 2 * m:
+        size <<= 1
+    cmask = size - 1
+    ckx = memory.table('q', size, 'weld')
+    cky = memory.table('q', size, 'weld')
+    head = memory.table('I', size, 'weld')
+    nxt = memory.table('I', m, 'weld')
+
+    def _cell(cx: int, cy: int) -> int:
+        # Slot of cell (cx, cy), or the empty slot where it would go.
+        slot = hash((cx, cy)) & cmask
+        while head[slot] and (ckx[slot] != cx or cky[slot] != cy):
+            slot = (slot + 1) & cmask
+        return slot
+
+    cells = 0
+    for k in range(m):
+        x, y = px[k], py[k]
+        # Non-finite points are left alone.
+        if not (x * inv - x * inv == 0.0 and y * inv - y * inv == 0.0):
+            continue
+        slot = _cell(floor(x * inv), floor(y * inv))
+        if not head[slot]:
+            ckx[slot], cky[slot] = floor(x * inv), floor(y * inv)
+            cells += 1
+        nxt[k] = head[slot]
+        head[slot] = k + 1
+    if not cells:
+        return xs0, ys0, xs1, ys1, { 'points': m, 'clusters': 0, 'moved': 0, 'split': 0 }
+
+    parent = memory.table('I', m, 'weld')
+    linked = memory.table('B', m, 'weld')
+
+    def find(k):
+        root = k
+        while parent[root]:
+            root = parent[root] - 1
+        while parent[k] and parent[k] != root + 1:
+            parent[k], k = root + 1, parent[k] - 1
+        return root
+
+    def _points(slot: int) -> list:
+        out = []
+        k = head[slot]
+        while k:
+            out.append(k - 1)
+            k = nxt[k - 1]
+        return out
+
+    tol2 = tol * tol
+
+    def link(bucket, other):
+        for a in bucket:
+            ax, ay = px[a], py[a]
+            for b in other:
+                if b == a:
+                    continue
+                dx = ax - px[b]
+                dy = ay - py[b]
+                if dx * dx + dy * dy <= tol2:
+                    ra = find(a)
+                    rb = find(b)
+                    if ra != rb:
+                        parent[rb] = ra + 1
+                        linked[a] = 1
+                        linked[b] = 1
+
+    # Each cell against itself and its four forward neighbours, as in _weld_endpoints.
+    for slot in range(size):
+        if not head[slot]:
+            continue
+        cx, cy = ckx[slot], cky[slot]
+        bucket = None
+        for (ox, oy) in ((0, 1), (1, -1), (1, 0), (1, 1)):
+            other = _cell(cx + ox, cy + oy)
+            if head[other]:
+                if bucket is None:
+                    bucket = _points(slot)
+                link(bucket, _points(other))
+        if nxt[head[slot] - 1]:
+            if bucket is None:
+                bucket = _points(slot)
+            link(bucket, bucket)
+    ckx = cky = head = nxt = None
+
+    members = {}
+    for k in range(m):
+        if linked[k]:
+            members.setdefault(find(k), []).append(k)
+    parent = linked = None
+    moved = 0
+    clusters = 0
+    split = 0
+    if members:
+        target = memory.table('I', m, 'weld')
+        for group in members.values():
+            parts = _weld_targets(group, lambda k: (px[k], py[k]), tol)
+            split += len(parts) > 1
+            for (rep, part) in parts:
+                if len(part) < 2:
+                    continue
+                clusters += 1
+                for k in part:
+                    if k != rep:
+                        target[k] = rep + 1
+                moved += len(part) - 1
+        members = None
+        xs0, ys0, xs1, ys1 = [memory.column(col, 'd', 'weld') for col in (xs0, ys0, xs1, ys1)]
+        for pos in range(total):
+            rep = target[ends[pos]]
+            if rep:
+                if pos < n:
+                    xs0[pos], ys0[pos] = px[rep - 1], py[rep - 1]
+                else:
+                    xs1[pos - n], ys1[pos - n] = px[rep - 1], py[rep - 1]
+    meta = { 'points': m, 'clusters': clusters, 'moved': moved, 'split': split }
+    return xs0, ys0, xs1, ys1, meta
+
+
+def _merge_collinear(kx0, ky0, kx1, ky1, krgb, klid, kept, tol: float):
+    # Union collinear segments that overlap or touch (gap <= tol), per layer and color.
+    # Segments are taken longest first and grow runs. A run is a line through its outermost
+    # endpoints, so it straightens as it grows. A segment joins the run that it overlaps or touches
+    # and whose line both of its endpoints lie within tol of. It is never longer than the run, so
+    # this bounds its angle to the run by about 2 * tol / its own length. Runs the segment bridges
+    # are joined when the other run's outermost endpoints also lie within tol of the joined line.
+    # Runs are found through a grid of cells ((layer, color, direction bucket) -> (cell along, cell
+    # across)) that each run is filed in along its line, under its first segment's direction bucket
+    # and in that bucket's frame, so parallel lines fall in different cells. A segment looks up the
+    # cells within reach of its endpoints in the direction buckets within its angle tolerance of its
+    # own (the first segment of a run is at least as long, so about 4 * tol / length covers both).
+    # A merged run keeps the outermost original endpoints and takes the place of its first segment.
+    # Returns ({first index: (x0, y0, x1, y1)}, {indices absorbed into another segment's run}).
+    import math
+    merged = {}
+    absorbed = set()
+    if not kept:
+        return merged, absorbed
+    hypot = math.hypot
+    floor = math.floor
+    lengths = {}
+    for i in kept:
+        d = hypot(kx1[i] - kx0[i], ky1[i] - ky0[i])
+        # Segments no longer than tol (zero-length ones included) and non-finite ones have no
+        # direction to speak of.
+        if d > tol and d - d == 0.0:
+            lengths[i] = d
+    if len(lengths) < 2:
+        return merged, absorbed
+    order = sorted(lengths, key=lambda i: (-lengths[i], i))
+    n_dir = 64
+    aq = math.pi / n_dir
+    inv_aq = 1.0 / aq
+    cos_q = [math.cos((q + 0.5) * aq) for q in range(n_dir)]
+    sin_q = [math.sin((q + 0.5) * aq) for q in range(n_dir)]
+    atan2 = math.atan2
+    # Runs are filed every half cell along their line. A point of the line within tol of a segment
+    # endpoint is then within a quarter cell plus tol of a filed point along the bucket's direction
+    # and, as the line is within aq of it, a quarter cell times aq plus tol across; up to another
+    # tol each once later members have moved the line.
+    cell = max(lengths[order[len(order) // 2]], 8.0 * tol)
+    step = 0.5 * cell
+    reach = 0.25 * cell + 2.0 * tol
+    inv_cell = 1.0 / cell
+    reach_v = 0.25 * cell * aq + 2.0 * tol
+    inv_cell_v = 0.5 / reach_v
+
+    # Run r: outermost endpoints (rx0[r], ry0[r]) and (rx1[r], ry1[r]), its segments in members[r],
+    # filed under direction bucket rq[r]. A run joined into another points to it in up[r].
+    rx0 = []
+    ry0 = []
+    rx1 = []
+    ry1 = []
+    members = []
+    rq = []
+    up = []
+    grid = {}
+
+    def _find(r: int) -> int:
+        while up[r] != r:
+            up[r] = up[up[r]]
+            r = up[r]
+        return r
+
+    def _file(r: int, lid, rgb, x0: float, y0: float, x1: float, y1: float) -> None:
+        q = rq[r]
+        c, s = cos_q[q], sin_q[q]
+        t0 = x0 * c + y0 * s
+        v0 = y0 * c - x0 * s
+        dt = x1 * c + y1 * s - t0
+        dv = y1 * c - x1 * s - v0
+        n = int(hypot(x1 - x0, y1 - y0) / step) + 1
+        cells = grid.get((lid, rgb, q))
+        if cells is None:
+            cells = grid[(lid, rgb, q)] = {}
+        last = None
+        for k in range(n + 1):
+            f = k / n
+            spot = (floor((t0 + dt * f) * inv_cell), floor((v0 + dv * f) * inv_cell_v))
+            if spot != last:
+                last = spot
+                at = cells.get(spot)
+                if at is None:
+                    cells[spot] = [r]
+                elif at[-1] != r:
+                    at.append(r)
+
+    def _fit(r: int, xa: float, ya: float, xb: float, yb: float):
+        # (distance off run r's line, along-line positions of a and b, run length), or None if a or
+        # b is off the line by more than tol or the two do not overlap or touch.
+        px, py = rx0[r], ry0[r]
+        dx = rx1[r] - px
+        dy = ry1[r] - py
+        d = hypot(dx, dy)
+        off = max(abs((xa - px) * dy - (ya - py) * dx), abs((xb - px) * dy - (yb - py) * dx))
+        if off > tol * d:
+            return None
+        ta = ((xa - px) * dx + (ya - py) * dy) / d
+        tb = ((xb - px) * dx + (yb - py) * dy) / d
+        if min(ta, tb) > d + tol or max(ta, tb) < -tol:
+            return None
+        return off / d, ta, tb, d
+
+    def _extend(r: int, ta: float, tb: float, d: float, xa: float, ya: float, xb: float, yb: float) -> bool:
+        # Move run r's outermost endpoints out to a and b where they lie beyond them.
+        lo = min(ta, tb)
+        hi = max(ta, tb)
+        grew = False
+        if lo < 0.0:
+            rx0[r], ry0[r] = (xa, ya) if ta <= tb else (xb, yb)
+            grew = True
+        if hi > d:
+            rx1[r], ry1[r] = (xb, yb) if ta <= tb else (xa, ya)
+            grew = True
+        return grew
+
+    for i in order:
+        x0, y0, x1, y1 = kx0[i], ky0[i], kx1[i], ky1[i]
+        lid, rgb = klid[i], krgb[i]
+        ang = atan2(y1 - y0, x1 - x0) % math.pi
+        q = int(ang * inv_aq) % n_dir
+        w = 4.0 * tol / lengths[i]
+        q_lo = floor((ang - w) * inv_aq)
+        q_hi = floor((ang + w) * inv_aq)
+        if q_lo == q_hi:
+            qs = (q, )
+        elif q_hi - q_lo >= n_dir - 1:
+            qs = range(n_dir)
+        else:
+            qs = [k % n_dir for k in range(q_lo, q_hi + 1)]
+        near = set()
+        for qq in qs:
+            cells = grid.get((lid, rgb, qq))
+            if cells is None:
+                continue
+            c, s = cos_q[qq], sin_q[qq]
+            ta = x0 * c + y0 * s
+            tb = x1 * c + y1 * s
+            va = y0 * c - x0 * s
+            vb = y1 * c - x1 * s
+            if ta > tb:
+                ta, tb, va, vb = tb, ta, vb, va
+            ct0 = floor((ta - reach) * inv_cell)
+            ct1 = floor((ta + reach) * inv_cell)
+            ct2 = floor((tb - reach) * inv_cell)
+            ct3 = floor((tb + reach) * inv_cell)
+            if ct2 <= ct1 + 1:
+                # Short against a cell: one block of cells around both endpoints.
+                spans = ((ct0, ct3, min(va, vb)), )
+                v_hi = max(va, vb)
+            else:
+                spans = ((ct0, ct1, va), (ct2, ct3, vb))
+                v_hi = None
+            for (lo, hi, pv) in spans:
+                cv0 = floor((pv - reach_v) * inv_cell_v)
+                cv1 = floor(((pv if v_hi is None else v_hi) + reach_v) * inv_cell_v)
+                for ct in range(lo, hi + 1):
+                    for cv in range(cv0, cv1 + 1):
+                        found = cells.get((ct, cv))
+                        if found:
+                            near.update(found)
+        fits = []
+        if len(near) > 1:
+            near = {_find(r) for r in near}
+        elif near:
+            near = (_find(near.pop()), )
+        for r in near:
+            fit = _fit(r, x0, y0, x1, y1)
+            if fit is not None:
+                fits.append((fit, r))
+        if not fits:
+            r = len(up)
+            rx0.append(x0)
+            ry0.append(y0)
+            rx1.append(x1)
+            ry1.append(y1)
+            members.append([i])
+            rq.append(q)
+            up.append(r)
+            _file(r, lid, rgb, x0, y0, x1, y1)
+            continue
+        # The nearest line first.
+        fits.sort()
+        (_off, ta, tb, d), r = fits[0]
+        members[r].append(i)
+        if _extend(r, ta, tb, d, x0, y0, x1, y1):
+            _file(r, lid, rgb, x0, y0, x1, y1)
+        for (_fit_o, o) in fits[1:]:
+            # The segment bridges r and o: join them if o's ends lie on the extended line.
+            fit = _fit(r, rx0[o], ry0[o], rx1[o], ry1[o])
+            if fit is None:
+                continue
+            _off, ta, tb, d = fit
+            ox0, oy0, ox1, oy1 = rx0[o], ry0[o], rx1[o], ry1[o]
+            px, py, qx, qy = rx0[r], ry0[r], rx1[r], ry1[r]
+            _extend(r, ta, tb, d, ox0, oy0, ox1, oy1)
+            # The joined line must still pass within tol of the ends it dropped.
+            if _fit(r, px, py, qx, qy) is None or _fit(r, ox0, oy0, ox1, oy1) is None:
+                rx0[r], ry0[r], rx1[r], ry1[r] = px, py, qx, qy
+                continue
+            up[o] = r
+            if len(members[o]) > len(members[r]):
+                members[r], members[o] = members[o], members[r]
+            members[r].extend(members[o])
+            members[o] = None
+
+    for r in range(len(up)):
+        run = members[r]
+        if up[r] != r or len(run) < 2:
+            continue
+        first = min(run)
+        merged[first] = (rx0[r], ry0[r], rx1[r], ry1[r])
+        absorbed.update(i for i in run if i != first)
+    return merged, absorbed
+
+
+def _chain_rows(rows):
+    # Link segments that share an endpoint, layer and color into polylines.
+    # Endpoints are hashed exactly (after weld). A chain continues through a vertex when the
+    # next segment in input order starts there (source polylines stay whole) or when exactly
+    # two segments meet there; it stops at branch points. Returns chains in the order of their
+    # first segment as (flat [x0, y0, x1, y1, ...], closed, rgb, layer, segment count).
+    ends = {}
+    for i, (x0, y0, x1, y1, rgb, layer) in enumerate(rows):
+        ends.setdefault((x0, y0, rgb, layer), []).append(i)
+        if (x1, y1) != (x0, y0):
+            ends.setdefault((x1, y1, rgb, layer), []).append(i)
+    used = bytearray(len(rows))
+
+    def _next(prefer: int, x: float, y: float, rgb, layer):
+        at = ends.get((x, y, rgb, layer))
+        if not at:
+            return None
+        if 0 <= prefer < len(rows) and not used[prefer] and prefer in at:
+            return prefer
+        if len(at) == 2:
+            for j in at:
+                if not used[j]:
+                    return j
+        return None
+
+    chains = []
+    for i, (x0, y0, x1, y1, rgb, layer) in enumerate(rows):
+        if used[i]:
+            continue
+        used[i] = 1
+        fwd = [(x0, y0), (x1, y1)]
+        last = i
+        while True:
+            x, y = fwd[-1]
+            j = _next(last + 1, x, y, rgb, layer)
+            if j is None:
+                break
+            used[j] = 1
+            a0, b0, a1, b1 = rows[j][:4]
+            fwd.append((a1, b1) if (a0, b0) == (x, y) else (a0, b0))
+            last = j
+        back = []
+        first = i
+        while (back[-1] if back else fwd[0]) != fwd[-1]:
+            x, y = back[-1] if back else fwd[0]
+            j = _next(first - 1, x, y, rgb, layer)
+            if j is None:
+                break
+            used[j] = 1
+            a0, b0, a1, b1 = rows[j][:4]
+            back.append((a0, b0) if (a1, b1) == (x, y) else (a1, b1))
+            first = j
+        pts = back[::-1] + fwd
+        closed = len(pts) > 3 and pts[0] == pts[-1]
+        if closed:
+            pts.pop()
+        flat = []
+        for (x, y) in pts:
+            flat.append(x)
+            flat.append(y)
+        chains.append((flat, closed, rgb, layer, len(pts) - (0 if closed else 1)))
+    return chains
+
+
+def _pair_walls(cand, min_th: float, max_th: float):
+    # Wall faces: pairs of parallel segments (within about 1.5 degrees) whose offset is between
+    # min_th and max_th and which overlap along the line by at least half the shorter one.
+    # Segments are indexed per 1-degree direction bin (segments near a bin edge in both bins)
+    # in a grid of (offset, position along the line) cells, so each segment is only compared
+    # with its neighbours on the side of larger offset. Candidates are measured in the frame of
+    # the longer segment. Pairs are accepted closest first; a face can pair several times along
+    # its length (e.g. the long face opposite a door).
+    # Returns ([(x0, y0, x1, y1, thickness)] centerlines, {indices of consumed faces}).
+    import math
+    n = len(cand)
+    if n < 2 or not (max_th > 0.0):
+        return [], set()
+    deg = 180.0 / math.pi
+    groups = {}
+    for k, (_l2, x0, y0, x1, y1) in enumerate(cand):
+        a = math.atan2(y1 - y0, x1 - x0) * deg % 180.0
+        b = int(a + 0.5)
+        groups.setdefault(b % 180, []).append(k)
+        if a - b > 0.25:
+            groups.setdefault((b + 1) % 180, []).append(k)
+        elif a - b < -0.25:
+            groups.setdefault((b - 1) % 180, []).append(k)
+
+    slack = 0.05 * max_th
+    found = set()
+    pairs = []
+    for (g, members) in groups.items():
+        if len(members) < 2:
+            continue
+        a = math.radians(g)
+        c = math.cos(a)
+        s = math.sin(a)
+        proj = {}
+        lens = []
+        for k in members:
+            _l2, x0, y0, x1, y1 = cand[k]
+            t0 = x0 * c + y0 * s
+            t1 = x1 * c + y1 * s
+            if t0 > t1:
+                t0, t1 = t1, t0
+            proj[k] = (((y0 + y1) * c - (x0 + x1) * s) * 0.5, t0, t1)
+            lens.append(t1 - t0)
+        lens.sort()
+        cell_o = max_th + slack
+        cell_t = max(max_th * 4.0, lens[len(lens) // 2])
+        cells = {}
+        for k in members:
+            o, t0, t1 = proj[k]
+            ko = int(math.floor(o / cell_o))
+            k0 = int(math.floor(t0 / cell_t))
+            k1 = min(int(math.floor(t1 / cell_t)), k0 + 256)
+            for kt in range(k0, k1 + 1):
+                cells.setdefault((ko, kt), []).append(k)
+        for i in members:
+            oi, ti0, ti1 = proj[i]
+            ko = int(math.floor(oi / cell_o))
+            k0 = int(math.floor(ti0 / cell_t))
+            k1 = min(int(math.floor(ti1 / cell_t)), k0 + 256)
+            seen = set()
+            for kt in range(k0, k1 + 1):
+                for ko2 in (ko, ko + 1):
+                    for j in cells.get((ko2, kt), ()):
+                        if j in seen:
+                            continue
+                        seen.add(j)
+                        oj, tj0, tj1 = proj[j]
+                        d = oj - oi
+                        if d < min_th - slack or d > max_th + slack or tj1 < ti0 or tj0 > ti1:
+                            continue
+                        key = (i, j) if i < j else (j, i)
+                        if key in found:
+                            continue
+                        found.add(key)
+                        pair = _measure_pair(cand[i], cand[j], c, s)
+                        if pair is not None and min_th <= pair[0] <= max_th:
+                            pairs.append(pair + (i, j))
+
+    pairs.sort()
+    used = {}
+    walls = []
+    for (d, _nov, c, s, om, ti0, ti1, tj0, tj1, i, j) in pairs:
+        lo = ti0 if ti0 > tj0 else tj0
+        hi = ti1 if ti1 < tj1 else tj1
+        tol = 0.5 * d
+        if any(min(b, hi) - max(a, lo) > tol for (a, b) in used.get(i, ())):
+            continue
+        if any(min(b, hi) - max(a, lo) > tol for (a, b) in used.get(j, ())):
+            continue
+        used.setdefault(i, []).append((lo, hi))
+        used.setdefault(j, []).append((lo, hi))
+        # Faces that end together (e.g. inner and outer face at a corner) end the wall midway.
+        if abs(ti0 - tj0) <= 1.5 * d:
+            lo = (ti0 + tj0) * 0.5
+        if abs(ti1 - tj1) <= 1.5 * d:
+            hi = (ti1 + tj1) * 0.5
+        walls.append((lo * c - om * s, lo * s + om * c, hi * c - om * s, hi * s + om * c, d))
+
+    consumed = set()
+    for (k, spans) in used.items():
+        _l2, x0, y0, x1, y1 = cand[k]
+        if sum(b - a for (a, b) in spans) >= 0.9 * math.hypot(x1 - x0, y1 - y0):
+            consumed.add(k)
+    return walls, consumed
+
+
+def _measure_pair(a, b, gc: float, gs: float):
+    # Offset and overlap of two near-parallel segments along the longer one's direction
+    # (oriented like the group direction gc, gs). Returns (thickness, -overlap, c, s,
+    # centerline offset, a's span, b's span), or None when they overlap by less than the
+    # thickness or by less than half the shorter segment.
+    import math
+    long_ = a if a[0] >= b[0] else b
+    _l2, x0, y0, x1, y1 = long_
+    ln = math.sqrt(long_[0])
+    if not (ln > 0.0):
+        return None
+    c = (x1 - x0) / ln
+    s = (y1 - y0) / ln
+    if c * gc + s * gs < 0.0:
+        c, s = -c, -s
+    spans = []
+    for (_l2, x0, y0, x1, y1) in (a, b):
+        t0 = x0 * c + y0 * s
+        t1 = x1 * c + y1 * s
+        if t0 > t1:
+            t0, t1 = t1, t0
+        spans.append((((y0 + y1) * c - (x0 + x1) * s) * 0.5, t0, t1))
+    (oa, ta0, ta1), (ob, tb0, tb1) = spans
+    d = abs(ob - oa)
+    ov = min(ta1, tb1) - max(ta0, tb0)
+    if ov < d or ov < 0.5 * min(ta1 - ta0, tb1 - tb0):
+        return None
+    return (d, -ov, c, s, (oa + ob) * 0.5, ta0, ta1, tb0, tb1)
+
+
+def simplify_to_plan2d_elements(segs, *, units: str, max_walls: int, min_len_mm: float, quant_mm: float, thickness_m: float, level: int,
+                                pair_walls: bool = False, wall_min_mm: float = 50.0, wall_max_mm: float = 600.0):
+    # With pair_walls=True, parallel wall faces wall_min_mm..wall_max_mm apart become one
+    # centerline wall with the measured thickness (before the max_walls cap).
+    segs = _as_store(segs)
+    scale_to_m = 0.001 if units == 'mm' else 1.0
+    q = float(quant_mm) if quant_mm and quant_mm > 0 else 10.0
+    min_len2 = float(min_len_mm) * float(min_len_mm)
+
+    def _qv(v: float) -> float:
+        return round(v / q) * q
+
+    # Dedup on quantized integer-ish coords
+    seen = set()
+    cand = []  # tuples: (len2, x0,y0,x1,y1) in mm
+    for x0, y0, x1, y1, rgb_key in zip(segs.x0, segs.y0, segs.x1, segs.y1, segs.rgb):
+        x0q = _qv(x0)
+        y0q = _qv(y0)
+        x1q = _qv(x1)
+        y1q = _qv(y1)
+        dx = x1q - x0q
+        dy = y1q - y0q
+        l2 = dx * dx + dy * dy
+        if not (l2 == l2) or l2 < min_len2:
+            continue
+        ax0, ay0, ax1, ay1 = x0q, y0q, x1q, y1q
+        if ax0 > ax1 or (ax0 == ax1 and ay0 > ay1):
+            ax0, ax1 = ax1, ax0
+            ay0, ay1 = ay1, ay0
+        # Keep colors distinct in the dedupe key.
+        key = (int(round(ax0)), int(round(ay0)), int(round(ax1)), int(round(ay1)), rgb_key)
+        if key in seen:
+            continue
+        seen.add(key)
+        cand.append((l2, x0q, y0q, x1q, y1q))
+
+    pair_meta = None
+    if pair_walls and cand:
+        unit_mm = 1.0 if units == 'mm' else 1000.0
+        walls, consumed = _pair_walls(cand, float(wall_min_mm) / unit_mm, float(wall_max_mm) / unit_mm)
+        before = len(cand)
+        cand = [rec for (k, rec) in enumerate(cand) if k not in consumed]
+        for (x0, y0, x1, y1, th) in walls:
+            dx = x1 - x0
+            dy = y1 - y0
+            cand.append((dx * dx + dy * dy, x0, y0, x1, y1, th))
+        pair_meta = { 'segments': before, 'walls': len(walls), 'faces': len(consumed), 'after': len(cand) }
+
+    # Keep longest N
+    if max_walls and len(cand) > max_walls:
+        import heapq
+        heap = []
+        for rec in cand:
+            l2 = rec[0]
+            if len(heap) < max_walls:
+                heapq.heappush(heap, rec)
+            else:
+                if l2 > heap[0][0]:
+                    heapq.heapreplace(heap, rec)
+        cand = heap
+
+    elements = []
+    for rec in cand:
+        _l2, x0q, y0q, x1q, y1q = rec[:5]
+        elements.append({
+            'type': 'wall',
+            'x0': float(x0q) * scale_to_m,
+            'y0': float(y0q) * scale_to_m,
+            'x1': float(x1q) * scale_to_m,
+            'y1': float(y1q) * scale_to_m,
+            # Paired faces carry the measured wall thickness.
+            'thickness': float(rec[5]) * scale_to_m if len(rec) > 5 else float(thickness_m),
+            'level': int(level),
+            'manual': True
+        })
+    return elements, { 'scaleToM': scale_to_m, 'quantMm': q, 'minLenMm': float(min_len_mm), 'dedup': len(seen), 'wallPairs': pair_meta }
+
+
+# Elements per emit call of segments_to_plan2d_cad_elements; RSS is checked once per batch.
+_EMIT_BATCH = 5000
+
+
+def segments_to_plan2d_cad_elements(
+    segs,
+    *,
+    units: str,
+    thickness_m: float,
+    level: int,
+    weld_mm: float,
+    max_walls: int,
+    min_len_mm: float,
+    auto_clean: bool,
+    chain: bool = False,
+    merge_tol: float = 0.0,
+    simplify_tol: float = 0.0,
+    simplify_method: str = 'dp',
+    memory=None,
+    timings=None,
+    emit=None
+):
+    # 1:1 “CAD linework” import (hairline rendering, keeps colors/layers).
+    # Applies light simplification to avoid “scattered dots” and annotation clutter:
+    # - drop segments shorter than min_len_mm
+    # - keep at most max_walls longest segments
+    # With merge_tol > 0, collinear segments that overlap or touch (gap <= merge_tol, input units)
+    # are merged per layer and color before the max_walls cap.
+    # With chain=True, segments sharing endpoints, layer and color become 'polyline' elements
+    # ({ points: [x0, y0, x1, y1, ...], closed }); unconnected segments stay walls.
+    # With simplify_tol > 0 (input units), each chain is simplified before it becomes an element:
+    # simplify_method 'dp' (Douglas-Peucker, distance bound) or 'vw' (Visvalingam-Whyatt, area tol^2).
+    # With a memory.MemoryBudget, each pass is a memory stage. With a budget set, weld and dedup
+    # keep their tables in typed columns, and over budget those, the segment columns and the
+    # surviving columns are spilled to memory-mapped files. With emit (a callable taking a list of
+    # elements) and RSS over the budget (or no memory given), elements are passed to emit in
+    # batches of _EMIT_BATCH as they are built, then the rest; the returned list is empty and
+    # meta['elements'] still counts them all.
+    # With a timings.StageTimings, each pass is timed along with its input and output counts.
+    segs = _as_store(segs)
+
+    def _stage(name: str, **sizes):
+        if memory is not None:
+            memory.enter(name)
+        if timings is not None:
+            timings.enter(name, **sizes)
+    layers = segs.layers
+    scale_to_m = 0.001 if units == 'mm' else 1.0
+    weld = float(weld_mm) if weld_mm and weld_mm > 0 else 0.0
+    elements = []
+    color_counts = {}
+    layer_counts = {}
+    # Dedup after optional weld (snap). Keeps colors distinct.
+    seen = set()
+
+    try:
+        max_walls_i = int(max_walls) if max_walls is not None else 0
+    except Exception:
+        max_walls_i = 0
+    if max_walls_i < 0:
+        max_walls_i = 0
+    try:
+        min_len = float(min_len_mm) if min_len_mm is not None else 0.0
+    except Exception:
+        min_len = 0.0
+    if min_len < 0.0:
+        min_len = 0.0
+    min_len2 = min_len * min_len
+
+    # Automatic cleanup of common non-floorplan layers (PDF underlay geometry, hatch, dimensions).
+    # The server drops these while parsing (layers.LayerFilter); this pass covers callers
+    # that parse without a layer filter.
+    drop_patterns = []
+    if auto_clean:
+        try:
+            import re
+            drop_patterns = [re.compile(p) for p in AUTO_CLEAN_PATTERNS]
+        except Exception:
+            drop_patterns = []
+
+    # Endpoint welding: clusters of endpoints within `weld` of each other share one point.
+    _stage('weld', inItems=len(segs))
+    if memory is not None and memory.over():
+        segs.spill(memory.spill_array)
+    sx0, sy0, sx1, sy1 = segs.x0, segs.y0, segs.x1, segs.y1
+    weld_meta = None
+    if weld > 0 and len(sx0) and memory is not None and memory.bounded:
+        sx0, sy0, sx1, sy1, weld_meta = _weld_endpoints_bounded(sx0, sy0, sx1, sy1, weld, memory)
+    elif weld > 0 and len(sx0):
+        sx0, sy0, sx1, sy1, weld_meta = _weld_endpoints(sx0, sy0, sx1, sy1, weld)
+        if memory is not None and memory.over() and sx0 is not segs.x0:
+            sx0, sy0, sx1, sy1 = [memory.spill_array(col, 'weld') for col in (sx0, sy0, sx1, sy1)]
+
+    # First pass: apply weld (if any), dedup, and drop tiny segments.
+    # Survivors are kept column-wise, with layer ids into segs.layers.
+    _stage('dedup', inItems=len(sx0))
+    kx0, ky0, kx1, ky1 = array('d'), array('d'), array('d'), array('d')
+    krgb = array('I')
+    klid = array(getattr(segs.layer_id, 'typecode', None) or segs.layer_id.format)
+    table = None
+    if memory is not None and memory.bounded:
+        table = _DedupTable(len(sx0), memory, (kx0, ky0, kx1, ky1, krgb))
+    for x0, y0, x1, y1, rgb, lid in zip(sx0, sy0, sx1, sy1, segs.rgb, segs.layer_id):
+        # Drop zero/very short segments (the "scattered dots" effect).
+        dx = x1 - x0
+        dy = y1 - y0
+        l2 = dx * dx + dy * dy
+        if min_len2 > 0.0 and (not (l2 == l2) or l2 < min_len2):
+            continue
+
+        # Dedup (order-invariant) after weld.
+        try:
+            ax0, ay0, ax1, ay1 = x0, y0, x1, y1
+            if ax0 > ax1 or (ax0 == ax1 and ay0 > ay1):
+                ax0, ax1 = ax1, ax0
+                ay0, ay1 = ay1, ay0
+            key = (round(ax0, 6), round(ay0, 6), round(ax1, 6), round(ay1, 6), rgb)
+            if table is not None:
+                if not table.add(key):
+                    continue
+            elif key in seen:
+                continue
+            else:
+                seen.add(key)
+        except Exception:
+            pass
+
+        kx0.append(x0)
+        ky0.append(y0)
+        kx1.append(x1)
+        ky1.append(y1)
+        krgb.append(rgb)
+        klid.append(lid)
+    seen = table = None
+    if memory is not None and memory.over():
+        kx0, ky0, kx1, ky1, krgb, klid = [memory.spill_array(col, 'kept') for col in (kx0, ky0, kx1, ky1, krgb, klid)]
+    sx0 = sy0 = sx1 = sy1 = None
+    kept = range(len(kx0))
+
+    # Layer classes from names and linework, once per layer (before any layer is dropped).
+    layer_classes = classify_layers(
+        layers,
+        layer_geometry_stats(kx0, ky0, kx1, ky1, klid, kept, len(layers)),
+        unit_mm=(1.0 if units == 'mm' else 1000.0)
+    )
+
+    # Apply automatic layer cleanup if it seems safe. Patterns are matched once per layer name.
+    cleaned_applied = False
+    dropped_by_layer = 0
+    if drop_patterns and len(kept):
+        try:
+            drop_lid = [False] * len(layers)
+            for lid, lyr in enumerate(layers):
+                if not lyr:
+                    continue
+                for pat in drop_patterns:
+                    try:
+                        if pat.search(lyr):
+                            drop_lid[lid] = True
+                            break
+                    except Exception:
+                        continue
+            cleaned = [i for i in kept if not drop_lid[klid[i]]]
+            dropped_by_layer = len(kept) - len(cleaned)
+
+            # Only apply if we still have a meaningful amount of geometry.
+            if cleaned and (len(cleaned) >= 500 or len(cleaned) >= int(0.05 * len(kept))):
+                kept = cleaned
+                cleaned_applied = True
+            else:
+                dropped_by_layer = 0
+        except Exception:
+            cleaned_applied = False
+            dropped_by_layer = 0
+
+    merge_meta = None
+    _stage('merge', inItems=len(kept))
+    if merge_tol and merge_tol > 0 and len(kept):
+        merged, absorbed = _merge_collinear(kx0, ky0, kx1, ky1, krgb, klid, kept, float(merge_tol))
+        for (i, (x0, y0, x1, y1)) in merged.items():
+            kx0[i], ky0[i], kx1[i], ky1[i] = x0, y0, x1, y1
+        merge_meta = { 'tol': float(merge_tol), 'before': len(kept), 'after': len(kept) - len(absorbed) }
+        if absorbed:
+            kept = [i for i in kept if i not in absorbed]
+
+    # If still too many, keep the longest max_walls_i segments.
+    if max_walls_i and len(kept) > max_walls_i:
+        _stage('topN', inItems=len(kept))
+        try:
+            import heapq
+            heap = []
+            for i in kept:
+                rec = (kx0[i], ky0[i], kx1[i], ky1[i], krgb[i], layers[klid[i]])
+                x0, y0, x1, y1, rgb, layer = rec
+                dx = x1 - x0
+                dy = y1 - y0
+                l2 = dx * dx + dy * dy
+                if len(heap) < max_walls_i:
+                    heapq.heappush(heap, (l2, rec))
+                else:
+                    if l2 > heap[0][0]:
+                        heapq.heapreplace(heap, (l2, rec))
+            rows = [h[1] for h in heap]
+        except Exception:
+            rows = [(kx0[i], ky0[i], kx1[i], ky1[i], krgb[i], layers[klid[i]]) for i in kept[:max_walls_i]]
+    else:
+        rows = ((kx0[i], ky0[i], kx1[i], ky1[i], krgb[i], layers[klid[i]]) for i in kept)
+    _stage('elements', inItems=min(len(kept), max_walls_i or len(kept)))
+    emitted = 0
+
+    def _emit(final: bool = False):
+        # Pass the finished elements to emit: a full batch once RSS is over the budget (and every
+        # batch after that), and the rest at the end if anything was emitted.
+        nonlocal elements, emitted
+        if not elements:
+            return
+        if not emitted and (final or (memory is not None and not memory.over())):
+            return
+        emit(elements)
+        emitted += len(elements)
+        elements = []
+
+    for (x0, y0, x1, y1, rgb, layer) in (rows if not chain else ()):
+
+        stroke = _rgb_int_to_hex(rgb)
+        color_counts[stroke] = int(color_counts.get(stroke) or 0) + 1
+        if layer:
+            layer_counts[layer] = int(layer_counts.get(layer) or 0) + 1
+
+        elements.append({
+            'type': 'wall',
+            'x0': x0 * scale_to_m,
+            'y0': y0 * scale_to_m,
+            'x1': x1 * scale_to_m,
+            'y1': y1 * scale_to_m,
+            # thickness is used for hit-testing; rendering is hairline for CAD elements.
+            'thickness': float(thickness_m),
+            'level': int(level or 0),
+            'wallRole': 'nonroom',
+            'manual': True,
+            'meta': {
+                'cad': True,
+                'stroke': stroke,
+                'layer': layer,
+                'rgb': rgb
+            }
+        })
+        if emit is not None and len(elements) >= _EMIT_BATCH:
+            _emit()
+
+    chain_meta = None
+    simplify_meta = None
+    if chain:
+        rows = list(rows)
+        chain_meta = { 'segments': len(rows), 'polylines': 0, 'polylineSegments': 0, 'closed': 0 }
+        simplify_path = None
+        if simplify_tol and simplify_tol > 0.0:
+            simplify_path = visvalingam if simplify_method == 'vw' else douglas_peucker
+            simplify_meta = { 'tol': float(simplify_tol), 'method': 'vw' if simplify_method == 'vw' else 'dp',
+                              'polylines': 0, 'vertices': 0, 'kept': 0 }
+        for (flat, closed, rgb, layer, nseg) in _chain_rows(rows):
+            if simplify_path is not None and nseg > 1:
+                reduced = simplify_path(flat, simplify_tol, closed)
+                # A closed chain needs three vertices to stay a ring.
+                if closed and len(reduced) < 6:
+                    reduced = flat
+                simplify_meta['polylines'] += 1
+                simplify_meta['vertices'] += len(flat) // 2
+                simplify_meta['kept'] += len(reduced) // 2
+                if len(reduced) < len(flat):
+                    flat = reduced
+                    nseg = len(flat) // 2 - (0 if closed else 1)
+            stroke = _rgb_int_to_hex(rgb)
+            color_counts[stroke] = int(color_counts.get(stroke) or 0) + nseg
+            if layer:
+                layer_counts[layer] = int(layer_counts.get(layer) or 0) + nseg
+            if nseg == 1:
+                # Unconnected segments keep the wall format.
+                el = {
+                    'type': 'wall',
+                    'x0': flat[0] * scale_to_m,
+                    'y0': flat[1] * scale_to_m,
+                    'x1': flat[2] * scale_to_m,
+                    'y1': flat[3] * scale_to_m,
+                }
+            else:
+                el = { 'type': 'polyline', 'points': [v * scale_to_m for v in flat], 'closed': closed }
+                chain_meta['polylines'] += 1
+                chain_meta['polylineSegments'] += nseg
+                chain_meta['closed'] += int(closed)
+            el.update({
+                'thickness': float(thickness_m),
+                'level': int(level or 0),
+                'wallRole': 'nonroom',
+                'manual': True,
+                'meta': {
+                    'cad': True,
+                    'stroke': stroke,
+                    'layer': layer,
+                    'rgb': rgb
+                }
+            })
+            elements.append(el)
+            if emit is not None and len(elements) >= _EMIT_BATCH:
+                _emit()
+        if simplify_meta is not None:
+            v = simplify_meta['vertices']
+            simplify_meta['ratio'] = round(simplify_meta['kept'] / float(v), 4) if v else 1.0
+
+    if emit is not None:
+        _emit(final=True)
+
+    colors_top = []
+    try:
+        colors_top = sorted(color_counts.items(), key=lambda kv: kv[1], reverse=True)[:40]
+    except Exception:
+        colors_top = list(color_counts.items())[:40]
+    layers_top = []
+    try:
+        layers_top = sorted(layer_counts.items(), key=lambda kv: kv[1], reverse=True)[:40]
+    except Exception:
+        layers_top = list(layer_counts.items())[:40]
+    if memory is not None:
+        memory.leave()
+    if timings is not None:
+        timings.leave(outItems=emitted + len(elements))
+
+    return elements, {
+        'scaleToM': scale_to_m,
+        'elements': emitted + len(elements),
+        'weldMm': weld,
+        'weld': weld_meta,
+        'minLenMm': float(min_len),
+        'maxWalls': int(max_walls_i) if max_walls_i else None,
+        'autoClean': bool(auto_clean),
+        'autoCleanApplied': bool(cleaned_applied),
+        'autoCleanDropped': int(dropped_by_layer),
+        'colorsTop': colors_top,
+        'layersTop': layers_top,
+        'layerClasses': layer_classes,
+        'chain': chain_meta,
+        'polylineSimplify': simplify_meta,
+        'collinearMerge': merge_meta
+    }
+
+
+def curves_to_plan2d_elements(curves, *, units: str, thickness_m: float, level: int):
+    # Analytic CAD curves (dxf.dxf_to_segments(..., curves=[])) as Plan2D elements, tessellated
+    # by the 2D renderer at the current zoom. Angles are radians, counter-clockwise from a0 to a1;
+    # ellipse a0/a1 are parametric angles and rot is the major axis angle.
+    scale_to_m = 0.001 if units == 'mm' else 1.0
+    elements = []
+    counts = { 'arc': 0, 'circle': 0, 'ellipse': 0 }
+    for (kind, cx, cy, rx, ry, rot, t0, t1, rgb, layer) in curves:
+        el = {
+            'type': kind,
+            'cx': cx * scale_to_m,
+            'cy': cy * scale_to_m,
+        }
+        if kind == 'ellipse':
+            el['rx'] = rx * scale_to_m
+            el['ry'] = ry * scale_to_m
+            el['rot'] = rot
+        else:
+            el['r'] = rx * scale_to_m
+        if kind != 'circle':
+            el['a0'] = t0
+            el['a1'] = t1
+        el.update({
+            'thickness': float(thickness_m),
+            'level': int(level or 0),
+            'wallRole': 'nonroom',
+            'manual': True,
+            'meta': {
+                'cad': True,
+                'stroke': _rgb_int_to_hex(rgb),
+                'layer': layer,
+                'rgb': rgb
+            }
+        })
+        counts[kind] = counts.get(kind, 0) + 1
+        elements.append(el)
+    return elements, {
+        'elements': len(elements),
+        'arcs': counts['arc'],
+        'circles': counts['circle'],
+        'ellipses': counts['ellipse']
+    }
+
+
+def block_instances_to_plan2d(blocks, inserts, *, units: str):
+    # Block-instanced output: each block's local linework once, plus one transform per INSERT.
+    # Block segments are [x0, y0, x1, y1, rgb, layer]; rgb 0 is BYBLOCK and takes the
+    # instance's color and layer when the instance has a color ('rgb' not None).
+    scale_to_m = 0.001 if units == 'mm' else 1.0
+    blocks_out = {}
+    for name, bsegs in blocks.items():
+        out = []
+        for s in bsegs:
+            try:
+                out.append([
+                    float(s[0]) * scale_to_m,
+                    float(s[1]) * scale_to_m,
+                    float(s[2]) * scale_to_m,
+                    float(s[3]) * scale_to_m,
+                    int(s[4]) & 0xFFFFFF,
+                    (str(s[5]) if s[5] else None)
+                ])
+            except Exception:
+                continue
+        if out:
+            blocks_out[name] = { 'segments': out }
+
+    instances = []
+    for (name, x, y, sx, sy, rot, layer, rgb) in inserts:
+        if name not in blocks_out:
+            continue
+        instances.append({
+            'block': name,
+            'x': float(x) * scale_to_m,
+            'y': float(y) * scale_to_m,
+            'sx': float(sx),
+            'sy': float(sy),
+            'rot': float(rot),
+            'layer': (str(layer) if layer else None),
+            'rgb': (int(rgb) & 0xFFFFFF if rgb is not None else None),
+            'stroke': (_rgb_int_to_hex(rgb) if rgb is not None else None)
+        })
+
+    block_segments = sum(len(b['segments']) for b in blocks_out.values())
+    expanded = sum(len(blocks_out[i['block']]['segments']) for i in instances)
+    return blocks_out, instances, {
+        'scaleToM': scale_to_m,
+        'blocks': len(blocks_out),
+        'instances': len(instances),
+        'blockSegments': int(block_segments),
+        'expandedSegments': int(expanded),
+        'reuse': round(expanded / block_segments, 2) if block_segments else 0.0
+    }
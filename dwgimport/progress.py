@@ -0,0 +1,153 @@
+"""Live progress of DWG -> Plan2D imports.
+
+A client that wants progress picks an id, subscribes to `GET /api/dwg/progress/{id}` (Server-Sent
+Events) and passes the same id as `progressId` to `POST /api/dwg/to-plan2d`. The server keeps one
+`ImportProgress` per id in a `ProgressStore`; the import moves it through STAGES and updates its
+counters, and each subscriber waits for the next change and sends a snapshot. The parser reports
+at most once per sampled batch of (code, value) pairs, so updates stay cheap while nobody listens.
+"""
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+STAGES = ('upload', 'convert', 'parse', 'flatten', 'simplify', 'encode')
+
+_ID_RE = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+# Seconds a subscriber waits for an import that has not started (a wrong or abandoned id).
+PENDING_TIMEOUT = 120.0
+
+
+def valid_id(value) -> bool:
+    return isinstance(value, str) and bool(_ID_RE.match(value))
+
+
+class ImportProgress:
+    """Stage, byte and entity counters of one import; every change wakes the waiting subscribers."""
+
+    __slots__ = ('id', 'stage', 'stages', 'started', 'stage_started', 'bytes_read', 'bytes_total',
+                 'counts', 'done', 'error', 'version', 'updated', '_cond')
+
+    def __init__(self, import_id: str):
+        self.id = import_id
+        self.version = 0
+        self._cond = threading.Condition()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.stage = 'pending'
+        # Finished stages: [name, milliseconds].
+        self.stages = []
+        self.started = time.monotonic()
+        self.stage_started = self.started
+        self.bytes_read = 0
+        self.bytes_total = 0
+        self.counts = {}
+        self.done = False
+        self.error = None
+        self.updated = self.started
+
+    def _changed(self) -> None:
+        self.version += 1
+        self.updated = time.monotonic()
+        self._cond.notify_all()
+
+    def enter(self, stage: str, bytes_total: int = 0) -> None:
+        # Start a stage; its byte counter restarts (bytes_total 0 = unknown).
+        with self._cond:
+            if self.done:
+                # A finished id used again: a new import starts over (the version keeps counting).
+                self._reset()
+            now = time.monotonic()
+            if self.stage != 'pending':
+                self.stages.append([self.stage, int(round((now - self.stage_started) * 1000.0))])
+            else:
+                # The clock starts with the import, not with the subscription.
+                self.started = now
+            self.stage = stage
+            self.stage_started = now
+            self.bytes_read = 0
+            self.bytes_total = max(0, int(bytes_total or 0))
+            self._changed()
+
+    def update(self, bytes_read: Optional[int] = None, **counts) -> None:
+        with self._cond:
+            if bytes_read is not None:
+                self.bytes_read = int(bytes_read)
+            for key, value in counts.items():
+                self.counts[key] = int(value or 0)
+            self._changed()
+
+    def finish(self, error: Optional[str] = None) -> None:
+        with self._cond:
+            if self.done:
+                return
+            if self.stage != 'pending':
+                self.stages.append([self.stage, int(round((time.monotonic() - self.stage_started) * 1000.0))])
+            self.stage = 'error' if error else 'done'
+            self.done = True
+            self.error = error
+            self._changed()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            now = time.monotonic()
+            out = {
+                'id': self.id,
+                'stage': self.stage,
+                'elapsedMs': int(round((now - self.started) * 1000.0)) if self.stage != 'pending' else 0,
+                'stageMs': int(round((now - self.stage_started) * 1000.0)),
+                'bytesRead': self.bytes_read,
+                'bytesTotal': self.bytes_total,
+                'counts': dict(self.counts),
+                'stages': [list(s) for s in self.stages],
+                'done': self.done,
+            }
+            if self.bytes_total:
+                out['fraction'] = round(min(1.0, self.bytes_read / float(self.bytes_total)), 4)
+            if self.error:
+                out['error'] = self.error
+            return out
+
+    def wait(self, version: int, timeout: float) -> int:
+        # Block until the version moves past `version` (or the timeout); returns the current version.
+        with self._cond:
+            if self.version == version and not self.done:
+                self._cond.wait(timeout)
+            return self.version
+
+
+class ProgressStore:
+    """Progress of recent imports by client-chosen id.
+
+    Over capacity, the least recently used trackers that are finished or not started yet are dropped;
+    a running import's tracker is kept, so the store can exceed capacity by the imports in flight.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.capacity = max(1, int(capacity))
+        self._items: 'OrderedDict[str, ImportProgress]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, create: bool = False) -> Optional[ImportProgress]:
+        # A subscriber may arrive before its import (or the other way round), so both create.
+        if not valid_id(key):
+            return None
+        with self._lock:
+            item = self._items.get(key)
+            if item is None and create:
+                item = ImportProgress(key)
+                self._items[key] = item
+                if len(self._items) > self.capacity:
+                    for (old, other) in list(self._items.items()):
+                        if len(self._items) <= self.capacity:
+                            break
+                        if old != key and (other.done or other.stage == 'pending'):
+                            del self._items[old]
+            if item is not None:
+                self._items.move_to_end(key)
+            return item
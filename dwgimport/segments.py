@@ -0,0 +1,125 @@
+"""Columnar storage for the 2D line segments of a DWG -> Plan2D import.
+
+A drawing can produce close to a million segments, so they are not kept as Python tuples:
+coordinates live in `array('d')` columns, colors in a uint32 column and layers as uint16 ids
+into an interned layer table. Iterating a store still yields (x0, y0, x1, y1, rgb, layer, aci).
+"""
+from __future__ import annotations
+
+from array import array
+from typing import Dict, List, Optional
+
+# ACI column value for segments without an explicit color number.
+ACI_NONE = -32768
+
+
+def aci_code(aci) -> int:
+    # ACI value as stored in the int16 column (out-of-range values count as none).
+    if aci is None:
+        return ACI_NONE
+    try:
+        a = int(aci)
+    except Exception:
+        return ACI_NONE
+    return a if -32767 <= a <= 32767 else ACI_NONE
+
+
+class SegmentStore:
+    """Append-only, column-wise list of 2D line segments."""
+
+    __slots__ = ('x0', 'y0', 'x1', 'y1', 'rgb', 'layer_id', 'aci', 'layers', '_layer_ids', '_id_cache')
+
+    def __init__(self):
+        self.x0 = array('d')
+        self.y0 = array('d')
+        self.x1 = array('d')
+        self.y1 = array('d')
+        self.rgb = array('I')
+        self.layer_id = array('H')
+        self.aci = array('h')
+        # Interned layer names; id 0 is "no layer".
+        self.layers: List[Optional[str]] = [None]
+        self._layer_ids: Dict[Optional[str], int] = { None: 0 }
+        # id(list of names) -> (list, ids) for block columns that are appended many times.
+        self._id_cache: Dict[int, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self.x0)
+
+    def __iter__(self):
+        layers = self.layers
+        acis = [None if a == ACI_NONE else a for a in self.aci]
+        return zip(self.x0, self.y0, self.x1, self.y1, self.rgb, [layers[i] for i in self.layer_id], acis)
+
+    def __getitem__(self, i: int):
+        a = self.aci[i]
+        return (self.x0[i], self.y0[i], self.x1[i], self.y1[i], self.rgb[i], self.layers[self.layer_id[i]], None if a == ACI_NONE else a)
+
+    def __getstate__(self):
+        return (self.x0, self.y0, self.x1, self.y1, self.rgb, self.layer_id, self.aci, self.layers)
+
+    def __setstate__(self, state):
+        self.x0, self.y0, self.x1, self.y1, self.rgb, self.layer_id, self.aci, self.layers = state
+        self._layer_ids = { name: i for (i, name) in enumerate(self.layers) }
+        self._id_cache = {}
+
+    def layer_index(self, name: Optional[str]) -> int:
+        lid = self._layer_ids.get(name)
+        if lid is None:
+            lid = len(self.layers)
+            if lid > 0xFFFF and self.layer_id.typecode == 'H':
+                self.layer_id = array('I', self.layer_id)
+            self.layers.append(name)
+            self._layer_ids[name] = lid
+        return lid
+
+    def layer_ids(self, names: list):
+        # Layer id column for a list of layer names (cached by list identity).
+        hit = self._id_cache.get(id(names))
+        if hit is not None and hit[0] is names:
+            return hit[1]
+        index = self.layer_index
+        ids = [index(n) for n in names]
+        if len(self._id_cache) < 4096:
+            self._id_cache[id(names)] = (names, ids)
+        return ids
+
+    def add(self, x0: float, y0: float, x1: float, y1: float, rgb: int, layer: Optional[str], aci) -> None:
+        self.x0.append(x0)
+        self.y0.append(y0)
+        self.x1.append(x1)
+        self.y1.append(y1)
+        self.rgb.append(rgb)
+        lid = self._layer_ids.get(layer)
+        self.layer_id.append(lid if lid is not None else self.layer_index(layer))
+        self.aci.append(aci_code(aci))
+
+    def extend_columns(self, x0, y0, x1, y1, rgb, layer_ids, aci) -> None:
+        # Append equally long columns; layer_ids from layer_ids(), aci already in aci_code() form.
+        self.x0.extend(x0)
+        self.y0.extend(y0)
+        self.x1.extend(x1)
+        self.y1.extend(y1)
+        self.rgb.extend(rgb)
+        self.layer_id.extend(layer_ids)
+        self.aci.extend(aci)
+
+    def extend(self, other: 'SegmentStore') -> None:
+        # Append another store, remapping its layer ids into this store's table.
+        remap = [self.layer_index(name) for name in other.layers]
+        if remap == list(range(len(remap))):
+            ids = other.layer_id
+        else:
+            ids = [remap[i] for i in other.layer_id]
+        self.extend_columns(other.x0, other.y0, other.x1, other.y1, other.rgb, ids, other.aci)
+
+    def spill(self, to_disk) -> None:
+        # Replace every column with to_disk(column, name), e.g. memory.MemoryBudget.spill_array;
+        # the columns may no longer be arrays, so the store is read-only afterwards.
+        self.x0 = to_disk(self.x0, 'segments')
+        self.y0 = to_disk(self.y0, 'segments')
+        self.x1 = to_disk(self.x1, 'segments')
+        self.y1 = to_disk(self.y1, 'segments')
+        self.rgb = to_disk(self.rgb, 'segments')
+        self.layer_id = to_disk(self.layer_id, 'segments')
+        self.aci = to_disk(self.aci, 'segments')
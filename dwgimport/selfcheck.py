@@ -0,0 +1,84 @@
+"""Self-check of the CAD-mode geometry passes that can lose linework without an error.
+
+    python -m dwgimport.selfcheck
+
+Each check builds a small synthetic drawing, runs it through `segments_to_plan2d_cad_elements`
+and compares the result with what the pass must preserve. Prints one line per check and exits
+with status 1 if any fails.
+"""
+from __future__ import annotations
+
+import math
+import random
+import sys
+
+from dwgimport.plan2d import segments_to_plan2d_cad_elements
+from dwgimport.segments import SegmentStore
+
+
+def _cad(store: SegmentStore, **opts):
+    args = dict(units='mm', thickness_m=0.02, level=0, weld_mm=0.0, max_walls=0, min_len_mm=0.0,
+                auto_clean=False)
+    args.update(opts)
+    return segments_to_plan2d_cad_elements(store, **args)
+
+
+def check_weld_dense_polyline() -> str:
+    # A 201-vertex polyline sampled every 0.5 mm, welded at 1 mm: points may move by at most
+    # 1 mm, so the polyline still spans about 100 mm and is not collapsed into one point.
+    store = SegmentStore()
+    for i in range(200):
+        store.add(i * 0.5, 0.0, (i + 1) * 0.5, 0.0, 0xFFFFFF, 'L', 7)
+    elements, meta = _cad(store, weld_mm=1.0)
+    xs = [v / 0.001 for el in elements for v in (el['x0'], el['x1'])]
+    span = max(xs) - min(xs)
+    length = sum(abs(el['x1'] - el['x0']) for el in elements) / 0.001
+    assert span >= 98.0, 'span %.3f mm (weld %r)' % (span, meta['weld'])
+    assert abs(length - span) < 1e-6, 'length %.3f mm over a %.3f mm span' % (length, span)
+    return 'span %.1f mm, %d elements, weld %r' % (span, len(elements), meta['weld'])
+
+
+def check_merge_noisy_dashes() -> str:
+    # 51 touching dashes along a 50 m line (and a slanted copy), endpoints off the line by up to
+    # 0.05 mm, merged at 1 mm: each line becomes one segment; a parallel line 5 mm away stays.
+    rng = random.Random(7)
+    store = SegmentStore()
+    for (ox, oy, ang) in ((0.0, 25000.0, 0.0), (0.0, 0.0, 0.3)):
+        c, s = math.cos(ang), math.sin(ang)
+        for k in range(51):
+            t0 = k * 50000.0 / 51
+            t1 = (k + 1) * 50000.0 / 51
+            n0 = rng.uniform(-0.05, 0.05)
+            n1 = rng.uniform(-0.05, 0.05)
+            store.add(ox + t0 * c - n0 * s, oy + t0 * s + n0 * c, ox + t1 * c - n1 * s, oy + t1 * s + n1 * c, 0xFFFFFF, 'L', 7)
+    store.add(0.0, 25005.0, 50000.0, 25005.0, 0xFFFFFF, 'L', 7)
+    elements, meta = _cad(store, merge_tol=1.0)
+    merge = meta['collinearMerge']
+    assert merge['after'] == 3, 'merged %d -> %d segments, expected 3' % (merge['before'], merge['after'])
+    longest = max(math.hypot(el['x1'] - el['x0'], el['y1'] - el['y0']) for el in elements) / 0.001
+    assert abs(longest - 50000.0) < 1.0, 'longest merged segment %.3f mm' % longest
+    return 'merged %d -> %d segments' % (merge['before'], merge['after'])
+
+
+CHECKS = (
+    check_weld_dense_polyline,
+    check_merge_noisy_dashes,
+)
+
+
+def main() -> int:
+    failed = 0
+    for check in CHECKS:
+        name = check.__name__[len('check_'):]
+        try:
+            detail = check()
+        except AssertionError as exc:
+            failed += 1
+            print('FAIL %s: %s' % (name, exc))
+        else:
+            print('ok   %s: %s' % (name, detail))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""Polyline simplification for the DWG -> Plan2D import.
+
+Paths are flat [x0, y0, x1, y1, ...] lists, as in polyline elements. `douglas_peucker` keeps
+the vertices a path needs to stay within a distance tolerance of the original
+(Ramer-Douglas-Peucker, iterative, distances to the segment rather than the infinite line).
+`visvalingam` removes the vertex spanning the smallest triangle with its neighbours until
+every remaining triangle is at least tol^2 (Visvalingam-Whyatt, effective areas kept
+monotone); it keeps the overall shape of noisy runs better, without a distance bound.
+"""
+from __future__ import annotations
+
+import heapq
+from typing import List, Sequence
+
+
+def _mark(xs, ys, first: int, last: int, tol2: float, keep: List[bool]) -> None:
+    stack = [(first, last)]
+    while stack:
+        a, b = stack.pop()
+        if b <= a + 1:
+            continue
+        ax, ay = xs[a], ys[a]
+        bx, by = xs[b], ys[b]
+        dx = bx - ax
+        dy = by - ay
+        dd = dx * dx + dy * dy
+        best = -1.0
+        idx = -1
+        for i in range(a + 1, b):
+            px = xs[i] - ax
+            py = ys[i] - ay
+            if dd > 0.0:
+                t = px * dx + py * dy
+                if t <= 0.0:
+                    d2 = px * px + py * py
+                elif t >= dd:
+                    qx = xs[i] - bx
+                    qy = ys[i] - by
+                    d2 = qx * qx + qy * qy
+                else:
+                    c = px * dy - py * dx
+                    d2 = c * c / dd
+            else:
+                d2 = px * px + py * py
+            if d2 > best:
+                best = d2
+                idx = i
+        if best > tol2:
+            keep[idx] = True
+            stack.append((a, idx))
+            stack.append((idx, b))
+
+
+def douglas_peucker(points: Sequence[float], tol: float, closed: bool = False) -> List[float]:
+    """Simplified copy of a flat path. The end points are always kept; a closed path (whose
+    first point is not repeated at the end) is split at the vertex farthest from its first."""
+    n = len(points) // 2
+    if n <= 2 or not (tol > 0.0):
+        return list(points[:2 * n])
+    xs = list(points[0:2 * n:2])
+    ys = list(points[1:2 * n:2])
+    keep = [False] * n
+    keep[0] = True
+    tol2 = tol * tol
+    if closed:
+        x0, y0 = xs[0], ys[0]
+        far = max(range(1, n), key=lambda i: (xs[i] - x0) ** 2 + (ys[i] - y0) ** 2)
+        keep[far] = True
+        # Back to the first point through an appended copy of it.
+        xs.append(x0)
+        ys.append(y0)
+        keep.append(True)
+        _mark(xs, ys, 0, far, tol2, keep)
+        _mark(xs, ys, far, n, tol2, keep)
+        keep.pop()
+    else:
+        keep[n - 1] = True
+        _mark(xs, ys, 0, n - 1, tol2, keep)
+    out: List[float] = []
+    for i in range(n):
+        if keep[i]:
+            out.append(xs[i])
+            out.append(ys[i])
+    return out
+
+
+def visvalingam(points: Sequence[float], tol: float, closed: bool = False) -> List[float]:
+    """Simplified copy of a flat path: vertices whose effective triangle area is under tol^2
+    are removed, smallest first. Open paths keep their end points; closed paths keep at
+    least three vertices."""
+    n = len(points) // 2
+    if n <= 2 or not (tol > 0.0):
+        return list(points[:2 * n])
+    xs = points[0:2 * n:2]
+    ys = points[1:2 * n:2]
+    prev = list(range(-1, n - 1))
+    nxt = list(range(1, n + 1))
+    if closed:
+        prev[0] = n - 1
+        nxt[n - 1] = 0
+        first, last = 0, n
+    else:
+        first, last = 1, n - 1
+
+    def _area(i: int) -> float:
+        a = prev[i]
+        b = nxt[i]
+        return abs((xs[a] - xs[i]) * (ys[b] - ys[i]) - (xs[b] - xs[i]) * (ys[a] - ys[i])) * 0.5
+
+    limit = tol * tol
+    area = [0.0] * n
+    heap = []
+    for i in range(first, last):
+        area[i] = _area(i)
+        heap.append((area[i], i))
+    heapq.heapify(heap)
+    removed = bytearray(n)
+    remaining = n
+    keep_min = 3 if closed else 2
+    while heap and remaining > keep_min:
+        a, i = heapq.heappop(heap)
+        if removed[i] or a != area[i]:
+            continue
+        if a >= limit:
+            break
+        removed[i] = 1
+        remaining -= 1
+        p = prev[i]
+        q = nxt[i]
+        nxt[p] = q
+        prev[q] = p
+        for j in (p, q):
+            if closed or 0 < j < n - 1:
+                # A neighbour never drops below the area just removed.
+                area[j] = max(_area(j), a)
+                heapq.heappush(heap, (area[j], j))
+    out: List[float] = []
+    for i in range(n):
+        if not removed[i]:
+            out.append(xs[i])
+            out.append(ys[i])
+    return out
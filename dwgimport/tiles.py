@@ -0,0 +1,563 @@
+"""Quadtree tiles over the linework of a DWG -> Plan2D import.
+
+`build_tile_index` packs the CAD elements of one import (meters) into columns and a quadtree
+over their bounding boxes: the root tile (z=0) is the square around the drawing, and a tile
+with more than `leaf_size` items is split into four until `max_zoom`. An item is stored in
+every leaf it overlaps. The server keeps recent indexes in a `TileStore` and serves
+`GET /api/plan2d/tiles/{import}/{z}/{x}/{y}` from them; x grows to the right and y upwards
+from the root's lower-left corner. Tiles carry compact geometry with style ids into the
+index's style table, so the editor only fetches and strokes the tiles in its viewport.
+
+With `lod_levels`, the index also holds coarser copies of the linework for zoomed-out views
+(`?lod=k` on the tile URL). Level k is simplified to a tolerance of one pixel at the zoom where
+the whole drawing fits in TILE_PX * 4**(levels - k) pixels: coordinates snap to a grid of that
+size and segments that collapse or repeat are dropped, polylines are reduced with
+Douglas-Peucker, smaller curves are dropped, and hatch and underlay layers become filled
+rectangles over a grid of occupied cells when that takes fewer items. Each level is built from
+the one below it and has its own quadtree over the same root tile.
+"""
+from __future__ import annotations
+
+import json
+import threading
+from math import ceil, gcd, log10
+import uuid
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from dwgimport.simplify import douglas_peucker
+
+# Items per leaf before a tile is split, and the deepest zoom level.
+LEAF_SIZE = 2048
+MAX_ZOOM = 12
+# Coordinates in tiles are rounded to 0.01 mm.
+_DIGITS = 5
+# On-screen size of a tile in the editor (pixels), which sets the level-of-detail tolerances.
+TILE_PX = 512
+# Hatch/underlay merge cell, in level tolerances (pixels).
+_HATCH_CELL = 2
+
+
+class TileIndex:
+    """Linework of one import, indexed by quadtree tile."""
+
+    __slots__ = ('bounds', 'max_zoom', 'styles', 'x0', 'y0', 'x1', 'y1', 'style', 'ids',
+                 'shapes', 'bx0', 'by0', 'bx1', 'by1', 'leaves', 'depth', 'created', 'tol', 'lods',
+                 'digits', '_encoded', '_lock')
+
+    def __init__(self):
+        self.bounds = (0.0, 0.0, 1.0, 1.0)
+        self.max_zoom = 0
+        self.styles: List[dict] = []
+        # Simplification tolerance (meters; 0 = full detail) and the coarser levels, finest first.
+        self.tol = 0.0
+        self.lods: List['TileIndex'] = []
+        # Decimal places of the coordinates in tiles.
+        self.digits = _DIGITS
+        # Straight segments as columns, with their style and element id.
+        self.x0 = array('d')
+        self.y0 = array('d')
+        self.x1 = array('d')
+        self.y1 = array('d')
+        self.style = array('I')
+        self.ids = array('I')
+        # Everything else (polylines, arcs, circles, ellipses) as ready-to-send dicts.
+        self.shapes: List[dict] = []
+        # Bounding box per item: segments first, then shapes.
+        self.bx0 = array('d')
+        self.by0 = array('d')
+        self.bx1 = array('d')
+        self.by1 = array('d')
+        # (z, x, y) -> item ids for leaves; None for split tiles.
+        self.leaves: Dict[Tuple[int, int, int], Optional[array]] = {}
+        self.depth = 0
+        self.created = 0.0
+        # Recently served tiles as JSON bytes; the coarse tiles are requested on every zoom-out.
+        self._encoded: 'OrderedDict[tuple, bytes]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _counts(self) -> dict:
+        return {
+            'depth': self.depth,
+            'tiles': sum(1 for v in self.leaves.values() if v is not None),
+            'segments': len(self.x0),
+            'shapes': len(self.shapes),
+        }
+
+    def describe(self) -> dict:
+        out = { 'bounds': list(self.bounds), 'maxZoom': self.max_zoom }
+        out.update(self._counts())
+        out['styles'] = self.styles
+        # Level 0 is this index; the client picks the coarsest level whose tolM is under a pixel.
+        # A level that reuses a finer one says so in `of`, so its tiles are fetched only once.
+        levels = [self] + self.lods
+        out['lods'] = []
+        for k, level in enumerate(levels):
+            info = dict(level._counts(), level=k, tolM=level.tol)
+            first = next(j for j, other in enumerate(levels) if other is level)
+            if first != k:
+                info['of'] = first
+            out['lods'].append(info)
+        return out
+
+    def level(self, lod: int) -> Optional['TileIndex']:
+        if lod == 0:
+            return self
+        if 0 < lod <= len(self.lods):
+            return self.lods[lod - 1]
+        return None
+
+    def tile_bounds(self, z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+        minx, miny, maxx, _maxy = self.bounds
+        size = (maxx - minx) / float(1 << z)
+        return (minx + x * size, miny + y * size, minx + (x + 1) * size, miny + (y + 1) * size)
+
+    def tile_items(self, z: int, x: int, y: int) -> Optional[List[int]]:
+        """Ids of the items overlapping a tile (sorted), or None when it is outside the index."""
+        if z < 0 or z > self.max_zoom or not (0 <= x < (1 << z)) or not (0 <= y < (1 << z)):
+            return None
+        key = (z, x, y)
+        if key in self.leaves:
+            leaf = self.leaves[key]
+            if leaf is not None:
+                return list(leaf)
+            # Split tile: union of the leaves below it.
+            out = set()
+            stack = [key]
+            while stack:
+                kz, kx, ky = stack.pop()
+                for cx in (2 * kx, 2 * kx + 1):
+                    for cy in (2 * ky, 2 * ky + 1):
+                        child = (kz + 1, cx, cy)
+                        if child not in self.leaves:
+                            continue
+                        items = self.leaves[child]
+                        if items is None:
+                            stack.append(child)
+                        else:
+                            out.update(items)
+            return sorted(out)
+        # Below a leaf: the leaf's items that overlap the requested tile.
+        pz, px, py = z, x, y
+        while pz > 0 and (pz, px, py) not in self.leaves:
+            pz, px, py = pz - 1, px >> 1, py >> 1
+        leaf = self.leaves.get((pz, px, py))
+        if not leaf:
+            return []
+        tx0, ty0, tx1, ty1 = self.tile_bounds(z, x, y)
+        bx0, by0, bx1, by1 = self.bx0, self.by0, self.bx1, self.by1
+        return [i for i in leaf if bx1[i] >= tx0 and bx0[i] <= tx1 and by1[i] >= ty0 and by0[i] <= ty1]
+
+    def encode_tile(self, z: int, x: int, y: int) -> Optional[dict]:
+        """Tile payload: `lines` is a flat [x0, y0, x1, y1, ...] list with one `lineStyles` and
+        `lineIds` entry per segment; `shapes` are polylines and curves with `s` (style) and `id`."""
+        items = self.tile_items(z, x, y)
+        digits = self.digits
+        if items is None:
+            return None
+        n_seg = len(self.x0)
+        lines: List[float] = []
+        line_styles: List[int] = []
+        line_ids: List[int] = []
+        shapes = []
+        for i in items:
+            if i < n_seg:
+                lines.extend((round(self.x0[i], digits), round(self.y0[i], digits), round(self.x1[i], digits), round(self.y1[i], digits)))
+                line_styles.append(self.style[i])
+                line_ids.append(self.ids[i])
+            else:
+                shapes.append(self.shapes[i - n_seg])
+        return {
+            'z': z,
+            'x': x,
+            'y': y,
+            'bounds': [round(v, digits) for v in self.tile_bounds(z, x, y)],
+            'lines': lines,
+            'lineStyles': line_styles,
+            'lineIds': line_ids,
+            'shapes': shapes,
+        }
+
+    def tile_json(self, z: int, x: int, y: int) -> Optional[bytes]:
+        key = (z, x, y)
+        with self._lock:
+            body = self._encoded.get(key)
+            if body is not None:
+                self._encoded.move_to_end(key)
+                return body
+        tile = self.encode_tile(z, x, y)
+        if tile is None:
+            return None
+        tile['ok'] = True
+        body = json.dumps(tile, separators=(',', ':')).encode('utf-8')
+        with self._lock:
+            self._encoded[key] = body
+            while len(self._encoded) > 64:
+                self._encoded.popitem(last=False)
+        return body
+
+
+def _round_points(points, digits: int = _DIGITS) -> list:
+    return [round(float(v), digits) for v in points]
+
+
+def _fill(index: TileIndex, items: Iterable[Tuple[int, dict]], style_of) -> None:
+    # Pack (element id, element) pairs into the index columns and shapes, with bounding boxes.
+    shape_boxes = []
+    digits = index.digits
+    for eid, el in items:
+        meta = el.get('meta') if isinstance(el, dict) else None
+        if not meta or not meta.get('cad'):
+            continue
+        kind = el.get('type')
+        try:
+            if kind == 'wall':
+                x0, y0, x1, y1 = float(el['x0']), float(el['y0']), float(el['x1']), float(el['y1'])
+                if not all(v - v == 0.0 for v in (x0, y0, x1, y1)):
+                    continue
+                index.x0.append(x0)
+                index.y0.append(y0)
+                index.x1.append(x1)
+                index.y1.append(y1)
+                index.style.append(style_of(meta))
+                index.ids.append(eid)
+                continue
+            if kind == 'polyline':
+                pts = el.get('points') or []
+                xs = pts[0::2]
+                ys = pts[1::2]
+                if not xs:
+                    continue
+                box = (min(xs), min(ys), max(xs), max(ys))
+                shape = { 'type': 'polyline', 'points': _round_points(pts, digits), 'closed': bool(el.get('closed')) }
+            elif kind in ('arc', 'circle'):
+                cx, cy, r = float(el['cx']), float(el['cy']), float(el['r'])
+                box = (cx - r, cy - r, cx + r, cy + r)
+                shape = { 'type': kind, 'cx': round(cx, digits), 'cy': round(cy, digits), 'r': round(r, digits) }
+                if kind == 'arc':
+                    shape['a0'] = el.get('a0')
+                    shape['a1'] = el.get('a1')
+            elif kind == 'ellipse':
+                cx, cy = float(el['cx']), float(el['cy'])
+                rmax = max(abs(float(el['rx'])), abs(float(el['ry'])))
+                box = (cx - rmax, cy - rmax, cx + rmax, cy + rmax)
+                shape = { 'type': 'ellipse', 'cx': round(cx, digits), 'cy': round(cy, digits),
+                          'rx': round(float(el['rx']), digits), 'ry': round(float(el['ry']), digits),
+                          'rot': el.get('rot') or 0.0, 'a0': el.get('a0'), 'a1': el.get('a1') }
+            elif kind == 'rect':
+                # Merged hatch/underlay cells of a coarse level, drawn filled.
+                box = (float(el['x0']), float(el['y0']), float(el['x1']), float(el['y1']))
+                shape = { 'type': 'rect', 'x0': round(box[0], digits), 'y0': round(box[1], digits),
+                          'x1': round(box[2], digits), 'y1': round(box[3], digits) }
+            else:
+                continue
+        except (KeyError, TypeError, ValueError):
+            continue
+        if not all(v - v == 0.0 for v in box):
+            continue
+        shape['s'] = style_of(meta)
+        shape['id'] = eid
+        index.shapes.append(shape)
+        shape_boxes.append(box)
+
+    for (x0, y0, x1, y1) in zip(index.x0, index.y0, index.x1, index.y1):
+        index.bx0.append(x0 if x0 < x1 else x1)
+        index.by0.append(y0 if y0 < y1 else y1)
+        index.bx1.append(x1 if x0 < x1 else x0)
+        index.by1.append(y1 if y0 < y1 else y0)
+    for (a, b, c, d) in shape_boxes:
+        index.bx0.append(a)
+        index.by0.append(b)
+        index.bx1.append(c)
+        index.by1.append(d)
+
+
+def _split(index: TileIndex, leaf_size: int) -> None:
+    # Quadtree over the item bounding boxes, from the root tile in index.bounds.
+    n = len(index.bx0)
+    bx0, by0, bx1, by1 = index.bx0, index.by0, index.bx1, index.by1
+    ox, oy = index.bounds[0], index.bounds[1]
+    size = index.bounds[2] - index.bounds[0]
+    stack = [(0, 0, 0, array('I', range(n)))]
+    depth = 0
+    while stack:
+        z, x, y, items = stack.pop()
+        if len(items) <= leaf_size or z >= index.max_zoom:
+            index.leaves[(z, x, y)] = items
+            depth = max(depth, z)
+            continue
+        half = size / float(1 << (z + 1))
+        mx = ox + (2 * x + 1) * half
+        my = oy + (2 * y + 1) * half
+        quads = (array('I'), array('I'), array('I'), array('I'))
+        for i in items:
+            west = bx0[i] <= mx
+            east = bx1[i] >= mx
+            south = by0[i] <= my
+            north = by1[i] >= my
+            if west and south:
+                quads[0].append(i)
+            if east and south:
+                quads[1].append(i)
+            if west and north:
+                quads[2].append(i)
+            if east and north:
+                quads[3].append(i)
+        if max(len(q) for q in quads) > 0.9 * len(items):
+            # Mostly items larger than the tile: splitting would only copy them.
+            index.leaves[(z, x, y)] = items
+            depth = max(depth, z)
+            continue
+        index.leaves[(z, x, y)] = None
+        for q, (cx, cy) in enumerate(((2 * x, 2 * y), (2 * x + 1, 2 * y), (2 * x, 2 * y + 1), (2 * x + 1, 2 * y + 1))):
+            if quads[q]:
+                stack.append((z + 1, cx, cy, quads[q]))
+    index.depth = depth
+
+
+def _mark_cells(cells: dict, eid: int, x0: float, y0: float, x1: float, y1: float, ox: float, oy: float, cell: float) -> None:
+    # Grid cells a segment passes through, sampled at half-cell steps.
+    steps = int(max(abs(x1 - x0), abs(y1 - y0)) / (0.5 * cell)) + 1
+    for k in range(steps + 1):
+        t = k / float(steps)
+        cells.setdefault((int((y0 + (y1 - y0) * t - oy) // cell), int((x0 + (x1 - x0) * t - ox) // cell)), eid)
+
+
+def _cell_rects(cells: dict, ox: float, oy: float, cell: float) -> List[Tuple[int, tuple]]:
+    # Occupied cells as rectangles: runs along each row, stacked with identical runs of the
+    # rows above. Returns (element id, (x0, y0, x1, y1)).
+    rows: Dict[int, List[int]] = {}
+    for (cy, cx) in cells:
+        rows.setdefault(cy, []).append(cx)
+    open_runs: Dict[Tuple[int, int], list] = {}
+    done = []
+    for cy in sorted(rows):
+        xs = sorted(rows[cy])
+        runs = []
+        a = b = xs[0]
+        for cx in xs[1:]:
+            if cx == b + 1:
+                b = cx
+                continue
+            runs.append((a, b))
+            a = b = cx
+        runs.append((a, b))
+        nxt = {}
+        for run in runs:
+            rect = open_runs.pop(run, None)
+            if rect is not None and rect[2] == cy - 1:
+                rect[2] = cy
+            else:
+                if rect is not None:
+                    done.append(rect)
+                rect = [cy, run, cy, cells[(cy, run[0])]]
+            nxt[run] = rect
+        done.extend(open_runs.values())
+        open_runs = nxt
+    done.extend(open_runs.values())
+    return [(eid, (ox + a * cell, oy + cy0 * cell, ox + (b + 1) * cell, oy + (cy1 + 1) * cell))
+            for (cy0, (a, b), cy1, eid) in done]
+
+
+def _coarsen(src: TileIndex, tol: float, coarse_styles) -> TileIndex:
+    """Copy of `src` simplified to `tol` meters, for the next coarser level.
+
+    Coordinates snap to a tol grid anchored at the root tile; segments that snap to a point
+    are dropped and overlapping or touching segments on one grid line with the same style are
+    merged. Polylines are reduced with Douglas-Peucker and shapes smaller than tol are dropped.
+    Linework with a style in `coarse_styles` (hatch, underlay) becomes 'rect' shapes over a grid
+    of _HATCH_CELL * tol cells when that gives fewer items than the simplified lines.
+    """
+    level = TileIndex()
+    level.created = src.created
+    level.bounds = src.bounds
+    level.max_zoom = src.max_zoom
+    level.styles = src.styles
+    level.tol = tol
+    level.digits = digits = min(_DIGITS, max(0, ceil(-log10(tol)) + 1))
+    ox, oy = src.bounds[0], src.bounds[1]
+    inv = 1.0 / tol
+    cell = _HATCH_CELL * tol
+    # Occupied hatch cells per style, and the simplified items of those styles as a fallback.
+    cells: Dict[int, dict] = {}
+    pending: Dict[int, list] = {}
+    # Snapped segments per (style, direction, offset), as intervals along the grid line.
+    lines: Dict[tuple, list] = {}
+    for (x0, y0, x1, y1, sid, eid) in zip(src.x0, src.y0, src.x1, src.y1, src.style, src.ids):
+        if sid in coarse_styles:
+            _mark_cells(cells.setdefault(sid, {}), eid, x0, y0, x1, y1, ox, oy, cell)
+        ax = round((x0 - ox) * inv)
+        ay = round((y0 - oy) * inv)
+        dx = round((x1 - ox) * inv) - ax
+        dy = round((y1 - oy) * inv) - ay
+        if dx == 0 and dy == 0:
+            continue
+        g = gcd(dx, dy)
+        dx //= g
+        dy //= g
+        if dx < 0 or (dx == 0 and dy < 0):
+            dx, dy = -dx, -dy
+            g = -g
+        t0 = ax * dx + ay * dy
+        t1 = t0 + g * (dx * dx + dy * dy)
+        key = (sid, dx, dy, ax * dy - ay * dx)
+        run = (t0, t1, eid) if t0 < t1 else (t1, t0, eid)
+        bucket = lines.get(key)
+        if bucket is None:
+            lines[key] = [run]
+        else:
+            bucket.append(run)
+
+    walls = []
+    for (sid, dx, dy, c), runs in lines.items():
+        # Grid point with offset c at position t along (dx, dy): (t * d + c * (dy, -dx)) / |d|^2.
+        sc = tol / float(dx * dx + dy * dy)
+        target = pending.setdefault(sid, []) if sid in coarse_styles else walls
+        if len(runs) > 1:
+            runs.sort()
+        ta, tb, eid = runs[0]
+        for (t0, t1, e) in runs[1:]:
+            if t0 <= tb:
+                if t1 > tb:
+                    tb = t1
+                continue
+            target.append((ox + (ta * dx + c * dy) * sc, oy + (ta * dy - c * dx) * sc, ox + (tb * dx + c * dy) * sc, oy + (tb * dy - c * dx) * sc, sid, eid))
+            ta, tb, eid = t0, t1, e
+        target.append((ox + (ta * dx + c * dy) * sc, oy + (ta * dy - c * dx) * sc, ox + (tb * dx + c * dy) * sc, oy + (tb * dy - c * dx) * sc, sid, eid))
+
+    shapes = []
+    n_seg = len(src.x0)
+    for i, shape in enumerate(src.shapes, n_seg):
+        sid = shape['s']
+        box = (src.bx0[i], src.by0[i], src.bx1[i], src.by1[i])
+        kind = shape['type']
+        if sid in coarse_styles:
+            grid = cells.setdefault(sid, {})
+            if kind == 'polyline':
+                pts = shape['points']
+                for k in range(0, len(pts) - 3, 2):
+                    _mark_cells(grid, shape['id'], pts[k], pts[k + 1], pts[k + 2], pts[k + 3], ox, oy, cell)
+            else:
+                # Curves and earlier rectangles: the cells of their bounding box.
+                for cy in range(int((box[1] - oy) // cell), int((box[3] - oy) // cell) + 1):
+                    for cx in range(int((box[0] - ox) // cell), int((box[2] - ox) // cell) + 1):
+                        grid.setdefault((cy, cx), shape['id'])
+        if kind != 'rect' and box[2] - box[0] < tol and box[3] - box[1] < tol:
+            continue
+        if kind == 'polyline':
+            pts = shape['points']
+            reduced = douglas_peucker(pts, tol, closed=shape['closed'])
+            if len(reduced) < len(pts):
+                shape = dict(shape, points=_round_points(reduced, digits))
+                if len(reduced) < 6:
+                    shape['closed'] = False
+        (pending.setdefault(sid, []) if sid in coarse_styles else shapes).append((shape, box))
+
+    for sid, grid in cells.items():
+        simple = pending.get(sid) or []
+        rects = _cell_rects(grid, ox, oy, cell)
+        if rects and len(rects) < len(simple):
+            for (eid, b) in rects:
+                shapes.append(({ 'type': 'rect', 'x0': round(b[0], digits), 'y0': round(b[1], digits),
+                                 'x1': round(b[2], digits), 'y1': round(b[3], digits), 's': sid, 'id': eid }, b))
+        else:
+            for item in simple:
+                (walls if len(item) == 6 else shapes).append(item)
+
+    for (x0, y0, x1, y1, sid, eid) in walls:
+        level.x0.append(x0)
+        level.y0.append(y0)
+        level.x1.append(x1)
+        level.y1.append(y1)
+        level.style.append(sid)
+        level.ids.append(eid)
+        level.bx0.append(x0 if x0 < x1 else x1)
+        level.by0.append(y0 if y0 < y1 else y1)
+        level.bx1.append(x1 if x0 < x1 else x0)
+        level.by1.append(y1 if y0 < y1 else y0)
+    for (shape, (a, b, c, d)) in shapes:
+        level.shapes.append(shape)
+        level.bx0.append(a)
+        level.by0.append(b)
+        level.bx1.append(c)
+        level.by1.append(d)
+    if level.bx0:
+        _split(level, LEAF_SIZE)
+    else:
+        level.leaves[(0, 0, 0)] = array('I')
+    return level
+
+
+def build_tile_index(elements, *, leaf_size: int = LEAF_SIZE, max_zoom: int = MAX_ZOOM,
+                     lod_levels: int = 0, coarse_layers=()) -> TileIndex:
+    """Tile index over the CAD elements of one import (other elements are skipped).
+
+    Element ids in tiles are indexes into `elements`. `lod_levels` coarser levels are added,
+    the coarsest at one pixel when the drawing is TILE_PX wide, each finer one 4x finer;
+    `coarse_layers` are the layer names merged into filled cells there.
+    """
+    import time
+    index = TileIndex()
+    index.created = time.time()
+    style_ids: Dict[tuple, int] = {}
+
+    def _style(meta) -> int:
+        key = (meta.get('stroke'), meta.get('layer'), meta.get('rgb'))
+        sid = style_ids.get(key)
+        if sid is None:
+            sid = style_ids[key] = len(index.styles)
+            index.styles.append({ 'stroke': key[0], 'layer': key[1], 'rgb': key[2] })
+        return sid
+
+    _fill(index, enumerate(elements), _style)
+    if not index.bx0:
+        index.leaves[(0, 0, 0)] = array('I')
+        return index
+
+    minx, miny, maxx, maxy = min(index.bx0), min(index.by0), max(index.bx1), max(index.by1)
+    size = max(maxx - minx, maxy - miny)
+    if not (size > 0.0):
+        size = 1.0
+    # Square root tile, padded slightly so items on the far edges fall inside.
+    pad = size * 1e-6
+    size += 2.0 * pad
+    index.bounds = (minx - pad, miny - pad, minx - pad + size, miny - pad + size)
+    index.max_zoom = max(0, min(int(max_zoom), 30))
+    _split(index, leaf_size)
+
+    coarse = set(coarse_layers or ())
+    coarse_styles = set(sid for sid, st in enumerate(index.styles) if st['layer'] in coarse)
+    levels = max(0, int(lod_levels))
+    src = index
+    for k in range(1, levels + 1):
+        level = _coarsen(src, size / TILE_PX / float(4 ** (levels - k)), coarse_styles)
+        # A level that removes little is not worth a second copy: serve the finer one instead.
+        if len(level.bx0) <= 0.9 * len(src.bx0):
+            src = level
+        index.lods.append(src)
+    return index
+
+
+class TileStore:
+    """The most recent tile indexes, by import id (least recently used ones are dropped)."""
+
+    def __init__(self, capacity: int = 8):
+        self.capacity = max(1, int(capacity))
+        self._items: 'OrderedDict[str, TileIndex]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, index: TileIndex) -> str:
+        key = uuid.uuid4().hex
+        with self._lock:
+            self._items[key] = index
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+        return key
+
+    def get(self, key: str) -> Optional[TileIndex]:
+        with self._lock:
+            index = self._items.get(key)
+            if index is not None:
+                self._items.move_to_end(key)
+            return index
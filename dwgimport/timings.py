@@ -0,0 +1,128 @@
+"""Stage timings of DWG -> Plan2D imports.
+
+`StageTimings` times one import as a sequence of stages (base64 decode, converter run, DXF parse,
+weld, dedup, ... JSON encode): wall time, CPU time and the sizes each stage was given and produced.
+CPU time is the calling thread's plus that of child processes reaped during the stage (the
+converter, the parallel parse workers); child time is process-wide, so concurrent imports can
+see each other's. `TimingStats` aggregates finished imports per stage for `GET /api/dwg/status`.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None  # type: ignore
+
+
+def _children_cpu() -> float:
+    if resource is None:
+        return 0.0
+    try:
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return usage.ru_utime + usage.ru_stime
+    except (OSError, ValueError):
+        return 0.0
+
+
+class StageTimings:
+    """Wall/CPU time and sizes of the stages of one import, in the order they ran."""
+
+    def __init__(self):
+        self.stages = []
+        self.started = time.perf_counter()
+        self._current = None
+
+    def enter(self, name: str, **sizes) -> None:
+        # Start a stage, ending the current one; sizes (e.g. inBytes, inItems) go into its record.
+        self.leave()
+        self._current = (name, sizes, time.perf_counter(), time.thread_time(), _children_cpu())
+
+    def leave(self, **sizes) -> None:
+        # End the current stage; sizes (e.g. outBytes, outItems) are added to its record.
+        if self._current is None:
+            return
+        name, first, wall0, cpu0, child0 = self._current
+        self._current = None
+        wall = time.perf_counter() - wall0
+        child = _children_cpu() - child0
+        rec = {
+            'stage': name,
+            'wallMs': round(wall * 1000.0, 1),
+            'cpuMs': round((time.thread_time() - cpu0 + child) * 1000.0, 1),
+        }
+        if child > 0.0:
+            rec['childCpuMs'] = round(child * 1000.0, 1)
+        rec.update(first)
+        rec.update(sizes)
+        self.stages.append(rec)
+
+    def note(self, **fields) -> None:
+        # Add fields to the current stage's record.
+        if self._current is not None:
+            self._current[1].update(fields)
+
+    def add(self, name: str, wall_ms: float, **fields) -> None:
+        # Record a stage timed elsewhere (e.g. part of the parse, measured by the parser).
+        rec = { 'stage': name, 'wallMs': round(float(wall_ms), 1) }
+        rec.update(fields)
+        self.stages.append(rec)
+
+    def describe(self) -> dict:
+        self.leave()
+        return {
+            'totalMs': round((time.perf_counter() - self.started) * 1000.0, 1),
+            'stages': [dict(rec) for rec in self.stages],
+        }
+
+
+class TimingStats:
+    """Per-stage totals over the imports finished since the server started."""
+
+    def __init__(self):
+        self.imports = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, timings: StageTimings, error: Optional[str] = None) -> None:
+        summary = timings.describe()
+        with self._lock:
+            self.imports += 1
+            if error:
+                self.errors += 1
+            self.total_ms += summary['totalMs']
+            self.max_ms = max(self.max_ms, summary['totalMs'])
+            for rec in summary['stages']:
+                st = self.stages.get(rec['stage'])
+                if st is None:
+                    st = self.stages[rec['stage']] = { 'count': 0, 'wallMs': 0.0, 'cpuMs': 0.0, 'maxWallMs': 0.0 }
+                st['count'] += 1
+                st['wallMs'] += rec['wallMs']
+                st['cpuMs'] += float(rec.get('cpuMs') or 0.0)
+                st['maxWallMs'] = max(st['maxWallMs'], rec['wallMs'])
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stages = {}
+            for name, st in self.stages.items():
+                stages[name] = {
+                    'count': st['count'],
+                    'wallMs': round(st['wallMs'], 1),
+                    'cpuMs': round(st['cpuMs'], 1),
+                    'meanWallMs': round(st['wallMs'] / st['count'], 1),
+                    'maxWallMs': round(st['maxWallMs'], 1),
+                }
+            return {
+                'imports': self.imports,
+                'errors': self.errors,
+                'totalMs': round(self.total_ms, 1),
+                'meanMs': round(self.total_ms / self.imports, 1) if self.imports else 0.0,
+                'maxMs': round(self.max_ms, 1),
+                'stages': stages,
+            }
@@ -94,8 +94,82 @@
     }
   }
 
+  // mode 'instances' returns block geometry once plus one transform per INSERT; expand it into
+  // the same CAD hairline elements 'cad' mode produces so the 2D editor can select/edit them.
+  function _expandPlan2dInstances(plan, thicknessM, level){
+    if (!plan || !plan.blocks || !Array.isArray(plan.instances)) return plan;
+    var out = Array.isArray(plan.elements) ? plan.elements : (plan.elements = []);
+    for (var i=0; i<plan.instances.length; i++){
+      var inst = plan.instances[i];
+      var blk = inst && plan.blocks[inst.block];
+      if (!blk || !Array.isArray(blk.segments)) continue;
+      var sx = inst.sx || 1, sy = inst.sy || 1;
+      var ang = (inst.rot || 0) * Math.PI / 180;
+      var ca = Math.cos(ang), sa = Math.sin(ang);
+      var hasColor = (typeof inst.rgb === 'number');
+      for (var j=0; j<blk.segments.length; j++){
+        var s = blk.segments[j];
+        var x0 = s[0]*sx, y0 = s[1]*sy, x1 = s[2]*sx, y1 = s[3]*sy;
+        var rgb = s[4], layer = s[5];
+        // BYBLOCK (rgb 0): inherit the instance's color and layer.
+        if (rgb === 0 && hasColor) { rgb = inst.rgb; layer = inst.layer; }
+        out.push({
+          type: 'wall',
+          x0: x0*ca - y0*sa + inst.x,
+          y0: x0*sa + y0*ca + inst.y,
+          x1: x1*ca - y1*sa + inst.x,
+          y1: x1*sa + y1*ca + inst.y,
+          thickness: thicknessM,
+          level: level,
+          wallRole: 'nonroom',
+          manual: true,
+          meta: { cad: true, stroke: '#' + ('000000' + (rgb & 0xFFFFFF).toString(16)).slice(-6), layer: layer || null, rgb: rgb, block: inst.block }
+        });
+      }
+    }
+    delete plan.blocks;
+    delete plan.instances;
+    return plan;
+  }
+
+  // Read an NDJSON to-plan2d response (stream=true) into the same plan object as the JSON reply.
+  // onPreview({ lines, rgb, segments }) receives the segments parsed so far (meters, flat
+  // [x0, y0, x1, y1, ...]); onPreview(null) means earlier previews are stale.
+  async function _readPlan2dStream(res, onPreview){
+    var reader = res.body.getReader();
+    var decoder = new TextDecoder('utf-8');
+    var buf = '';
+    var plan = { ok: false, format: 'gablok-2d-plan', elements: [] };
+    var failed = null, done = false;
+    async function handle(line){
+      if (!line) return;
+      var msg = JSON.parse(line);
+      if (msg.type === 'header') { plan.ok = !!msg.ok; if (msg.format) plan.format = msg.format; }
+      else if (msg.type === 'preview') { if (onPreview) await onPreview(msg); }
+      else if (msg.type === 'preview-reset') { if (onPreview) await onPreview(null); }
+      else if (msg.type === 'elements') { var els = msg.elements || []; for (var i=0; i<els.length; i++) plan.elements.push(els[i]); }
+      else if (msg.type === 'blocks') { plan.blocks = msg.blocks; plan.instances = msg.instances; }
+      else if (msg.type === 'meta') { plan.meta = msg.meta; done = true; }
+      else if (msg.type === 'error') { failed = msg; }
+    }
+    for (;;) {
+      var r = await reader.read();
+      if (r.done) break;
+      buf += decoder.decode(r.value, { stream: true });
+      var start = 0, nl;
+      while ((nl = buf.indexOf('\n', start)) >= 0) { await handle(buf.slice(start, nl)); start = nl + 1; }
+      buf = buf.slice(start);
+    }
+    buf += decoder.decode();
+    await handle(buf.trim());
+    if (failed) return { ok: false, error: 'server-error', message: failed.message || failed.error, detail: failed };
+    if (!done) return { ok: false, error: 'stream-incomplete' };
+    return { ok: true, plan: plan };
+  }
+
   async function _convertDwgToPlan2dViaServer(file, opts){
     opts = opts || {};
+    var progressEvents = null;
     try {
       var buf = await file.arrayBuffer();
       var b64 = _arrayBufferToBase64(buf);
@@ -115,23 +189,68 @@
         expandInserts: (typeof opts.expandInserts === 'boolean' ? opts.expandInserts : true),
         maxInsertSegs: (typeof opts.maxInsertSegs === 'number' ? opts.maxInsertSegs : 2500)
       };
-      var res = await fetch('/api/dwg/to-plan2d', {
+      if (opts.mode) payload.mode = opts.mode;
+      // Layer filters are applied by the server while parsing (lists or comma-separated regexes).
+      if (opts.includeLayers) payload.includeLayers = opts.includeLayers;
+      if (opts.excludeLayers) payload.excludeLayers = opts.excludeLayers;
+      if (typeof opts.autoClean === 'boolean') payload.autoClean = opts.autoClean;
+      // Optional crop in drawing units: [xmin, ymin, xmax, ymax] or [[x, y], ...].
+      if (opts.clip) payload.clip = opts.clip;
+      if (opts.nativeCurves) payload.nativeCurves = true;
+      if (opts.chainPolylines) payload.chainPolylines = true;
+      // Tolerance (drawing units) for simplifying the chained polylines; 'dp' or 'vw'.
+      if (typeof opts.simplifyTolMm === 'number') payload.simplifyTolMm = opts.simplifyTolMm;
+      if (opts.simplifyMethod) payload.simplifyMethod = opts.simplifyMethod;
+      if (typeof opts.mergeCollinear === 'boolean') payload.mergeCollinear = opts.mergeCollinear;
+      if (typeof opts.mergeTolMm === 'number') payload.mergeTolMm = opts.mergeTolMm;
+      // CAD mode: keep the linework on the server and fetch it by quadtree tile (see js/plan2d/tiles.js).
+      if (opts.tiles) payload.tiles = true;
+      if (typeof opts.lodLevels === 'number') payload.lodLevels = opts.lodLevels;
+      // NDJSON: preview batches while the DXF is parsed, then the elements in batches.
+      var streaming = !!opts.stream && typeof TextDecoder === 'function';
+      if (streaming) payload.stream = true;
+      // Live progress (Server-Sent Events), subscribed under an id the request then carries.
+      var progressUrl = '/api/dwg/to-plan2d';
+      if (typeof opts.onProgress === 'function' && typeof EventSource === 'function') {
+        var progressId = Math.random().toString(36).slice(2) + Date.now().toString(36);
+        progressUrl += '?progressId=' + progressId;
+        try {
+          progressEvents = new EventSource('/api/dwg/progress/' + progressId);
+          var onEvent = function(ev){
+            try { opts.onProgress(JSON.parse(ev.data)); } catch(_pe) {}
+            if (ev.type === 'done' && progressEvents) { progressEvents.close(); progressEvents = null; }
+          };
+          progressEvents.addEventListener('progress', onEvent);
+          progressEvents.addEventListener('done', onEvent);
+        } catch(_es) { progressEvents = null; }
+      }
+      var res = await fetch(progressUrl, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(payload)
       });
       var json = null;
-      try { json = await res.json(); } catch(_je) { json = null; }
+      // Errors found before the stream starts (e.g. no converter) still come back as plain JSON.
+      if (streaming && res.ok && res.body && typeof res.body.getReader === 'function' && /ndjson/.test(res.headers.get('Content-Type') || '')) {
+        var streamed = await _readPlan2dStream(res, opts.onPreview);
+        if (!streamed.ok) return streamed;
+        json = streamed.plan;
+      } else {
+        try { json = await res.json(); } catch(_je) { json = null; }
+      }
       if (!res.ok) {
         var msg = (json && (json.message || json.error)) || ('HTTP ' + res.status);
         return { ok: false, error: 'server-error', message: msg, detail: json };
       }
       if (json && json.ok && Array.isArray(json.elements)) {
+        if (json.instances) _expandPlan2dInstances(json, payload.thicknessM, payload.level);
         return { ok: true, plan: json };
       }
       return { ok: false, error: 'no-output', detail: json };
     } catch (e) {
       return { ok: false, error: 'exception', message: String(e && e.message || e) };
+    } finally {
+      if (progressEvents) progressEvents.close();
     }
   }
 
@@ -269,13 +388,54 @@
           var running = true;
           var planErr = null;
           var convErr = null;
+          var stageMsg = '';
           (async function(){
             while (running) {
               var sec = Math.max(0, Math.round((Date.now() - startTs)/1000));
-              _showImportProgress('Converting DWG'+verMsg+'… ' + sec + 's');
+              _showImportProgress('Converting DWG'+verMsg+'… ' + (stageMsg ? stageMsg + ' · ' : '') + sec + 's');
               await _sleep(500);
             }
           })();
+          var stageNames = { upload: 'uploading', convert: 'converting', parse: 'reading DXF', flatten: 'expanding blocks', simplify: 'simplifying', encode: 'sending' };
+          function onProgress(p){
+            if (!p || !stageNames[p.stage]) return;
+            var parts = [stageNames[p.stage]];
+            if (typeof p.fraction === 'number') parts[0] += ' ' + Math.round(p.fraction * 100) + '%';
+            var n = p.counts && (p.counts.elements || p.counts.segments);
+            if (n) parts.push(n.toLocaleString() + (p.counts.elements ? ' elements' : ' segments'));
+            stageMsg = parts.join(' · ');
+          }
+
+          // Streamed previews are drawn as provisional hairlines; the final import replaces them.
+          var previewShown = false, previewFitted = false;
+          async function onPreview(batch){
+            if (!batch) {
+              if (previewShown && window.__plan2d && Array.isArray(__plan2d.elements)) {
+                __plan2d.elements = __plan2d.elements.filter(function(el){ return !(el && el.meta && el.meta.preview); });
+              }
+              return;
+            }
+            if (!previewShown) {
+              if (!(await _ensurePlan2DLoaded())) return;
+              try { if (typeof window.resetSceneForImport === 'function') window.resetSceneForImport(); } catch(_pri) {}
+              try { if (typeof window.openPlan2DModal === 'function') window.openPlan2DModal(); } catch(_pop) {}
+              try { if (typeof window.plan2dClear === 'function') window.plan2dClear(); } catch(_pcl) {}
+              previewShown = true;
+            }
+            if (!window.__plan2d || !Array.isArray(__plan2d.elements)) return;
+            var lines = batch.lines || [], rgb = batch.rgb || [];
+            var lvl = (typeof window.currentFloor === 'number' ? window.currentFloor : 0);
+            for (var i=0, k=0; i+3<lines.length; i+=4, k++) {
+              __plan2d.elements.push({
+                type: 'wall', x0: lines[i], y0: lines[i+1], x1: lines[i+2], y1: lines[i+3],
+                thickness: 0.01, level: lvl, wallRole: 'nonroom', manual: true,
+                meta: { cad: true, preview: true, stroke: '#' + ('000000' + ((rgb[k] || 0) & 0xFFFFFF).toString(16)).slice(-6) }
+              });
+            }
+            _showImportProgress('Reading DWG'+verMsg+'… ' + (batch.segments || 0) + ' segments');
+            if (!previewFitted) { previewFitted = true; try { await _fitPlan2DWhenReady(40); } catch(_pf) {} }
+            try { if (typeof window.plan2dDraw === 'function') window.plan2dDraw(); } catch(_pd) {}
+          }
 
           // Preferred: server generates simplified Plan2D JSON (avoids client DXF parsing stalls)
           var planRes = await _convertDwgToPlan2dViaServer(file, {
@@ -284,7 +444,10 @@
             // Hairline import: CAD lines are not wall thickness.
             thicknessM: 0.01,
             // Help tiny endpoint gaps “join” by snapping to a 1mm grid server-side.
-            weldMm: 1
+            weldMm: 1,
+            stream: true,
+            onPreview: onPreview,
+            onProgress: onProgress
           });
           if (planRes && planRes.ok && planRes.plan) {
             running = false;
@@ -301,12 +464,18 @@
             try { if (window.__plan2d && typeof __plan2d.wallThicknessM === 'number') __plan2d.wallThicknessM = 0.01; } catch(_wt) {}
             try { window.__lastDwgPlan2dJson = planRes.plan; } catch(_dbg2) {}
             try { if (typeof window.plan2dImport === 'function') window.plan2dImport(planRes.plan); } catch(_imp2) {}
+            try {
+              var tilesMeta = planRes.plan.meta && planRes.plan.meta.tiles;
+              if (tilesMeta && typeof window.plan2dSetCadTiles !== 'function' && typeof window.loadScript === 'function') await loadScript('js/plan2d/tiles.js');
+              if (typeof window.plan2dSetCadTiles === 'function') window.plan2dSetCadTiles(tilesMeta || null);
+            } catch(_tiles) {}
             try { await _fitPlan2DWhenReady(40); } catch(_fit2) {}
             try { if (typeof window.plan2dDraw === 'function') window.plan2dDraw(); } catch(_dr2) {}
             try { updateStatus && updateStatus('DWG loaded into 2D editor (' + (planRes.plan.elements ? planRes.plan.elements.length : 0) + ' walls)'); } catch(_ok2) {}
             return;
           }
           if (planRes && !planRes.ok) planErr = planRes;
+          if (planRes && !planRes.ok && previewShown) { await onPreview(null); try { if (typeof window.plan2dDraw === 'function') window.plan2dDraw(); } catch(_pr) {} }
 
           // Fallback: DWG->DXF and then client-side conversion
           var conv = await _convertDwgToDxfViaServer(file);
@@ -308,7 +308,7 @@
       try {
         for (var __ci=0; __ci<elems.length; __ci++){
           var __e=elems[__ci];
-          if(__e && __e.type==='wall' && __e.meta && __e.meta.cad){ hasCad = true; break; }
+          if(__e && (__e.type==='wall' || __e.type==='polyline' || __e.type==='arc' || __e.type==='circle' || __e.type==='ellipse') && __e.meta && __e.meta.cad){ hasCad = true; break; }
         }
       } catch(_hc) { hasCad = false; }
 
@@ -387,6 +387,38 @@
       for(var foi=0; foi<elems.length; foi++){
         var fEl = elems[foi]; if(!fEl) continue; if(fEl.type!=='window' && fEl.type!=='door') continue; if(typeof fEl.host==='number') continue; freeOpenings.push(fEl);
       }
+      // CAD hairline stroke style (auto-contrast against the canvas background), shared by
+      // imported linework and analytic curves.
+      function beginCadStroke(el){
+        ctx.save();
+        ctx.beginPath();
+        var cadModeNow = false; try { cadModeNow = document.body && document.body.classList.contains('cad-mode'); } catch(_cm) { cadModeNow = false; }
+        var cadStroke = (el.meta.stroke || (cadModeNow ? 'rgba(0,0,0,0.85)' : 'rgba(255,255,255,0.85)'));
+        // Auto-contrast: many CAD files use "black/white" (ACI 7) or very dark colors.
+        // On a dark canvas those become invisible; on a white canvas pure white is invisible.
+        try {
+          if (cadStroke && typeof cadStroke === 'string' && cadStroke.charAt(0) === '#' && cadStroke.length === 7) {
+            var rr = parseInt(cadStroke.slice(1,3), 16);
+            var gg = parseInt(cadStroke.slice(3,5), 16);
+            var bb = parseInt(cadStroke.slice(5,7), 16);
+            if (isFinite(rr) && isFinite(gg) && isFinite(bb)) {
+              var lum = (0.2126*rr + 0.7152*gg + 0.0722*bb) / 255;
+              if (!cadModeNow && lum < 0.15) cadStroke = 'rgba(255,255,255,0.85)';
+              if (cadModeNow && lum > 0.92) cadStroke = 'rgba(0,0,0,0.85)';
+            }
+          }
+        } catch(_cadCol) {}
+        ctx.strokeStyle = cadStroke;
+        // CAD linework: slightly thicker than 1px with round joins so segments visually connect.
+        var dprCad = window.devicePixelRatio || 1;
+        var cadPx = (typeof __plan2d.cadStrokePx === 'number' && isFinite(__plan2d.cadStrokePx)) ? __plan2d.cadStrokePx : 1.35;
+        ctx.lineWidth = Math.max(1, cadPx * dprCad);
+        ctx.lineCap = 'round';
+        ctx.lineJoin = 'round';
+        ctx.setLineDash([]);
+      }
+      // Tiled CAD linework (large imports): only the tiles in view, below the editable elements.
+      if(typeof window.plan2dDrawCadTiles==='function' && __plan2d.cadTiles){ try { window.plan2dDrawCadTiles(ctx); } catch(_cadTiles) {} }
       for(var i=0;i<elems.length;i++){
         var el=elems[i];
         if(!el){ continue; } // Defensive: skip holes/undefined to avoid x0 access errors
@@ -399,32 +431,7 @@
           try {
             var aCad = worldToScreen2D(el.x0, el.y0);
             var bCad = worldToScreen2D(el.x1, el.y1);
-            ctx.save();
-            ctx.beginPath();
-            var cadModeNow = false; try { cadModeNow = document.body && document.body.classList.contains('cad-mode'); } catch(_cm) { cadModeNow = false; }
-            var cadStroke = (el.meta.stroke || (cadModeNow ? 'rgba(0,0,0,0.85)' : 'rgba(255,255,255,0.85)'));
-            // Auto-contrast: many CAD files use "black/white" (ACI 7) or very dark colors.
-            // On a dark canvas those become invisible; on a white canvas pure white is invisible.
-            try {
-              if (cadStroke && typeof cadStroke === 'string' && cadStroke.charAt(0) === '#' && cadStroke.length === 7) {
-                var rr = parseInt(cadStroke.slice(1,3), 16);
-                var gg = parseInt(cadStroke.slice(3,5), 16);
-                var bb = parseInt(cadStroke.slice(5,7), 16);
-                if (isFinite(rr) && isFinite(gg) && isFinite(bb)) {
-                  var lum = (0.2126*rr + 0.7152*gg + 0.0722*bb) / 255;
-                  if (!cadModeNow && lum < 0.15) cadStroke = 'rgba(255,255,255,0.85)';
-                  if (cadModeNow && lum > 0.92) cadStroke = 'rgba(0,0,0,0.85)';
-                }
-              }
-            } catch(_cadCol) {}
-            ctx.strokeStyle = cadStroke;
-            // CAD linework: slightly thicker than 1px with round joins so segments visually connect.
-            var dprCad = window.devicePixelRatio || 1;
-            var cadPx = (typeof __plan2d.cadStrokePx === 'number' && isFinite(__plan2d.cadStrokePx)) ? __plan2d.cadStrokePx : 1.35;
-            ctx.lineWidth = Math.max(1, cadPx * dprCad);
-            ctx.lineCap = 'round';
-            ctx.lineJoin = 'round';
-            ctx.setLineDash([]);
+            beginCadStroke(el);
             ctx.moveTo(aCad.x, aCad.y);
             ctx.lineTo(bCad.x, bCad.y);
             ctx.stroke();
@@ -433,6 +440,40 @@
           continue;
         }
 
+        // CAD arcs/circles/ellipses (DWG imports with nativeCurves): the canvas flattens them at the
+        // current zoom. Screen Y is flipped, so CCW world angles become negated and drawn anticlockwise.
+        if((el.type==='arc' || el.type==='circle' || el.type==='ellipse') && el.meta && el.meta.cad){
+          try {
+            var cCad = worldToScreen2D(el.cx, el.cy);
+            var sCad = __plan2d.scale || 50;
+            var ca0 = (el.type==='circle') ? 0 : (el.a0||0);
+            var ca1 = (el.type==='circle') ? Math.PI*2 : (el.a1||0);
+            beginCadStroke(el);
+            if(el.type==='ellipse') ctx.ellipse(cCad.x, cCad.y, Math.max(0, el.rx*sCad), Math.max(0, el.ry*sCad), -(el.rot||0), -ca0, -ca1, true);
+            else ctx.arc(cCad.x, cCad.y, Math.max(0, el.r*sCad), -ca0, -ca1, true);
+            ctx.stroke();
+            ctx.restore();
+          } catch(_cadCurve) {}
+          continue;
+        }
+
+        // CAD polylines (DWG imports with chainPolylines): one path per chain, flat [x0,y0,x1,y1,...].
+        if(el.type==='polyline' && el.meta && el.meta.cad){
+          try {
+            var pts = el.points;
+            if(Array.isArray(pts) && pts.length >= 4){
+              beginCadStroke(el);
+              var p0 = worldToScreen2D(pts[0], pts[1]);
+              ctx.moveTo(p0.x, p0.y);
+              for(var pi=2; pi+1<pts.length; pi+=2){ var pp = worldToScreen2D(pts[pi], pts[pi+1]); ctx.lineTo(pp.x, pp.y); }
+              if(el.closed) ctx.closePath();
+              ctx.stroke();
+              ctx.restore();
+            }
+          } catch(_cadPoly) {}
+          continue;
+        }
+
         if(!drawAll){ if(el.type==='wall'){ if(!wallIntersectsDirty(el)){ try{ __plan2d.__frameProfile.wallsSkipped++; }catch(_skw){}; continue; } } else {
             // For doors/windows anchored to a wall, check host wall bbox; else check element endpoints
             if(typeof el.host==='number' && elems[el.host] && elems[el.host].type==='wall'){ if(!wallIntersectsDirty(elems[el.host])){ try{ __plan2d.__frameProfile.openingsSkipped++; }catch(_sko1){}; continue; } }
@@ -1510,7 +1551,7 @@
       if(!__plan2d.panning && !__plan2d.dragWall && !__plan2d.dragWindow && !__plan2d.dragDoor && !__plan2d.dragGroup && !__plan2d.userDrawingActive){
         if((__plan2d.__lastFitCheck||0) + 900 < nowChk){
           __plan2d.__lastFitCheck = nowChk;
-          var hasEls = Array.isArray(__plan2d.elements) && __plan2d.elements.length>0;
+          var hasEls = (Array.isArray(__plan2d.elements) && __plan2d.elements.length>0) || !!__plan2d.cadTiles;
           if(hasEls && typeof plan2dComputeBounds==='function'){
             var b = plan2dComputeBounds();
             if(b){
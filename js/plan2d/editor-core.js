@@ -1513,6 +1513,7 @@
     try { 
       // Clear 2D plan elements
       __plan2d.elements=[]; 
+      __plan2d.cadTiles=null; 
       __plan2d.selectedIndex=-1; 
       __plan2d.chainActive=false; 
       __plan2d.chainPoints=[]; 
@@ -29,7 +29,9 @@
   if (typeof window.plan2dComputeBounds !== 'function') {
     window.plan2dComputeBounds = function plan2dComputeBounds(){
       try {
-        if (!window.__plan2d || !Array.isArray(__plan2d.elements) || __plan2d.elements.length === 0) return null;
+        if (!window.__plan2d) return null;
+        var cadTiles = __plan2d.cadTiles && __plan2d.cadTiles.bounds;
+        if (!cadTiles && (!Array.isArray(__plan2d.elements) || __plan2d.elements.length === 0)) return null;
         var minX = Infinity, minY = Infinity, maxX = -Infinity, maxY = -Infinity;
         function addPt(x, y){
           if (!isFinite(x) || !isFinite(y)) return;
@@ -38,6 +40,11 @@
           if (y < minY) minY = y;
           if (y > maxY) maxY = y;
         }
+        // Tiled CAD linework (not in elements): the tile index bounds.
+        if (cadTiles) {
+          addPt(cadTiles.minX, cadTiles.minY);
+          addPt(cadTiles.maxX, cadTiles.maxY);
+        }
         for (var i=0; i<__plan2d.elements.length; i++){
           var e = __plan2d.elements[i];
           if (!e) continue;
@@ -46,6 +53,17 @@
             addPt(e.x1, e.y1);
             continue;
           }
+          if (e.type === 'polyline' && Array.isArray(e.points)){
+            for (var pk=0; pk+1<e.points.length; pk+=2) addPt(e.points[pk], e.points[pk+1]);
+            continue;
+          }
+          // CAD curves: bounds of the full circle/ellipse.
+          if (e.type === 'arc' || e.type === 'circle' || e.type === 'ellipse'){
+            var rc = (e.type === 'ellipse') ? Math.max(e.rx || 0, e.ry || 0) : (e.r || 0);
+            addPt(e.cx - rc, e.cy - rc);
+            addPt(e.cx + rc, e.cy + rc);
+            continue;
+          }
           // Hosted openings: compute endpoints from host wall.
           if ((e.type === 'window' || e.type === 'door') && typeof e.host === 'number'){
             var host = __plan2d.elements[e.host];
@@ -102,6 +120,16 @@
                 addPt(e.x1, e.y1);
                 continue;
               }
+              if (e.type === 'polyline' && Array.isArray(e.points)){
+                for (var pk=0; pk+1<e.points.length; pk+=2) addPt(e.points[pk], e.points[pk+1]);
+                continue;
+              }
+              if (e.type === 'arc' || e.type === 'circle' || e.type === 'ellipse'){
+                var rc = (e.type === 'ellipse') ? Math.max(e.rx || 0, e.ry || 0) : (e.r || 0);
+                addPt(e.cx - rc, e.cy - rc);
+                addPt(e.cx + rc, e.cy + rc);
+                continue;
+              }
               if ((e.type === 'window' || e.type === 'door') && typeof e.host === 'number'){
                 var host = __plan2d.elements[e.host];
                 if (host && host.type === 'wall'){
@@ -0,0 +1,217 @@
+// Plan2D CAD tiles: linework of a DWG/DXF import that the server keeps as quadtree tiles
+// (to-plan2d with tiles=true, served from /api/plan2d/tiles/{import}/{z}/{x}/{y}).
+// Only the tiles covering the viewport are fetched, at a zoom level where a tile is about
+// TILE_PX on screen; while a tile loads its nearest loaded ancestor is drawn instead.
+// Imports with level-of-detail copies (meta.tiles.lods) are drawn from the coarsest level whose
+// tolerance is under a pixel at the current scale.
+// Defines: plan2dSetCadTiles, plan2dDrawCadTiles
+(function(){
+  var TILE_PX = 512;      // target on-screen tile size (canvas pixels)
+  var MAX_VISIBLE = 64;   // coarser level when more tiles than this would be visible
+  var CACHE_MAX = 256;    // loaded tiles kept per import
+  var MAX_INFLIGHT = 6;
+
+  // meta: result.meta.tiles of /api/dwg/to-plan2d ({ url, bounds, maxZoom, depth, styles, ... }), or null.
+  window.plan2dSetCadTiles = function plan2dSetCadTiles(meta){
+    if (!window.__plan2d) return;
+    if (!meta || !meta.url || !Array.isArray(meta.bounds) || meta.bounds.length !== 4) { __plan2d.cadTiles = null; return; }
+    var b = meta.bounds;
+    __plan2d.cadTiles = {
+      url: meta.url,
+      styles: Array.isArray(meta.styles) ? meta.styles : [],
+      bounds: { minX: b[0], minY: b[1], maxX: b[2], maxY: b[3] },
+      size: Math.max(1e-9, b[2] - b[0]),
+      maxZoom: Math.max(0, Math.min(meta.maxZoom || 0, (typeof meta.depth === 'number' ? meta.depth : (meta.maxZoom || 0)))),
+      lods: Array.isArray(meta.lods) ? meta.lods : [],
+      tiles: {},      // 'z/x/y' -> decoded tile
+      order: [],      // loaded keys, oldest first
+      pending: {},    // 'z/x/y' -> true while queued or in flight
+      queue: [],
+      inflight: 0,
+      loaded: false,  // a tile arrived since the last redraw
+      strokes: {}     // style id + mode -> resolved stroke color
+    };
+  };
+
+  function tileKey(lod, z, x, y){ return lod + ':' + z + '/' + x + '/' + y; }
+
+  // Coarsest level whose simplification tolerance stays under one canvas pixel (levels that
+  // reuse a finer one name it in `of`).
+  function pickLod(st, s){
+    var best = null;
+    for (var i=0; i<st.lods.length; i++) {
+      var l = st.lods[i];
+      if (l && typeof l.tolM === 'number' && l.tolM * s <= 1 && (!best || l.level > best.level)) best = l;
+    }
+    if (!best) return 0;
+    return (typeof best.of === 'number') ? best.of : best.level;
+  }
+
+  // Group segment indexes by style once per tile so a frame issues one path per style.
+  function decodeTile(json){
+    var byStyle = {};
+    var ls = json.lineStyles || [];
+    for (var i=0; i<ls.length; i++) (byStyle[ls[i]] || (byStyle[ls[i]] = [])).push(i);
+    return { lines: json.lines || [], byStyle: byStyle, shapes: json.shapes || [] };
+  }
+
+  function remember(st, key, tile){
+    st.tiles[key] = tile;
+    st.order.push(key);
+    while (st.order.length > CACHE_MAX) delete st.tiles[st.order.shift()];
+  }
+
+  function pump(st){
+    while (st.inflight < MAX_INFLIGHT && st.queue.length) {
+      var job = st.queue.shift();
+      st.inflight++;
+      (function(job){
+        var url = st.url.replace('{z}', job[0]).replace('{x}', job[1]).replace('{y}', job[2]) + (job[4] ? '?lod=' + job[4] : '');
+        fetch(url, { cache: 'no-store' }).then(function(res){ return res.ok ? res.json() : null; }).then(function(json){
+          if (json && json.ok) remember(st, job[3], decodeTile(json));
+          else remember(st, job[3], { lines: [], byStyle: {}, shapes: [] });
+          st.loaded = true;
+        }).catch(function(){ /* network error: retried on the next draw */ }).then(function(){
+          delete st.pending[job[3]];
+          st.inflight--;
+          // Stale import (cleared or replaced): stop here.
+          if (!window.__plan2d || __plan2d.cadTiles !== st) return;
+          pump(st);
+          if (!st.inflight && st.loaded && typeof window.plan2dDraw === 'function') { st.loaded = false; window.plan2dDraw(); }
+        });
+      })(job);
+    }
+  }
+
+  function request(st, lod, z, x, y, key){
+    if (st.pending[key]) return;
+    st.pending[key] = true;
+    st.queue.push([z, x, y, key, lod]);
+  }
+
+  // Auto-contrast against the canvas background, as for inline CAD linework.
+  function strokeFor(st, sid, cadMode){
+    var k = sid + (cadMode ? 'c' : 'd');
+    var cached = st.strokes[k];
+    if (cached) return cached;
+    var style = st.styles[sid] || {};
+    var stroke = style.stroke || (cadMode ? 'rgba(0,0,0,0.85)' : 'rgba(255,255,255,0.85)');
+    if (typeof stroke === 'string' && stroke.charAt(0) === '#' && stroke.length === 7) {
+      var rr = parseInt(stroke.slice(1,3), 16), gg = parseInt(stroke.slice(3,5), 16), bb = parseInt(stroke.slice(5,7), 16);
+      if (isFinite(rr) && isFinite(gg) && isFinite(bb)) {
+        var lum = (0.2126*rr + 0.7152*gg + 0.0722*bb) / 255;
+        if (!cadMode && lum < 0.15) stroke = 'rgba(255,255,255,0.85)';
+        if (cadMode && lum > 0.92) stroke = 'rgba(0,0,0,0.85)';
+      }
+    }
+    st.strokes[k] = stroke;
+    return stroke;
+  }
+
+  function drawTile(ctx, st, tile, s, ox, oy, cadMode){
+    var lines = tile.lines;
+    for (var sid in tile.byStyle) {
+      var idx = tile.byStyle[sid];
+      ctx.strokeStyle = strokeFor(st, sid, cadMode);
+      ctx.beginPath();
+      for (var i=0; i<idx.length; i++) {
+        var o = idx[i] * 4;
+        ctx.moveTo(ox + lines[o]*s, oy - lines[o+1]*s);
+        ctx.lineTo(ox + lines[o+2]*s, oy - lines[o+3]*s);
+      }
+      ctx.stroke();
+    }
+    var shapes = tile.shapes;
+    for (var j=0; j<shapes.length; j++) {
+      var sh = shapes[j];
+      ctx.strokeStyle = strokeFor(st, sh.s, cadMode);
+      ctx.beginPath();
+      if (sh.type === 'rect') {
+        // Merged hatch/underlay cells of a coarse level.
+        ctx.fillStyle = ctx.strokeStyle;
+        ctx.globalAlpha = 0.35;
+        ctx.fillRect(ox + sh.x0*s, oy - sh.y1*s, (sh.x1 - sh.x0)*s, (sh.y1 - sh.y0)*s);
+        ctx.globalAlpha = 1;
+        continue;
+      }
+      if (sh.type === 'polyline') {
+        var pts = sh.points;
+        if (!pts || pts.length < 4) continue;
+        ctx.moveTo(ox + pts[0]*s, oy - pts[1]*s);
+        for (var pk=2; pk+1<pts.length; pk+=2) ctx.lineTo(ox + pts[pk]*s, oy - pts[pk+1]*s);
+        if (sh.closed) ctx.closePath();
+      } else {
+        // Screen Y is flipped, so CCW world angles are negated and drawn anticlockwise.
+        var a0 = (sh.type === 'circle') ? 0 : (sh.a0 || 0);
+        var a1 = (sh.type === 'circle') ? Math.PI*2 : (sh.a1 || 0);
+        var cx = ox + sh.cx*s, cy = oy - sh.cy*s;
+        if (sh.type === 'ellipse') ctx.ellipse(cx, cy, Math.max(0, sh.rx*s), Math.max(0, sh.ry*s), -(sh.rot||0), -a0, -a1, true);
+        else ctx.arc(cx, cy, Math.max(0, sh.r*s), -a0, -a1, true);
+      }
+      ctx.stroke();
+    }
+  }
+
+  // Called by plan2dDraw before the element pass.
+  window.plan2dDrawCadTiles = function plan2dDrawCadTiles(ctx){
+    var st = window.__plan2d && __plan2d.cadTiles;
+    if (!st || !ctx) return;
+    var c = document.getElementById('plan2d-canvas'); if (!c) return;
+    var s = __plan2d.scale || 50;
+    var ox = c.width/2 + ((__plan2d.panX||0) * s);
+    var oy = c.height/2 - ((__plan2d.panY||0) * s);
+    // Visible world rectangle (screen Y grows downwards).
+    var vx0 = (0 - ox)/s, vx1 = (c.width - ox)/s;
+    var vy0 = (oy - c.height)/s, vy1 = oy/s;
+    var b = st.bounds;
+    if (vx1 < b.minX || vx0 > b.maxX || vy1 < b.minY || vy0 > b.maxY) return;
+
+    var z = Math.round(Math.log(st.size * s / TILE_PX) / Math.LN2);
+    z = Math.max(0, Math.min(st.maxZoom, isFinite(z) ? z : 0));
+    var tx0, tx1, ty0, ty1;
+    for (;;) {
+      var n = 1 << z, ts = st.size / n;
+      tx0 = Math.max(0, Math.floor((vx0 - b.minX) / ts)); tx1 = Math.min(n - 1, Math.floor((vx1 - b.minX) / ts));
+      ty0 = Math.max(0, Math.floor((vy0 - b.minY) / ts)); ty1 = Math.min(n - 1, Math.floor((vy1 - b.minY) / ts));
+      if (z === 0 || (tx1 - tx0 + 1) * (ty1 - ty0 + 1) <= MAX_VISIBLE) break;
+      z--;
+    }
+
+    var cadMode = false; try { cadMode = document.body && document.body.classList.contains('cad-mode'); } catch(_cm) { cadMode = false; }
+    ctx.save();
+    var dpr = window.devicePixelRatio || 1;
+    var cadPx = (typeof __plan2d.cadStrokePx === 'number' && isFinite(__plan2d.cadStrokePx)) ? __plan2d.cadStrokePx : 1.35;
+    ctx.lineWidth = Math.max(1, cadPx * dpr);
+    ctx.lineCap = 'round';
+    ctx.lineJoin = 'round';
+    ctx.setLineDash([]);
+    var lod = pickLod(st, s);
+    var drawn = {};
+    for (var x = tx0; x <= tx1; x++) {
+      for (var y = ty0; y <= ty1; y++) {
+        var key = tileKey(lod, z, x, y);
+        var tile = st.tiles[key];
+        if (!tile) {
+          request(st, lod, z, x, y, key);
+          // Fall back to the nearest loaded ancestor, of this level or any other (drawn once even
+          // if it covers several tiles).
+          for (var pz = z, px = x, py = y; pz >= 0 && !tile; pz--, px >>= 1, py >>= 1) {
+            for (var li = -1; li < st.lods.length && !tile; li++) {
+              var pl = (li < 0) ? lod : st.lods[li].level;
+              if (li >= 0 && pl === lod) continue;
+              key = tileKey(pl, pz, px, py);
+              tile = st.tiles[key];
+            }
+          }
+          if (!tile) continue;
+        }
+        if (drawn[key]) continue;
+        drawn[key] = true;
+        // Items crossing tile borders are stored in each tile they touch and stroked once per tile.
+        drawTile(ctx, st, tile, s, ox, oy, cadMode);
+      }
+    }
+    ctx.restore();
+    pump(st);
+  };
+})();
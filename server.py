@@ -18,14 +18,52 @@ except Exception as _photoreal_err:
     photoreal_renderer = None  # type: ignore
     _PHOTOREAL_IMPORT_ERROR = _photoreal_err
 
+try:
+    from dwgimport import clip as dwg_clip, dxf as dwg_dxf, layers as dwg_layers, memory as dwg_memory, plan2d as dwg_plan2d, progress as dwg_progress, tiles as dwg_tiles, timings as dwg_timings
+    _DWGIMPORT_IMPORT_ERROR = None
+except Exception as _dwgimport_err:
+    dwg_dxf = None  # type: ignore
+    dwg_plan2d = None  # type: ignore
+    dwg_layers = None  # type: ignore
+    dwg_clip = None  # type: ignore
+    dwg_tiles = None  # type: ignore
+    dwg_progress = None  # type: ignore
+    dwg_memory = None  # type: ignore
+    dwg_timings = None  # type: ignore
+    _DWGIMPORT_IMPORT_ERROR = _dwgimport_err
+
 # Lightweight in-memory store for test reports
 _last_test_report = { 'msg': '', 'ts': 0 }
 # In-memory admin data: basic user registry and error log
 _admin_users = {}
 _admin_errors = []
+# Tile indexes of recent CAD imports (to-plan2d with tiles=true), served by /api/plan2d/tiles/.
+_plan2d_tiles = dwg_tiles.TileStore(int(os.environ.get('GABLOK_TILE_IMPORTS') or 8)) if dwg_tiles else None
+# Live progress of to-plan2d imports by client-chosen id, streamed by /api/dwg/progress/.
+_dwg_progress = dwg_progress.ProgressStore(64) if dwg_progress else None
+# Per-stage timing totals of to-plan2d imports, reported by /api/dwg/status.
+_dwg_import_stats = dwg_timings.TimingStats() if dwg_timings else None
 _FORCE_CANONICAL_HOST = str(os.environ.get('FORCE_CANONICAL_HOST', '')).lower() in ('1','true','yes','on')
 
 
+class _BadOption(ValueError):
+    # A to-plan2d option that is not a usable number; answered with a 400 naming the option.
+    def __init__(self, name: str, value):
+        super().__init__(f"Invalid {name}: expected a number, got {value!r}.")
+        self.name = name
+
+
+def _number_option(name: str, value, cast=float):
+    # cast(value) for the request option `name` (finite), else _BadOption.
+    try:
+        number = cast(value)
+        if not (number - number == 0):
+            raise ValueError(name)
+        return number
+    except (TypeError, ValueError, OverflowError):
+        raise _BadOption(name, value) from None
+
+
 class NoCacheHandler(SimpleHTTPRequestHandler):
     # Use HTTP/1.1 for better compatibility with some forwarding proxies that
     # may expect keep-alive semantics; we still explicitly send Connection: close.
@@ -254,7 +292,8 @@ class NoCacheHandler(SimpleHTTPRequestHandler):
                         'binFound': bool(dxf2dwg_bin and shutil.which(dxf2dwg_bin)),
                         'converterBin': dxf2dwg_bins.get('converter') or '',
                         'converterFound': bool((dxf2dwg_bins.get('converter') or '') and shutil.which(dxf2dwg_bins.get('converter') or ''))
-                    }
+                    },
+                    'imports': _dwg_import_stats.snapshot() if _dwg_import_stats is not None else None
                 }
                 out = json.dumps(body).encode('utf-8')
                 self.send_response(200)
@@ -269,6 +308,73 @@ class NoCacheHandler(SimpleHTTPRequestHandler):
                 self.end_headers()
                 self.wfile.write(json.dumps({ 'ok': False, 'error': 'status-failed', 'message': str(exc) }).encode('utf-8'))
             return
+        # Quadtree tiles of a CAD import: /api/plan2d/tiles/{import}/{z}/{x}/{y}
+        if self.path.split('?', 1)[0].startswith('/api/plan2d/tiles/'):
+            parts = self.path.split('?', 1)[0][len('/api/plan2d/tiles/'):].strip('/').split('/')
+            body = None
+            try:
+                if _plan2d_tiles is not None and len(parts) == 4:
+                    index = _plan2d_tiles.get(parts[0])
+                    lod = int((parse_qs(urlparse(self.path).query).get('lod') or ['0'])[0] or 0)
+                    if index is not None and index.level(lod) is not None:
+                        body = index.level(lod).tile_json(int(parts[1]), int(parts[2]), int(parts[3].split('.', 1)[0]))
+            except ValueError:
+                body = None
+            if body is None:
+                body = json.dumps({ 'ok': False, 'error': 'tile-not-found' }).encode('utf-8')
+                self.send_response(404)
+            else:
+                self.send_response(200)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            return
+        # Import progress as Server-Sent Events: /api/dwg/progress/{id}, the progressId of a to-plan2d
+        # request. One 'progress' event per change (coalesced), then a 'done' event.
+        if self.path.split('?', 1)[0].startswith('/api/dwg/progress/'):
+            tracker = _dwg_progress.get(self.path.split('?', 1)[0][len('/api/dwg/progress/'):].strip('/'), create=True) if _dwg_progress else None
+            if tracker is None:
+                body = json.dumps({ 'ok': False, 'error': 'bad-progress-id' }).encode('utf-8')
+                self.send_response(404)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+            self.send_header('Cache-Control', 'no-store')
+            self.send_header('Connection', 'close')
+            self.send_header('X-Accel-Buffering', 'no')
+            self.end_headers()
+            self.close_connection = True
+            version = -1
+            try:
+                while True:
+                    seen = tracker.wait(version, 15.0)
+                    if seen == version:
+                        # Nothing new: a comment keeps proxies from closing the stream. A subscription
+                        # to an id no import has used gives up sooner.
+                        idle = time.monotonic() - tracker.updated
+                        if idle > 900.0 or (tracker.stage == 'pending' and idle > dwg_progress.PENDING_TIMEOUT):
+                            break
+                        self.wfile.write(b': keepalive\n\n')
+                        continue
+                    version = seen
+                    snap = tracker.snapshot()
+                    event = b'done' if snap['done'] else b'progress'
+                    self.wfile.write(b'event: ' + event + b'\ndata: ' + json.dumps(snap, separators=(',', ':')).encode('utf-8') + b'\n\n')
+                    if snap['done']:
+                        break
+                    # At most ten events a second.
+                    time.sleep(0.1)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            return
         # Forwarded URL helper endpoint: returns JSON with the URL inferred from Host header
         if self.path == '/__forwarded':
             try:
@@ -872,10 +978,28 @@ class NoCacheHandler(SimpleHTTPRequestHandler):
             length = int(self.headers.get('Content-Length', '0'))
         except Exception:
             length = 0
+        # DWG imports with ?progressId= report the upload as it is read (see /api/dwg/progress/).
+        tracker = None
+        if path == '/api/dwg/to-plan2d' and _dwg_progress is not None:
+            tracker = _dwg_progress.get((parse_qs(urlparse(self.path).query).get('progressId') or [''])[0], create=True)
+            if tracker is not None:
+                tracker.enter('upload', length)
         raw = b''
         if length > 0:
             try:
-                raw = self.rfile.read(length)
+                if tracker is None:
+                    raw = self.rfile.read(length)
+                else:
+                    chunks = []
+                    got = 0
+                    while got < length:
+                        chunk = self.rfile.read(min(1 << 20, length - got))
+                        if not chunk:
+                            break
+                        chunks.append(chunk)
+                        got += len(chunk)
+                        tracker.update(bytes_read=got)
+                    raw = b''.join(chunks)
             except Exception:
                 raw = b''
         try:
@@ -972,1561 +1096,126 @@ class NoCacheHandler(SimpleHTTPRequestHandler):
         # DWG conversion endpoints (require external converter tool)
         # These endpoints accept JSON with base64 payloads to keep the server lightweight.
         if path == '/api/dwg/to-plan2d':
-            def _send_json(status: int, payload: dict):
-                try:
-                    body = json.dumps(payload).encode('utf-8')
-                except Exception:
-                    body = b'{"error":"json-encode-failed"}'
-                self.send_response(status)
-                self.send_header('Content-Type', 'application/json; charset=utf-8')
+            # NDJSON streaming (stream=true): once started, the response is chunked and every
+            # reply, errors included, goes out as one JSON line.
+            stream = { 'on': False }
+            # Memory-bounded import (memoryBudgetMb): the body is encoded and written piece by piece.
+            low_memory = { 'on': False }
+            # Stage timer of this import (see dwgimport/timings.py), once the pipeline is available.
+            timings = None
+
+            def _stream_line(obj: dict) -> int:
+                body = json.dumps(obj, separators=(',', ':')).encode('utf-8') + b'\n'
+                self.wfile.write(b'%x\r\n' % len(body) + body + b'\r\n')
+                return len(body)
+
+            def _stream_start(header: dict):
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
                 self.send_header('Cache-Control', 'no-store')
+                self.send_header('Transfer-Encoding', 'chunked')
+                # Reverse proxies must pass lines through as they are written.
+                self.send_header('X-Accel-Buffering', 'no')
                 self.end_headers()
-                try:
-                    self.wfile.write(body)
-                except Exception:
-                    pass
-
-            def _iter_dxf_pairs(fp):
-                while True:
-                    code_line = fp.readline()
-                    if not code_line:
-                        return
-                    val_line = fp.readline()
-                    if not val_line:
-                        return
-                    yield code_line.strip(), val_line.rstrip('\r\n')
-
-            def _parse_float(s: str):
-                try:
-                    return float(s.strip())
-                except Exception:
-                    return None
-
-            def _parse_int(s: str):
-                try:
-                    return int(s.strip())
-                except Exception:
-                    return None
-
-            def _aci_to_rgb_int(aci: int) -> int:
-                # Minimal AutoCAD Color Index mapping for common values.
-                # Prefer truecolor (DXF group 420) when present.
-                try:
-                    a = int(aci)
-                except Exception:
-                    return 0x111111
-                a = abs(a)
-                if a == 1:
-                    return 0xFF0000
-                if a == 2:
-                    return 0xFFFF00
-                if a == 3:
-                    return 0x00FF00
-                if a == 4:
-                    return 0x00FFFF
-                if a == 5:
-                    return 0x0000FF
-                if a == 6:
-                    return 0xFF00FF
-                if a == 7:
-                    return 0x111111
-                return 0x111111
-
-            def _rgb_int_to_hex(rgb: int) -> str:
-                try:
-                    v = int(rgb) & 0xFFFFFF
-                    return '#%06x' % v
-                except Exception:
-                    return '#111111'
-
-            def _dxf_to_segments(
-                dxf_path: str,
-                max_segments: int,
-                expand_inserts: bool,
-                max_insert_segs: int,
-                *,
-                curve_radius_frac: float = 0.25,
-                curve_max_chord: float = 500.0,
-                curve_min_segs: int = 3,
-                curve_max_segs: int = 96,
-                spline_samples_per_ctrl: int = 4,
-                spline_samples_min: int = 16,
-                spline_samples_max: int = 256,
-            ):
-                # Returns (segments, meta)
-                from typing import Dict, List, Optional, Tuple
-                segs = []
-                meta = {
-                    'truncated': False,
-                    'segments': 0,
-                    'blocks': 0,
-                    'insertsExpanded': 0,
-                    'colors': 0,
-                    'arcs': 0,
-                    'circles': 0,
-                    'ellipses': 0,
-                    'splines': 0,
-                    'bulgeArcs': 0,
-                }
-
-                # Layer table colors (name -> rgb int). Used to resolve BYLAYER (ACI 256).
-                layer_rgb: Dict[str, int] = {}
-
-                in_entities = False
-                in_blocks = False
-                in_tables = False
-                in_layer_table = False
-                current_layer_name: Optional[str] = None
-                current_layer_aci: Optional[int] = None
-                current_layer_true: Optional[int] = None
-                expecting_section_name = False
-
-                blocks = {}
-                current_block_name = None
-                current_block_base = (0.0, 0.0)
-                current_block_segs = None
-                current_block_inserts = None
-                block_header_active = False
-
-                # Flatten nested INSERTs within blocks (memoized).
-                # Produces a list of segments in the block's local coordinate space.
-                flattened_blocks: Dict[str, List[Tuple[float, float, float, float, int, Optional[str], Optional[int]]]] = {}
-
-                def _apply_insert_to_segs(
-                    base_segs: List[Tuple[float, float, float, float, int, Optional[str], Optional[int]]],
-                    ins: dict,
-                    out: List[Tuple[float, float, float, float, int, Optional[str], Optional[int]]],
-                    *,
-                    max_out: int,
-                    allow_downsample: bool
-                ):
-                    try:
-                        import math
-                        ix_raw = ins.get('x')
-                        iy_raw = ins.get('y')
-                        if ix_raw is None or iy_raw is None:
-                            return
-                        ix = float(ix_raw)
-                        iy = float(iy_raw)
-                        sx = float(ins.get('sx') or 1.0)
-                        sy = float(ins.get('sy') or 1.0)
-                        if sx == 0.0:
-                            sx = 1.0
-                        if sy == 0.0:
-                            sy = 1.0
-                        ang = float(ins.get('rot') or 0.0) * math.pi / 180.0
-                        ca = math.cos(ang)
-                        sa = math.sin(ang)
-                    except Exception:
-                        try:
-                            ix_raw = ins.get('x')
-                            iy_raw = ins.get('y')
-                            if ix_raw is None or iy_raw is None:
-                                return
-                            ix = float(ix_raw)
-                            iy = float(iy_raw)
-                        except Exception:
-                            return
-                        sx, sy, ca, sa = 1.0, 1.0, 1.0, 0.0
-
-                    step = 1
-                    if allow_downsample and max_insert_segs > 0 and len(base_segs) > max_insert_segs:
-                        step = int((len(base_segs) + max_insert_segs - 1) / max_insert_segs)
-                        if step < 1:
-                            step = 1
-
-                    for i in range(0, len(base_segs), step):
-                        if len(out) >= max_out:
-                            meta['truncated'] = True
-                            break
-                        x0, y0, x1, y1, seg_rgb, seg_layer, seg_aci = base_segs[i]
-
-                        # Apply scale
-                        x0 *= sx
-                        y0 *= sy
-                        x1 *= sx
-                        y1 *= sy
-                        # Apply rotation
-                        rx0 = x0 * ca - y0 * sa
-                        ry0 = x0 * sa + y0 * ca
-                        rx1 = x1 * ca - y1 * sa
-                        ry1 = x1 * sa + y1 * ca
-
-                        # BYBLOCK inheritance (rgb==0): inherit this INSERT's visual attrs.
-                        if seg_rgb == 0 and (ins.get('rgb') is not None or ins.get('aci') is not None):
-                            seg_layer = ins.get('layer')
-                            seg_aci = ins.get('aci')
-                            seg_rgb = int(_resolve_rgb(seg_layer, seg_aci, ins.get('rgb'))) & 0xFFFFFF
-
-                        out.append((rx0 + ix, ry0 + iy, rx1 + ix, ry1 + iy, int(seg_rgb) & 0xFFFFFF, seg_layer, seg_aci))
-
-                def _flatten_block(name: str, depth: int = 0):
-                    if not name:
-                        return []
-                    if name in flattened_blocks:
-                        return flattened_blocks[name]
-                    if depth > 8:
-                        flattened_blocks[name] = []
-                        return []
-                    blk = blocks.get(name)
-                    if not blk:
-                        flattened_blocks[name] = []
-                        return []
-
-                    base = list(blk.get('segs') or [])
-                    ins_list = blk.get('inserts') or []
-
-                    if not ins_list:
-                        flattened_blocks[name] = base
-                        return base
-
-                    out = list(base)
-                    # Expand nested inserts inside the block.
-                    for ins in ins_list:
-                        try:
-                            child = str(ins.get('name') or '')
-                        except Exception:
-                            child = ''
-                        if not child:
-                            continue
-                        child_segs = _flatten_block(child, depth + 1)
-                        if not child_segs:
-                            continue
-                        if meta.get('truncated'):
-                            break
-                        _apply_insert_to_segs(child_segs, ins, out, max_out=max_segments, allow_downsample=False)
-                    flattened_blocks[name] = out
-                    return out
-
-                cur_type = None
-                line_ent: Dict[str, Optional[float]] = { 'x0': None, 'y0': None, 'x1': None, 'y1': None }
-                lw = { 'xs': [], 'ys': [], 'bulges': [], 'flags': 0 }
-
-                arc_ent: Dict[str, Optional[float]] = { 'cx': None, 'cy': None, 'r': None, 'a0': None, 'a1': None }
-                circ_ent: Dict[str, Optional[float]] = { 'cx': None, 'cy': None, 'r': None }
-                ellipse_ent: Dict[str, Optional[float]] = { 'cx': None, 'cy': None, 'mx': None, 'my': None, 'ratio': None, 't0': None, 't1': None }
-                spline_ent = {
-                    'degree': None,
-                    'flags': 0,
-                    'knots': [],
-                    'weights': [],
-                    'ctrl': [],
-                    'fit': []
-                }
-
-                # Per-entity visual attributes
-                cur_layer: Optional[str] = None
-                cur_aci: Optional[int] = None
-                cur_rgb: Optional[int] = None
-                cur_invisible: bool = False
-                # Per-entity space/layout: skip Paper Space (layout) entities to avoid scrambled imports.
-                # DXF: 67=1 indicates paper space; 410 indicates layout name ("Model" for model space).
-                cur_paperspace: bool = False
-
-                poly_active = False
-                vertex_active = False
-                poly_xs: List[float] = []
-                poly_ys: List[float] = []
-                poly_bulges: List[float] = []
-                poly_flags: int = 0
-                vertex: Dict[str, Optional[float]] = { 'x': None, 'y': None }
-                vertex_bulge: Optional[float] = None
-
-                insert_active = False
-                insert_ent = { 'name': None, 'x': None, 'y': None, 'sx': 1.0, 'sy': 1.0, 'rot': 0.0, 'layer': None, 'aci': None, 'rgb': None }
-
-                def _resolve_rgb(layer: Optional[str], aci: Optional[int], rgb: Optional[int]) -> int:
-                    if rgb is not None:
-                        try:
-                            return int(rgb) & 0xFFFFFF
-                        except Exception:
-                            return 0x111111
-                    if aci is not None:
-                        try:
-                            ai = int(aci)
-                            if ai == 256:
-                                # BYLAYER; without reading the LAYER table we can't resolve this perfectly.
-                                if layer and layer in layer_rgb:
-                                    return int(layer_rgb.get(layer) or 0x111111) & 0xFFFFFF
-                                return 0x111111
-                            if ai == 0:
-                                # BYBLOCK (resolve at INSERT time)
-                                return 0
-                            return _aci_to_rgb_int(ai)
-                        except Exception:
-                            return 0x111111
-                    return 0x111111
-
-                def _flush_layer_table_record():
-                    nonlocal current_layer_name, current_layer_aci, current_layer_true
-                    try:
-                        name = current_layer_name
-                        if not name:
-                            return
-                        if current_layer_true is not None:
-                            layer_rgb[name] = int(current_layer_true) & 0xFFFFFF
-                            return
-                        if current_layer_aci is not None:
-                            ai = abs(int(current_layer_aci))
-                            layer_rgb[name] = int(_aci_to_rgb_int(ai)) & 0xFFFFFF
-                    except Exception:
-                        return
-                    finally:
-                        current_layer_name = None
-                        current_layer_aci = None
-                        current_layer_true = None
-
-                def _push_seg(out, x0, y0, x1, y1, *, layer: Optional[str], aci: Optional[int], rgb: Optional[int]):
-                    if len(out) >= max_segments:
-                        meta['truncated'] = True
-                        return
-                    if x0 is None or y0 is None or x1 is None or y1 is None:
-                        return
-                    if not (isinstance(x0, (int, float)) and isinstance(y0, (int, float)) and isinstance(x1, (int, float)) and isinstance(y1, (int, float))):
-                        return
-                    if not (x0 == x0 and y0 == y0 and x1 == x1 and y1 == y1):
-                        return
-                    out.append((
-                        float(x0),
-                        float(y0),
-                        float(x1),
-                        float(y1),
-                        int(_resolve_rgb(layer, aci, rgb)) & 0xFFFFFF,
-                        (str(layer) if layer else None),
-                        (int(aci) if aci is not None else None)
-                    ))
-
-                def _arc_append(
-                    out,
-                    *,
-                    cx: float,
-                    cy: float,
-                    r: float,
-                    a0: float,
-                    a1: float,
-                    ccw: bool,
-                    layer: Optional[str],
-                    aci: Optional[int],
-                    rgb: Optional[int]
-                ):
-                    try:
-                        import math
-                        # Defensive clamp of curve tessellation controls.
-                        try:
-                            radius_frac = float(curve_radius_frac)
-                        except Exception:
-                            radius_frac = 0.25
-                        if not (radius_frac == radius_frac):
-                            radius_frac = 0.25
-                        radius_frac = max(0.01, min(1.0, radius_frac))
-                        try:
-                            chord_cap = float(curve_max_chord)
-                        except Exception:
-                            chord_cap = 500.0
-                        if not (chord_cap == chord_cap) or chord_cap <= 0:
-                            chord_cap = 500.0
-                        try:
-                            min_segs = int(curve_min_segs)
-                        except Exception:
-                            min_segs = 3
-                        try:
-                            max_segs = int(curve_max_segs)
-                        except Exception:
-                            max_segs = 96
-                        if min_segs < 2:
-                            min_segs = 2
-                        if max_segs < min_segs:
-                            max_segs = min_segs
-
-                        if r <= 0 or not (r == r and cx == cx and cy == cy and a0 == a0 and a1 == a1):
-                            return
-                        # Normalize angle span to direction
-                        if ccw:
-                            while a1 <= a0:
-                                a1 += math.tau
-                        else:
-                            while a1 >= a0:
-                                a1 -= math.tau
-                        da = a1 - a0
-                        if da == 0:
-                            return
-
-                        arc_len = abs(da) * abs(r)
-                        # Target chord length in input units (usually mm).
-                        # Use a larger cap than before so large-radius curves don't explode into hundreds of segments.
-                        max_chord = max(1.0, min(chord_cap, abs(r) * radius_frac))
-                        n = int(math.ceil(arc_len / max_chord))
-                        n = max(min_segs, min(max_segs, n))
-                        step = da / float(n)
-
-                        px = cx + r * math.cos(a0)
-                        py = cy + r * math.sin(a0)
-                        for i in range(1, n + 1):
-                            if len(out) >= max_segments:
-                                meta['truncated'] = True
-                                break
-                            ang = a0 + step * i
-                            x = cx + r * math.cos(ang)
-                            y = cy + r * math.sin(ang)
-                            _push_seg(out, px, py, x, y, layer=layer, aci=aci, rgb=rgb)
-                            px, py = x, y
-                    except Exception:
-                        return
-
-                def _bulge_to_arc(out, x0: float, y0: float, x1: float, y1: float, bulge: float, *, layer: Optional[str], aci: Optional[int], rgb: Optional[int]):
-                    try:
-                        import math
-                        b = float(bulge)
-                        if not (b == b) or b == 0.0:
-                            _push_seg(out, x0, y0, x1, y1, layer=layer, aci=aci, rgb=rgb)
-                            return
-                        dx = x1 - x0
-                        dy = y1 - y0
-                        d = math.hypot(dx, dy)
-                        if d <= 1e-12:
-                            return
-                        theta = 4.0 * math.atan(b)
-                        if theta == 0.0:
-                            _push_seg(out, x0, y0, x1, y1, layer=layer, aci=aci, rgb=rgb)
-                            return
-
-                        r = d / (2.0 * math.sin(abs(theta) / 2.0))
-                        # Distance from chord midpoint to center
-                        a = math.sqrt(max(0.0, r * r - (d * 0.5) * (d * 0.5)))
-                        mx = (x0 + x1) * 0.5
-                        my = (y0 + y1) * 0.5
-                        # Left normal of chord
-                        nx = -dy / d
-                        ny = dx / d
-                        sgn = 1.0 if b > 0 else -1.0
-                        cx = mx + nx * a * sgn
-                        cy = my + ny * a * sgn
-                        a0 = math.atan2(y0 - cy, x0 - cx)
-                        a1 = a0 + theta
-                        _arc_append(out, cx=cx, cy=cy, r=r, a0=a0, a1=a1, ccw=(theta > 0), layer=layer, aci=aci, rgb=rgb)
-                        meta['bulgeArcs'] = int(meta.get('bulgeArcs') or 0) + 1
-                    except Exception:
-                        _push_seg(out, x0, y0, x1, y1, layer=layer, aci=aci, rgb=rgb)
-
-                def _flush_arc():
-                    if cur_type != 'ARC':
-                        return
-                    out = current_block_segs if (in_blocks and current_block_segs is not None) else segs
-                    if cur_invisible:
-                        return
+                stream['on'] = True
+                _stream_line(header)
+
+            def _stream_end():
+                stream['on'] = False
+                self.wfile.write(b'0\r\n\r\n')
+
+            def _send_json(status: int, payload: dict, spill=None):
+                # spill: a memory.ElementSpill holding the first elements (low-memory replies only);
+                # payload['elements'] are appended to it and the array is copied from the file.
+                if tracker is not None and status < 400:
+                    tracker.enter('encode')
+                if timings is not None and status < 400:
+                    timings.enter('encode', inItems=len(payload.get('elements') or ()) + (spill.count if spill is not None else 0))
+                reply = None
+                if low_memory['on'] and status < 400 and not stream['on']:
+                    # Encoded into a temp file first (1 MB pieces), so the status and Content-Length
+                    # only go out once the whole body is there.
+                    reply = tempfile.TemporaryFile(prefix='gablok-reply-')
                     try:
-                        import math
-                        cx = arc_ent.get('cx')
-                        cy = arc_ent.get('cy')
-                        r = arc_ent.get('r')
-                        a0 = arc_ent.get('a0')
-                        a1 = arc_ent.get('a1')
-                        if cx is None or cy is None or r is None or a0 is None or a1 is None:
-                            return
-                        _arc_append(out, cx=float(cx), cy=float(cy), r=float(r), a0=float(a0), a1=float(a1), ccw=True, layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
-                        meta['arcs'] = int(meta.get('arcs') or 0) + 1
-                    except Exception:
-                        return
-                    finally:
-                        arc_ent['cx'] = arc_ent['cy'] = arc_ent['r'] = arc_ent['a0'] = arc_ent['a1'] = None
-
-                def _flush_circle():
-                    if cur_type != 'CIRCLE':
-                        return
-                    out = current_block_segs if (in_blocks and current_block_segs is not None) else segs
-                    if cur_invisible:
-                        return
-                    try:
-                        import math
-                        cx = circ_ent.get('cx')
-                        cy = circ_ent.get('cy')
-                        r = circ_ent.get('r')
-                        if cx is None or cy is None or r is None:
-                            return
-                        _arc_append(out, cx=float(cx), cy=float(cy), r=float(r), a0=0.0, a1=math.tau, ccw=True, layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
-                        meta['circles'] = int(meta.get('circles') or 0) + 1
-                    except Exception:
-                        return
-                    finally:
-                        circ_ent['cx'] = circ_ent['cy'] = circ_ent['r'] = None
-
-                def _flush_ellipse():
-                    if cur_type != 'ELLIPSE':
-                        return
-                    out = current_block_segs if (in_blocks and current_block_segs is not None) else segs
-                    if cur_invisible:
-                        return
-                    try:
-                        import math
-                        # Defensive clamp of curve tessellation controls.
-                        try:
-                            radius_frac = float(curve_radius_frac)
-                        except Exception:
-                            radius_frac = 0.25
-                        if not (radius_frac == radius_frac):
-                            radius_frac = 0.25
-                        radius_frac = max(0.01, min(1.0, radius_frac))
-                        try:
-                            chord_cap = float(curve_max_chord)
-                        except Exception:
-                            chord_cap = 500.0
-                        if not (chord_cap == chord_cap) or chord_cap <= 0:
-                            chord_cap = 500.0
-                        try:
-                            min_segs = int(curve_min_segs)
-                        except Exception:
-                            min_segs = 3
-                        try:
-                            max_segs = int(curve_max_segs)
-                        except Exception:
-                            max_segs = 96
-                        if min_segs < 2:
-                            min_segs = 2
-                        if max_segs < min_segs:
-                            max_segs = min_segs
-                        cx = ellipse_ent.get('cx')
-                        cy = ellipse_ent.get('cy')
-                        mx = ellipse_ent.get('mx')
-                        my = ellipse_ent.get('my')
-                        ratio = ellipse_ent.get('ratio')
-                        t0 = ellipse_ent.get('t0')
-                        t1 = ellipse_ent.get('t1')
-                        if cx is None or cy is None or mx is None or my is None or ratio is None or t0 is None or t1 is None:
-                            return
-                        cx = float(cx)
-                        cy = float(cy)
-                        mx = float(mx)
-                        my = float(my)
-                        ratio = float(ratio)
-                        if ratio <= 0:
-                            return
-                        # minor axis vector is perpendicular to major and scaled by ratio
-                        nx = -my * ratio
-                        ny = mx * ratio
-                        # parameter increases CCW from t0 to t1
-                        t0 = float(t0)
-                        t1 = float(t1)
-                        while t1 <= t0:
-                            t1 += math.tau
-                        dt = t1 - t0
-                        # segment count based on major axis length and angle sweep
-                        maj_len = math.hypot(mx, my)
-                        approx_len = abs(dt) * max(1.0, maj_len)
-                        axis_len = max(maj_len, maj_len * ratio)
-                        max_chord = max(1.0, min(chord_cap, axis_len * radius_frac))
-                        n = int(math.ceil(approx_len / max_chord))
-                        n = max(max(8, min_segs * 2), min(max(192, max_segs * 2), n))
-                        step = dt / float(n)
-                        px = cx + mx * math.cos(t0) + nx * math.sin(t0)
-                        py = cy + my * math.cos(t0) + ny * math.sin(t0)
-                        for i in range(1, n + 1):
-                            if len(out) >= max_segments:
-                                meta['truncated'] = True
-                                break
-                            t = t0 + step * i
-                            x = cx + mx * math.cos(t) + nx * math.sin(t)
-                            y = cy + my * math.cos(t) + ny * math.sin(t)
-                            _push_seg(out, px, py, x, y, layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
-                            px, py = x, y
-                        meta['ellipses'] = int(meta.get('ellipses') or 0) + 1
-                    except Exception:
-                        return
-                    finally:
-                        ellipse_ent['cx'] = ellipse_ent['cy'] = ellipse_ent['mx'] = ellipse_ent['my'] = ellipse_ent['ratio'] = ellipse_ent['t0'] = ellipse_ent['t1'] = None
-
-                def _flush_spline():
-                    if cur_type != 'SPLINE':
-                        return
-                    out = current_block_segs if (in_blocks and current_block_segs is not None) else segs
-                    if cur_invisible:
-                        return
+                        body = payload
+                        if spill is not None:
+                            spill(payload.get('elements') or [])
+                            body = { k: v for (k, v) in payload.items() if k != 'elements' }
+                        parts, size = [], 0
+                        for part in json.JSONEncoder().iterencode(body):
+                            # Flush before appending, so the closing brace stays in the last piece.
+                            if size >= (1 << 20):
+                                reply.write(''.join(parts).encode('utf-8'))
+                                parts, size = [], 0
+                            parts.append(part)
+                            size += len(part)
+                        piece = ''.join(parts)
+                        if spill is not None:
+                            # The elements go last, copied from the spill file.
+                            if not piece.endswith('}'):
+                                raise ValueError('reply body is not a JSON object')
+                            piece = piece[:-1] + ', "elements": '
+                        reply.write(piece.encode('utf-8'))
+                        if spill is not None:
+                            spill.write_array(reply.write)
+                            reply.write(b'}')
+                    except Exception as exc:
+                        print(f"[DWG] Low-memory reply encoding failed: {exc!r}", flush=True)
+                        reply.close()
+                        reply = None
+                        status, payload = 500, { 'error': 'json-encode-failed', 'message': str(exc) }
+                sent = 0
+                if stream['on']:
                     try:
-                        import math
-
-                        flags = int(spline_ent.get('flags') or 0)
-                        is_closed = (flags & 1) == 1
-
-                        fit = spline_ent.get('fit') or []
-                        if isinstance(fit, list) and len(fit) >= 2 and (not spline_ent.get('ctrl')):
-                            # Fit-point only fallback
-                            pts = [(float(p[0]), float(p[1])) for p in fit if p and len(p) >= 2]
-                            for i in range(len(pts) - 1):
-                                if len(out) >= max_segments:
-                                    meta['truncated'] = True
-                                    break
-                                _push_seg(out, pts[i][0], pts[i][1], pts[i + 1][0], pts[i + 1][1], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
-                            if is_closed and len(pts) >= 3 and len(out) < max_segments:
-                                _push_seg(out, pts[-1][0], pts[-1][1], pts[0][0], pts[0][1], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
-                            meta['splines'] = int(meta.get('splines') or 0) + 1
-                            return
-
-                        ctrl = spline_ent.get('ctrl') or []
-                        knots = spline_ent.get('knots') or []
-                        weights = spline_ent.get('weights') or []
-                        p = spline_ent.get('degree')
-                        if p is None:
-                            return
-                        p = int(p)
-                        if p < 1:
-                            return
-                        if not (isinstance(ctrl, list) and isinstance(knots, list) and len(ctrl) >= p + 1 and len(knots) >= (len(ctrl) + p + 1)):
-                            return
-
-                        ctrl_pts = [(float(pt[0]), float(pt[1])) for pt in ctrl if pt and len(pt) >= 2]
-                        if len(ctrl_pts) < p + 1:
-                            return
-                        n = len(ctrl_pts) - 1
-                        U = [float(u) for u in knots]
-
-                        W = None
-                        if isinstance(weights, list) and len(weights) >= len(ctrl_pts):
-                            try:
-                                W = [float(w) for w in weights[: len(ctrl_pts)]]
-                            except Exception:
-                                W = None
-
-                        m = len(U) - 1
-                        u0 = U[p]
-                        u1 = U[m - p]
-                        if not (u0 == u0 and u1 == u1) or u1 <= u0:
-                            return
-
-                        def find_span(u: float) -> int:
-                            # Algorithm A2.1 (The NURBS Book)
-                            if u >= U[n + 1]:
-                                return n
-                            if u <= U[p]:
-                                return p
-                            low = p
-                            high = n + 1
-                            mid = (low + high) // 2
-                            while u < U[mid] or u >= U[mid + 1]:
-                                if u < U[mid]:
-                                    high = mid
-                                else:
-                                    low = mid
-                                mid = (low + high) // 2
-                            return mid
-
-                        def basis_funs(span: int, u: float) -> List[float]:
-                            # Algorithm A2.2
-                            N = [0.0] * (p + 1)
-                            left = [0.0] * (p + 1)
-                            right = [0.0] * (p + 1)
-                            N[0] = 1.0
-                            for j in range(1, p + 1):
-                                left[j] = u - U[span + 1 - j]
-                                right[j] = U[span + j] - u
-                                saved = 0.0
-                                for r in range(0, j):
-                                    denom = right[r + 1] + left[j - r]
-                                    if denom == 0.0:
-                                        temp = 0.0
-                                    else:
-                                        temp = N[r] / denom
-                                    N[r] = saved + right[r + 1] * temp
-                                    saved = left[j - r] * temp
-                                N[j] = saved
-                            return N
-
-                        def curve_point(u: float):
-                            span = find_span(u)
-                            N = basis_funs(span, u)
-                            cx = 0.0
-                            cy = 0.0
-                            cw = 0.0
-                            for j in range(0, p + 1):
-                                i = span - p + j
-                                bx, by = ctrl_pts[i]
-                                wj = W[i] if W is not None else 1.0
-                                Nj = N[j] * wj
-                                cx += Nj * bx
-                                cy += Nj * by
-                                cw += Nj
-                            if cw == 0.0:
-                                return None
-                            return (cx / cw, cy / cw)
-
-                        # Sampling resolution: bounded, scales with control points.
-                        try:
-                            per_ctrl = int(spline_samples_per_ctrl)
-                        except Exception:
-                            per_ctrl = 4
-                        if per_ctrl < 1:
-                            per_ctrl = 1
-                        try:
-                            smin = int(spline_samples_min)
-                        except Exception:
-                            smin = 16
-                        try:
-                            smax = int(spline_samples_max)
-                        except Exception:
-                            smax = 256
-                        if smin < 4:
-                            smin = 4
-                        if smax < smin:
-                            smax = smin
-                        samples = int(max(smin, min(smax, len(ctrl_pts) * per_ctrl)))
-                        prev = None
-                        for si in range(samples + 1):
-                            if len(out) >= max_segments:
-                                meta['truncated'] = True
-                                break
-                            u = u0 + (u1 - u0) * (float(si) / float(samples))
-                            pt = curve_point(u)
-                            if pt is None:
-                                continue
-                            if prev is not None:
-                                _push_seg(out, prev[0], prev[1], pt[0], pt[1], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
-                            prev = pt
-                        # Closed: connect endpoints if needed
-                        if is_closed and prev is not None:
-                            first = curve_point(u0)
-                            if first is not None and len(out) < max_segments:
-                                _push_seg(out, prev[0], prev[1], first[0], first[1], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
-                        meta['splines'] = int(meta.get('splines') or 0) + 1
+                        sent = _stream_line(dict(payload, type=('error' if status >= 400 else 'result'), status=status))
+                        _stream_end()
                     except Exception:
-                        return
-                    finally:
-                        spline_ent['degree'] = None
-                        spline_ent['flags'] = 0
-                        spline_ent['knots'] = []
-                        spline_ent['weights'] = []
-                        spline_ent['ctrl'] = []
-                        spline_ent['fit'] = []
-
-                def _flush_line():
-                    if cur_type != 'LINE':
-                        return
-                    out = current_block_segs if (in_blocks and current_block_segs is not None) else segs
-                    if not cur_invisible:
-                        _push_seg(out, line_ent['x0'], line_ent['y0'], line_ent['x1'], line_ent['y1'], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
-                    line_ent['x0'] = line_ent['y0'] = line_ent['x1'] = line_ent['y1'] = None
-
-                def _flush_lwpoly():
-                    if cur_type != 'LWPOLYLINE':
-                        return
-                    out = current_block_segs if (in_blocks and current_block_segs is not None) else segs
-                    n = min(len(lw['xs']), len(lw['ys']))
-                    if n >= 2 and not cur_invisible:
-                        for i in range(n - 1):
-                            if len(out) >= max_segments:
-                                meta['truncated'] = True
-                                break
-                            try:
-                                bulge = 0.0
-                                if i < len(lw['bulges']):
-                                    bulge = float(lw['bulges'][i] or 0.0)
-                                if bulge:
-                                    _bulge_to_arc(out, float(lw['xs'][i]), float(lw['ys'][i]), float(lw['xs'][i + 1]), float(lw['ys'][i + 1]), bulge, layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
-                                else:
-                                    _push_seg(out, lw['xs'][i], lw['ys'][i], lw['xs'][i + 1], lw['ys'][i + 1], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
-                            except Exception:
-                                _push_seg(out, lw['xs'][i], lw['ys'][i], lw['xs'][i + 1], lw['ys'][i + 1], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
-                        if (lw['flags'] & 1) == 1 and len(out) < max_segments:
-                            try:
-                                bulge_last = 0.0
-                                if (n - 1) < len(lw['bulges']):
-                                    bulge_last = float(lw['bulges'][n - 1] or 0.0)
-                                if bulge_last:
-                                    _bulge_to_arc(out, float(lw['xs'][n - 1]), float(lw['ys'][n - 1]), float(lw['xs'][0]), float(lw['ys'][0]), bulge_last, layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
-                                else:
-                                    _push_seg(out, lw['xs'][n - 1], lw['ys'][n - 1], lw['xs'][0], lw['ys'][0], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
-                            except Exception:
-                                _push_seg(out, lw['xs'][n - 1], lw['ys'][n - 1], lw['xs'][0], lw['ys'][0], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
-                    lw['xs'].clear()
-                    lw['ys'].clear()
-                    lw['bulges'].clear()
-                    lw['flags'] = 0
-
-                def _flush_polyline():
-                    nonlocal poly_active, vertex_active, poly_flags
-                    if not poly_active:
-                        return
-                    out = current_block_segs if (in_blocks and current_block_segs is not None) else segs
-                    n = min(len(poly_xs), len(poly_ys))
-                    if n >= 2 and not cur_invisible:
-                        for i in range(n - 1):
-                            if len(out) >= max_segments:
-                                meta['truncated'] = True
-                                break
-                            try:
-                                bulge = 0.0
-                                if i < len(poly_bulges):
-                                    bulge = float(poly_bulges[i] or 0.0)
-                                if bulge:
-                                    _bulge_to_arc(out, float(poly_xs[i]), float(poly_ys[i]), float(poly_xs[i + 1]), float(poly_ys[i + 1]), bulge, layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
-                                else:
-                                    _push_seg(out, poly_xs[i], poly_ys[i], poly_xs[i + 1], poly_ys[i + 1], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
-                            except Exception:
-                                _push_seg(out, poly_xs[i], poly_ys[i], poly_xs[i + 1], poly_ys[i + 1], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
-                        if (poly_flags & 1) == 1 and len(out) < max_segments:
-                            try:
-                                bulge_last = 0.0
-                                if (n - 1) < len(poly_bulges):
-                                    bulge_last = float(poly_bulges[n - 1] or 0.0)
-                                if bulge_last:
-                                    _bulge_to_arc(out, float(poly_xs[n - 1]), float(poly_ys[n - 1]), float(poly_xs[0]), float(poly_ys[0]), bulge_last, layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
-                                else:
-                                    _push_seg(out, poly_xs[n - 1], poly_ys[n - 1], poly_xs[0], poly_ys[0], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
-                            except Exception:
-                                _push_seg(out, poly_xs[n - 1], poly_ys[n - 1], poly_xs[0], poly_ys[0], layer=cur_layer, aci=cur_aci, rgb=cur_rgb)
-                    poly_active = False
-                    vertex_active = False
-                    poly_xs.clear()
-                    poly_ys.clear()
-                    poly_bulges.clear()
-                    poly_flags = 0
-                    vertex['x'] = vertex['y'] = None
-                    
-                def _flush_curve_entities():
-                    if cur_type == 'ARC':
-                        _flush_arc()
-                    elif cur_type == 'CIRCLE':
-                        _flush_circle()
-                    elif cur_type == 'ELLIPSE':
-                        _flush_ellipse()
-                    elif cur_type == 'SPLINE':
-                        _flush_spline()
-
-                def _flush_insert():
-                    nonlocal insert_active
-                    if not insert_active:
-                        return
-                    insert_active = False
-
-                    # If we are inside a BLOCK definition, keep the insert for later flattening (nested blocks).
-                    if in_blocks and current_block_inserts is not None:
-                        current_block_inserts.append(dict(insert_ent))
-                        return
-
-                    if not expand_inserts:
-                        return
-                    name = insert_ent.get('name')
-                    if not name:
-                        return
-                    # Fully flatten nested inserts inside this block for better fidelity.
-                    bsegs = _flatten_block(name)
-                    if not bsegs:
-                        return
-                    ix = insert_ent.get('x')
-                    iy = insert_ent.get('y')
-                    if ix is None or iy is None:
-                        return
-                    tmp_out: List[Tuple[float, float, float, float, int, Optional[str], Optional[int]]] = []
-                    _apply_insert_to_segs(bsegs, insert_ent, tmp_out, max_out=max_segments, allow_downsample=True)
-                    for (x0, y0, x1, y1, seg_rgb, seg_layer, seg_aci) in tmp_out:
-                        _push_seg(segs, x0, y0, x1, y1, layer=seg_layer, aci=seg_aci, rgb=seg_rgb)
-                    meta['insertsExpanded'] = int(meta.get('insertsExpanded') or 0) + 1
-
-                # Read DXF as text; ODA converter outputs ASCII DXF.
-                with open(dxf_path, 'r', encoding='utf-8', errors='ignore', newline='') as fp:
-                    for code_raw, val_raw in _iter_dxf_pairs(fp):
-                        if meta['truncated']:
-                            break
+                        pass
+                elif reply is not None:
+                    with reply:
+                        sent = reply.tell()
+                        reply.seek(0)
+                        self.send_response(status)
+                        self.send_header('Content-Type', 'application/json; charset=utf-8')
+                        self.send_header('Cache-Control', 'no-store')
+                        self.send_header('Content-Length', str(sent))
+                        self.end_headers()
                         try:
-                            code = int(str(code_raw).strip())
-                        except Exception:
-                            continue
-                        vtrim = str(val_raw).strip()
-
-                        if code == 0:
-                            # boundary
-                            if cur_type == 'LINE':
-                                _flush_line()
-                            if cur_type == 'LWPOLYLINE':
-                                _flush_lwpoly()
-                            if cur_type in ('ARC', 'CIRCLE', 'ELLIPSE', 'SPLINE'):
-                                _flush_curve_entities()
-                            if insert_active:
-                                _flush_insert()
-                            cur_type = None
-
-                            # Reset per-entity attributes
-                            cur_layer = None
-                            cur_aci = None
-                            cur_rgb = None
-                            cur_invisible = False
-                            cur_paperspace = False
-
-                            if vtrim == 'SECTION':
-                                expecting_section_name = True
-                                continue
-                            if vtrim == 'ENDSEC':
-                                in_entities = False
-                                in_blocks = False
-                                in_tables = False
-                                in_layer_table = False
-                                _flush_layer_table_record()
-                                expecting_section_name = False
-                                continue
-
-                            # TABLES parsing (minimal: LAYER colors)
-                            if in_tables:
-                                if vtrim == 'TABLE':
-                                    # Table name arrives as group 2
-                                    continue
-                                if vtrim == 'ENDTAB':
-                                    in_layer_table = False
-                                    _flush_layer_table_record()
-                                    continue
-                                if in_layer_table:
-                                    if vtrim == 'LAYER':
-                                        _flush_layer_table_record()
-                                        current_layer_name = None
-                                        current_layer_aci = None
-                                        current_layer_true = None
-                                    continue
-
-                            if in_blocks:
-                                if vtrim == 'BLOCK':
-                                    current_block_name = None
-                                    current_block_base = (0.0, 0.0)
-                                    current_block_segs = []
-                                    current_block_inserts = []
-                                    block_header_active = True
-                                elif vtrim == 'ENDBLK':
-                                    if current_block_name and current_block_segs is not None:
-                                        bx, by = current_block_base
-                                        if (bx != 0.0 or by != 0.0) and current_block_segs:
-                                            # normalize relative to base
-                                            norm = []
-                                            for (x0, y0, x1, y1, rgb, lyr, aci) in current_block_segs:
-                                                norm.append((x0 - bx, y0 - by, x1 - bx, y1 - by, rgb, lyr, aci))
-                                            current_block_segs = norm
-                                        blocks[current_block_name] = { 'base': current_block_base, 'segs': current_block_segs, 'inserts': (current_block_inserts or []) }
-                                    current_block_name = None
-                                    current_block_segs = None
-                                    current_block_base = (0.0, 0.0)
-                                    current_block_inserts = None
-                                    block_header_active = False
-
-                                # Inside block definitions, parse geometry similarly
-                                if vtrim in ('LINE', 'LWPOLYLINE', 'ARC', 'CIRCLE', 'ELLIPSE', 'SPLINE'):
-                                    cur_type = vtrim
-                                    block_header_active = False
-                                elif vtrim == 'POLYLINE':
-                                    poly_active = True
-                                    poly_xs.clear(); poly_ys.clear(); poly_flags = 0
-                                    poly_bulges.clear()
-                                    vertex_active = False
-                                    block_header_active = False
-                                elif vtrim == 'INSERT':
-                                    insert_active = True
-                                    insert_ent = { 'name': None, 'x': None, 'y': None, 'sx': 1.0, 'sy': 1.0, 'rot': 0.0, 'layer': None, 'aci': None, 'rgb': None }
-                                    block_header_active = False
-                                elif vtrim == 'VERTEX':
-                                    if poly_active:
-                                        vertex_active = True
-                                        vertex['x'] = None
-                                        vertex['y'] = None
-                                        vertex_bulge = None
-                                    block_header_active = False
-                                elif vtrim == 'SEQEND':
-                                    _flush_polyline()
-
-                            if in_entities:
-                                if vtrim == 'POLYLINE':
-                                    poly_active = True
-                                    poly_xs.clear(); poly_ys.clear(); poly_flags = 0
-                                    vertex_active = False
-                                elif vtrim == 'VERTEX':
-                                    if poly_active:
-                                        vertex_active = True
-                                        vertex['x'] = None
-                                        vertex['y'] = None
-                                elif vtrim == 'SEQEND':
-                                    _flush_polyline()
-
-                                if vtrim in ('LINE', 'LWPOLYLINE', 'ARC', 'CIRCLE', 'ELLIPSE', 'SPLINE'):
-                                    cur_type = vtrim
-                                elif vtrim == 'INSERT':
-                                    insert_active = True
-                                    insert_ent = { 'name': None, 'x': None, 'y': None, 'sx': 1.0, 'sy': 1.0, 'rot': 0.0, 'layer': None, 'aci': None, 'rgb': None }
-                                else:
-                                    cur_type = None
-
-                            continue
-
-                        if expecting_section_name:
-                            if code == 2:
-                                in_entities = (vtrim == 'ENTITIES')
-                                in_blocks = (vtrim == 'BLOCKS')
-                                in_tables = (vtrim == 'TABLES')
-                                in_layer_table = False
-                                _flush_layer_table_record()
-                                expecting_section_name = False
-                            continue
-
-                        # Parse layer table content when inside TABLES
-                        if in_tables:
-                            # Table name selection
-                            if code == 2 and vtrim == 'LAYER':
-                                in_layer_table = True
-                                _flush_layer_table_record()
-                                continue
-                            if not in_layer_table:
-                                continue
-                            # Within a LAYER record
-                            if code == 2:
-                                current_layer_name = vtrim
-                                continue
-                            if code == 62:
-                                current_layer_aci = _parse_int(vtrim)
-                                continue
-                            if code == 420:
-                                current_layer_true = _parse_int(vtrim)
-                                continue
-                            continue
-
-                        # Block header metadata (ONLY in the BLOCK header record).
-                        # IMPORTANT: do NOT consume entity coordinate codes (10/20) inside blocks.
-                        if in_blocks and current_block_segs is not None and block_header_active:
-                            if current_block_name is None and code == 2:
-                                current_block_name = vtrim
-                                continue
-                            if code == 10:
-                                x = _parse_float(vtrim)
-                                if x is not None:
-                                    current_block_base = (x, current_block_base[1])
-                                continue
-                            if code == 20:
-                                y = _parse_float(vtrim)
-                                if y is not None:
-                                    current_block_base = (current_block_base[0], y)
-                                continue
-
-                        if not in_entities and not in_blocks:
-                            continue
-
-                        # Common DXF entity attributes
-                        if code == 67:
-                            try:
-                                # 0=model space, 1=paper space
-                                cur_paperspace = (int(str(vtrim).strip() or '0') == 1)
-                                if cur_paperspace:
-                                    cur_invisible = True
-                            except Exception:
-                                pass
-                            continue
-                        if code == 410:
-                            try:
-                                # Layout name; treat non-Model layouts as paper space
-                                name = str(vtrim or '').strip()
-                                if name and name.lower() != 'model':
-                                    cur_paperspace = True
-                                    cur_invisible = True
-                            except Exception:
-                                pass
-                            continue
-                        if code == 8:
-                            cur_layer = vtrim
-                            if insert_active:
-                                insert_ent['layer'] = vtrim
-                            continue
-                        if code == 62:
-                            cur_aci = _parse_int(vtrim)
-                            try:
-                                if cur_aci is not None and int(cur_aci) < 0:
-                                    cur_invisible = True
-                            except Exception:
-                                pass
-                            if insert_active:
-                                insert_ent['aci'] = cur_aci
-                            continue
-                        if code == 420:
-                            cur_rgb = _parse_int(vtrim)
-                            if insert_active:
-                                insert_ent['rgb'] = cur_rgb
-                            continue
-
-                        if cur_type == 'LINE':
-                            if code == 10:
-                                line_ent['x0'] = _parse_float(vtrim)
-                            elif code == 20:
-                                line_ent['y0'] = _parse_float(vtrim)
-                            elif code == 11:
-                                line_ent['x1'] = _parse_float(vtrim)
-                            elif code == 21:
-                                line_ent['y1'] = _parse_float(vtrim)
-                            continue
-
-                        if cur_type == 'LWPOLYLINE':
-                            if code == 10:
-                                x = _parse_float(vtrim)
-                                if x is not None:
-                                    lw['xs'].append(x)
-                                    lw['bulges'].append(0.0)
-                            elif code == 20:
-                                y = _parse_float(vtrim)
-                                if y is not None:
-                                    lw['ys'].append(y)
-                            elif code == 70:
-                                n = _parse_int(vtrim)
-                                lw['flags'] = n or 0
-                            elif code == 42:
-                                # Bulge applies to the most recent vertex
-                                try:
-                                    b = _parse_float(vtrim)
-                                    if b is None:
-                                        continue
-                                    if lw['bulges'] and len(lw['bulges']) == len(lw['xs']):
-                                        lw['bulges'][-1] = float(b)
-                                except Exception:
-                                    pass
-                            continue
-
-                        if cur_type == 'ARC':
-                            if code == 10:
-                                arc_ent['cx'] = _parse_float(vtrim)
-                            elif code == 20:
-                                arc_ent['cy'] = _parse_float(vtrim)
-                            elif code == 40:
-                                arc_ent['r'] = _parse_float(vtrim)
-                            elif code == 50:
-                                try:
-                                    import math
-                                    d = _parse_float(vtrim)
-                                    arc_ent['a0'] = (float(d) * math.pi / 180.0) if d is not None else None
-                                except Exception:
-                                    arc_ent['a0'] = None
-                            elif code == 51:
-                                try:
-                                    import math
-                                    d = _parse_float(vtrim)
-                                    arc_ent['a1'] = (float(d) * math.pi / 180.0) if d is not None else None
-                                except Exception:
-                                    arc_ent['a1'] = None
-                            continue
-
-                        if cur_type == 'CIRCLE':
-                            if code == 10:
-                                circ_ent['cx'] = _parse_float(vtrim)
-                            elif code == 20:
-                                circ_ent['cy'] = _parse_float(vtrim)
-                            elif code == 40:
-                                circ_ent['r'] = _parse_float(vtrim)
-                            continue
-
-                        if cur_type == 'ELLIPSE':
-                            if code == 10:
-                                ellipse_ent['cx'] = _parse_float(vtrim)
-                            elif code == 20:
-                                ellipse_ent['cy'] = _parse_float(vtrim)
-                            elif code == 11:
-                                ellipse_ent['mx'] = _parse_float(vtrim)
-                            elif code == 21:
-                                ellipse_ent['my'] = _parse_float(vtrim)
-                            elif code == 40:
-                                ellipse_ent['ratio'] = _parse_float(vtrim)
-                            elif code == 41:
-                                ellipse_ent['t0'] = _parse_float(vtrim)
-                            elif code == 42:
-                                ellipse_ent['t1'] = _parse_float(vtrim)
-                            continue
-
-                        if cur_type == 'SPLINE':
-                            if code == 70:
-                                spline_ent['flags'] = _parse_int(vtrim) or 0
-                            elif code == 71:
-                                spline_ent['degree'] = _parse_int(vtrim)
-                            elif code == 40:
-                                k = _parse_float(vtrim)
-                                if k is not None:
-                                    spline_ent['knots'].append(float(k))
-                            elif code == 41:
-                                w = _parse_float(vtrim)
-                                if w is not None:
-                                    spline_ent['weights'].append(float(w))
-                            elif code == 10:
-                                x = _parse_float(vtrim)
-                                if x is not None:
-                                    spline_ent['ctrl'].append([float(x), 0.0])
-                            elif code == 20:
-                                y = _parse_float(vtrim)
-                                if y is not None and spline_ent['ctrl']:
-                                    spline_ent['ctrl'][-1][1] = float(y)
-                            elif code == 11:
-                                x = _parse_float(vtrim)
-                                if x is not None:
-                                    spline_ent['fit'].append([float(x), 0.0])
-                            elif code == 21:
-                                y = _parse_float(vtrim)
-                                if y is not None and spline_ent['fit']:
-                                    spline_ent['fit'][-1][1] = float(y)
-                            continue
-
-                        if insert_active:
-                            if code == 2:
-                                insert_ent['name'] = vtrim
-                            elif code == 10:
-                                insert_ent['x'] = _parse_float(vtrim)
-                            elif code == 20:
-                                insert_ent['y'] = _parse_float(vtrim)
-                            elif code == 41:
-                                insert_ent['sx'] = _parse_float(vtrim) or 1.0
-                            elif code == 42:
-                                insert_ent['sy'] = _parse_float(vtrim) or 1.0
-                            elif code == 50:
-                                insert_ent['rot'] = _parse_float(vtrim) or 0.0
-                            continue
-
-                        if poly_active:
-                            if not vertex_active:
-                                if code == 70:
-                                    poly_flags = _parse_int(vtrim) or 0
-                            else:
-                                if code == 10:
-                                    vertex['x'] = _parse_float(vtrim)
-                                elif code == 20:
-                                    vertex['y'] = _parse_float(vtrim)
-                                elif code == 42:
-                                    vertex_bulge = _parse_float(vtrim)
-                                vx = vertex.get('x')
-                                vy = vertex.get('y')
-                                if vx is not None and vy is not None:
-                                    # poly_xs/poly_ys are lists of floats
-                                    poly_xs.append(float(vx))
-                                    poly_ys.append(float(vy))
-                                    poly_bulges.append(float(vertex_bulge or 0.0))
-                                    vertex['x'] = None
-                                    vertex['y'] = None
-                                    vertex_bulge = None
-
-                # trailing flush
-                if cur_type == 'LINE':
-                    _flush_line()
-                if cur_type == 'LWPOLYLINE':
-                    _flush_lwpoly()
-                if cur_type in ('ARC', 'CIRCLE', 'ELLIPSE', 'SPLINE'):
-                    _flush_curve_entities()
-                if insert_active:
-                    _flush_insert()
-                if poly_active:
-                    _flush_polyline()
-
-                meta['segments'] = len(segs)
-                meta['blocks'] = len(blocks)
-                try:
-                    meta['colors'] = len({ int(s[4]) for s in segs if len(s) >= 5 })
-                except Exception:
-                    meta['colors'] = 0
-                return segs, meta
-
-            def _simplify_to_plan2d_elements(segs, *, units: str, max_walls: int, min_len_mm: float, quant_mm: float, thickness_m: float, level: int):
-                import math
-                scale_to_m = 0.001 if units == 'mm' else 1.0
-                q = float(quant_mm) if quant_mm and quant_mm > 0 else 10.0
-                min_len2 = float(min_len_mm) * float(min_len_mm)
-
-                def _qv(v: float) -> float:
-                    return round(v / q) * q
-
-                # Dedup on quantized integer-ish coords
-                seen = set()
-                cand = []  # tuples: (len2, x0,y0,x1,y1) in mm
-                for s in segs:
-                    try:
-                        x0, y0, x1, y1 = float(s[0]), float(s[1]), float(s[2]), float(s[3])
-                    except Exception:
-                        continue
-                    x0q = _qv(x0)
-                    y0q = _qv(y0)
-                    x1q = _qv(x1)
-                    y1q = _qv(y1)
-                    dx = x1q - x0q
-                    dy = y1q - y0q
-                    l2 = dx * dx + dy * dy
-                    if not (l2 == l2) or l2 < min_len2:
-                        continue
-                    ax0, ay0, ax1, ay1 = x0q, y0q, x1q, y1q
-                    if ax0 > ax1 or (ax0 == ax1 and ay0 > ay1):
-                        ax0, ax1 = ax1, ax0
-                        ay0, ay1 = ay1, ay0
-                    # Keep colors distinct in the dedupe key when present.
-                    rgb_key = None
-                    try:
-                        rgb_key = int(s[4]) if len(s) >= 5 and s[4] is not None else None
-                    except Exception:
-                        rgb_key = None
-                    key = (int(round(ax0)), int(round(ay0)), int(round(ax1)), int(round(ay1)), rgb_key)
-                    if key in seen:
-                        continue
-                    seen.add(key)
-                    cand.append((l2, x0q, y0q, x1q, y1q))
-
-                # Keep longest N
-                if max_walls and len(cand) > max_walls:
-                    import heapq
-                    heap = []
-                    for rec in cand:
-                        l2 = rec[0]
-                        if len(heap) < max_walls:
-                            heapq.heappush(heap, rec)
-                        else:
-                            if l2 > heap[0][0]:
-                                heapq.heapreplace(heap, rec)
-                    cand = heap
-
-                elements = []
-                for (_l2, x0q, y0q, x1q, y1q) in cand:
-                    elements.append({
-                        'type': 'wall',
-                        'x0': float(x0q) * scale_to_m,
-                        'y0': float(y0q) * scale_to_m,
-                        'x1': float(x1q) * scale_to_m,
-                        'y1': float(y1q) * scale_to_m,
-                        'thickness': float(thickness_m),
-                        'level': int(level),
-                        'manual': True
-                    })
-                return elements, { 'scaleToM': scale_to_m, 'quantMm': q, 'minLenMm': float(min_len_mm), 'dedup': len(seen) }
-
-            def _segments_to_plan2d_cad_elements(
-                segs,
-                *,
-                units: str,
-                thickness_m: float,
-                level: int,
-                weld_mm: float,
-                max_walls: int,
-                min_len_mm: float,
-                auto_clean: bool
-            ):
-                # 1:1 “CAD linework” import (hairline rendering, keeps colors/layers).
-                # Applies light simplification to avoid “scattered dots” and annotation clutter:
-                # - drop segments shorter than min_len_mm
-                # - keep at most max_walls longest segments
-                scale_to_m = 0.001 if units == 'mm' else 1.0
-                weld = float(weld_mm) if weld_mm and weld_mm > 0 else 0.0
-                elements = []
-                color_counts = {}
-                layer_counts = {}
-                # Dedup after optional weld (snap). Keeps colors distinct.
-                seen = set()
-
-                try:
-                    max_walls_i = int(max_walls) if max_walls is not None else 0
-                except Exception:
-                    max_walls_i = 0
-                if max_walls_i < 0:
-                    max_walls_i = 0
-                try:
-                    min_len = float(min_len_mm) if min_len_mm is not None else 0.0
-                except Exception:
-                    min_len = 0.0
-                if min_len < 0.0:
-                    min_len = 0.0
-                min_len2 = min_len * min_len
-
-                # Automatic cleanup of common non-floorplan layers (PDF underlay geometry, hatch, dimensions).
-                # Many DWGs are produced by PDF-to-DWG conversion and contain huge "PDF*_Geometry" layers
-                # that overwhelm the actual architectural layers.
-                drop_patterns = []
-                if auto_clean:
-                    try:
-                        import re
-                        drop_patterns = [
-                            re.compile(r'(?i)\bhatch\b'),
-                            re.compile(r'(?i)pdf\d*_geometry'),
-                            re.compile(r'(?i)\$0\$pdf'),
-                            re.compile(r'(?i)\bdefpoints\b'),
-                            re.compile(r'(?i)\bdim(ension)?\b'),
-                            re.compile(r'(?i)\btext\b'),
-                            re.compile(r'(?i)\banno(tation)?\b'),
-                        ]
-                    except Exception:
-                        drop_patterns = []
-
-                # Endpoint welding via neighborhood snapping (better than rounding).
-                # Uses a grid hash of size `weld` and snaps endpoints within radius.
-                point_cells = {}
-                def _snap_pt(x: float, y: float):
-                    if weld <= 0:
-                        return x, y
-                    try:
-                        import math
-                        cx = int(math.floor(x / weld))
-                        cy = int(math.floor(y / weld))
-                        best = None
-                        best_d2 = weld * weld
-                        for ox in (-1, 0, 1):
-                            for oy in (-1, 0, 1):
-                                key = (cx + ox, cy + oy)
-                                pts = point_cells.get(key)
-                                if not pts:
-                                    continue
-                                for (px, py) in pts:
-                                    dx = x - px
-                                    dy = y - py
-                                    d2 = dx * dx + dy * dy
-                                    if d2 <= best_d2:
-                                        best_d2 = d2
-                                        best = (px, py)
-                        if best is not None:
-                            return best[0], best[1]
-                        # New canonical point
-                        point_cells.setdefault((cx, cy), []).append((x, y))
-                        return x, y
-                    except Exception:
-                        return x, y
-
-                # First pass: apply weld (if any), dedup, and drop tiny segments.
-                kept = []
-                for s in segs:
+                            shutil.copyfileobj(reply, self.wfile, 1 << 20)
+                        except OSError:
+                            # The client is gone; the connection cannot carry another request.
+                            self.close_connection = True
+                else:
                     try:
-                        x0, y0, x1, y1 = float(s[0]), float(s[1]), float(s[2]), float(s[3])
+                        body = json.dumps(payload).encode('utf-8')
                     except Exception:
-                        continue
-
-                    if weld > 0:
-                        x0, y0 = _snap_pt(x0, y0)
-                        x1, y1 = _snap_pt(x1, y1)
-
-                    # Drop zero/very short segments (the "scattered dots" effect).
+                        body = b'{"error":"json-encode-failed"}'
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json; charset=utf-8')
+                    self.send_header('Cache-Control', 'no-store')
+                    self.end_headers()
+                    sent = len(body)
                     try:
-                        dx = x1 - x0
-                        dy = y1 - y0
-                        l2 = dx * dx + dy * dy
-                        if min_len2 > 0.0 and (not (l2 == l2) or l2 < min_len2):
-                            continue
+                        self.wfile.write(body)
                     except Exception:
                         pass
-
-                    try:
-                        rgb = int(s[4]) if len(s) >= 5 and s[4] is not None else 0x111111
-                    except Exception:
-                        rgb = 0x111111
-                    rgb = rgb & 0xFFFFFF
-
-                    layer = None
-                    try:
-                        layer = str(s[5]) if len(s) >= 6 and s[5] else None
-                    except Exception:
-                        layer = None
-
-                    # Dedup (order-invariant) after weld.
-                    is_dup = False
-                    try:
-                        ax0, ay0, ax1, ay1 = x0, y0, x1, y1
-                        if ax0 > ax1 or (ax0 == ax1 and ay0 > ay1):
-                            ax0, ax1 = ax1, ax0
-                            ay0, ay1 = ay1, ay0
-                        key = (round(ax0, 6), round(ay0, 6), round(ax1, 6), round(ay1, 6), int(rgb))
-                        if key in seen:
-                            is_dup = True
-                        else:
-                            seen.add(key)
-                    except Exception:
-                        is_dup = False
-
-                    if is_dup:
-                        continue
-
-                    kept.append((x0, y0, x1, y1, rgb, layer))
-
-                # Apply automatic layer cleanup if it seems safe.
-                cleaned_applied = False
-                dropped_by_layer = 0
-                if drop_patterns and kept:
-                    try:
-                        cleaned = []
-                        for rec in kept:
-                            _x0, _y0, _x1, _y1, _rgb, lyr = rec
-                            if not lyr:
-                                cleaned.append(rec)
-                                continue
-                            drop = False
-                            for pat in drop_patterns:
-                                try:
-                                    if pat.search(lyr):
-                                        drop = True
-                                        break
-                                except Exception:
-                                    continue
-                            if drop:
-                                dropped_by_layer += 1
-                                continue
-                            cleaned.append(rec)
-
-                        # Only apply if we still have a meaningful amount of geometry.
-                        if cleaned and (len(cleaned) >= 500 or len(cleaned) >= int(0.05 * len(kept))):
-                            kept = cleaned
-                            cleaned_applied = True
-                        else:
-                            dropped_by_layer = 0
-                    except Exception:
-                        cleaned_applied = False
-                        dropped_by_layer = 0
-
-                # If still too many, keep the longest max_walls_i segments.
-                if max_walls_i and len(kept) > max_walls_i:
-                    try:
-                        import heapq
-                        heap = []
-                        for rec in kept:
-                            x0, y0, x1, y1, rgb, layer = rec
-                            dx = x1 - x0
-                            dy = y1 - y0
-                            l2 = dx * dx + dy * dy
-                            if len(heap) < max_walls_i:
-                                heapq.heappush(heap, (l2, rec))
-                            else:
-                                if l2 > heap[0][0]:
-                                    heapq.heapreplace(heap, (l2, rec))
-                        kept = [h[1] for h in heap]
-                    except Exception:
-                        kept = kept[:max_walls_i]
-
-                for (x0, y0, x1, y1, rgb, layer) in kept:
-
-                    stroke = _rgb_int_to_hex(rgb)
-                    color_counts[stroke] = int(color_counts.get(stroke) or 0) + 1
-                    if layer:
-                        layer_counts[layer] = int(layer_counts.get(layer) or 0) + 1
-
-                    elements.append({
-                        'type': 'wall',
-                        'x0': x0 * scale_to_m,
-                        'y0': y0 * scale_to_m,
-                        'x1': x1 * scale_to_m,
-                        'y1': y1 * scale_to_m,
-                        # thickness is used for hit-testing; rendering is hairline for CAD elements.
-                        'thickness': float(thickness_m),
-                        'level': int(level or 0),
-                        'wallRole': 'nonroom',
-                        'manual': True,
-                        'meta': {
-                            'cad': True,
-                            'stroke': stroke,
-                            'layer': layer,
-                            'rgb': rgb
-                        }
-                    })
-
-                colors_top = []
-                try:
-                    colors_top = sorted(color_counts.items(), key=lambda kv: kv[1], reverse=True)[:40]
-                except Exception:
-                    colors_top = list(color_counts.items())[:40]
-                layers_top = []
-                try:
-                    layers_top = sorted(layer_counts.items(), key=lambda kv: kv[1], reverse=True)[:40]
-                except Exception:
-                    layers_top = list(layer_counts.items())[:40]
-
-                return elements, {
-                    'scaleToM': scale_to_m,
-                    'elements': len(elements),
-                    'weldMm': weld,
-                    'minLenMm': float(min_len),
-                    'maxWalls': int(max_walls_i) if max_walls_i else None,
-                    'autoClean': bool(auto_clean),
-                    'autoCleanApplied': bool(cleaned_applied),
-                    'autoCleanDropped': int(dropped_by_layer),
-                    'colorsTop': colors_top,
-                    'layersTop': layers_top
-                }
+                if tracker is not None:
+                    tracker.finish(None if status < 400 else str(payload.get('error') or 'error'))
+                if timings is not None:
+                    # The reply's own encode time only reaches the aggregates.
+                    timings.leave(outBytes=sent)
+                    _dwg_import_stats.add(timings, None if status < 400 else str(payload.get('error') or 'error'))
+
+            # Progress id in the body instead of the query string: the upload is already over.
+            if tracker is None and _dwg_progress is not None and isinstance(data, dict) and data.get('progressId'):
+                tracker = _dwg_progress.get(str(data.get('progressId')), create=True)
+
+            if not dwg_dxf or not dwg_plan2d:
+                message = 'DWG import pipeline unavailable.'
+                if _DWGIMPORT_IMPORT_ERROR:
+                    message += f" {_DWGIMPORT_IMPORT_ERROR}"
+                return _send_json(503, { 'error': 'dwg-import-disabled', 'message': message })
+            timings = dwg_timings.StageTimings()
 
             try:
                 if not isinstance(data, dict):
@@ -2545,35 +1234,39 @@ class NoCacheHandler(SimpleHTTPRequestHandler):
                 b64 = data.get('bytesBase64') or data.get('dwgBase64')
                 if not isinstance(b64, str) or not b64:
                     return _send_json(400, { 'error': 'bad-request', 'message': 'Missing bytesBase64 (or dwgBase64) for DWG input.' })
+                timings.enter('decode', inBytes=len(b64))
                 try:
                     raw_in = base64.b64decode(b64, validate=False)
                 except Exception as exc:
                     return _send_json(400, { 'error': 'bad-request', 'message': 'Invalid base64 payload.', 'detail': str(exc) })
+                timings.leave(outBytes=len(raw_in))
 
                 # Options tuned for "simple line" imports.
                 qs = parse_qs(urlparse(self.path).query)
 
                 mode = str(data.get('mode') or (qs.get('mode', ['cad'])[0] if qs else 'cad')).strip().lower()
-                if mode not in ('cad', 'simplified'):
+                if mode not in ('cad', 'simplified', 'instances'):
                     mode = 'cad'
+                # 'instances' is CAD linework with INSERTs returned as block references; same defaults as 'cad'.
+                cad_defaults = (mode != 'simplified')
                 units = str(data.get('units') or (qs.get('units', ['mm'])[0] if qs else 'mm')).lower()
                 if units not in ('mm', 'm'):
                     units = 'mm'
-                max_walls = int(data.get('maxWalls') or (qs.get('maxWalls', ['250000' if mode == 'cad' else '12000'])[0] if qs else ('250000' if mode == 'cad' else '12000')))
+                max_walls = int(data.get('maxWalls') or (qs.get('maxWalls', ['250000' if cad_defaults else '12000'])[0] if qs else ('250000' if cad_defaults else '12000')))
                 if max_walls <= 0:
-                    max_walls = 250000 if mode == 'cad' else 12000
-                min_len_mm = float(data.get('minLenMm') or (qs.get('minLenMm', ['0' if mode == 'cad' else '100'])[0] if qs else ('0' if mode == 'cad' else '100')))
+                    max_walls = 250000 if cad_defaults else 12000
+                min_len_mm = float(data.get('minLenMm') or (qs.get('minLenMm', ['0' if cad_defaults else '100'])[0] if qs else ('0' if cad_defaults else '100')))
                 if min_len_mm < 0:
                     min_len_mm = 0.0
-                quant_mm = float(data.get('quantMm') or (qs.get('quantMm', ['0' if mode == 'cad' else '20'])[0] if qs else ('0' if mode == 'cad' else '20')))
+                quant_mm = float(data.get('quantMm') or (qs.get('quantMm', ['0' if cad_defaults else '20'])[0] if qs else ('0' if cad_defaults else '20')))
                 if quant_mm < 0:
                     quant_mm = 0.0
                 # CAD drawings are hairline strokes; thickness here is for selection/hit-test.
-                thickness_m = float(data.get('thicknessM') or (0.02 if mode == 'cad' else 0.01))
+                thickness_m = float(data.get('thicknessM') or (0.02 if cad_defaults else 0.01))
                 level = int(data.get('level') or 0)
 
                 # Optional weld/snapping for CAD mode so endpoints align (in input units, mm preferred).
-                weld_mm = float(data.get('weldMm') or (1.0 if mode == 'cad' else 0.0))
+                weld_mm = float(data.get('weldMm') or (1.0 if cad_defaults else 0.0))
                 if weld_mm < 0:
                     weld_mm = 0.0
 
@@ -2584,14 +1277,90 @@ class NoCacheHandler(SimpleHTTPRequestHandler):
                 except Exception:
                     auto_clean = True
 
+                # Layer filters applied while parsing: lists or comma-separated strings of
+                # case-insensitive regexes. Without excludeLayers, autoClean supplies the defaults.
+                include_layers = dwg_layers.parse_layer_patterns(data.get('includeLayers') if 'includeLayers' in data else (qs.get('includeLayers', [None])[0] if qs else None))
+                exclude_layers = dwg_layers.parse_layer_patterns(data.get('excludeLayers') if 'excludeLayers' in data else (qs.get('excludeLayers', [None])[0] if qs else None))
+                default_exclude = (exclude_layers is None and auto_clean)
+                layer_filter = dwg_layers.LayerFilter(
+                    include_layers,
+                    dwg_layers.AUTO_CLEAN_PATTERNS if default_exclude else exclude_layers,
+                    default_exclude=default_exclude
+                ) or None
+
+                # Optional crop in drawing units: [xmin, ymin, xmax, ymax] or a polygon [[x, y], ...].
+                try:
+                    clip_region = dwg_clip.parse_clip(data.get('clip') if 'clip' in data else (qs.get('clip', [None])[0] if qs else None))
+                except (TypeError, ValueError) as exc:
+                    return _send_json(400, { 'error': 'bad-request', 'message': 'Invalid clip region.', 'detail': str(exc) })
+
                 # Segment parsing caps
-                max_segments = int(data.get('maxSegments') or (qs.get('maxSegments', ['750000' if mode == 'cad' else '300000'])[0] if qs else ('750000' if mode == 'cad' else '300000')))
+                max_segments = int(data.get('maxSegments') or (qs.get('maxSegments', ['750000' if cad_defaults else '300000'])[0] if qs else ('750000' if cad_defaults else '300000')))
                 if max_segments <= 0:
-                    max_segments = 750000 if mode == 'cad' else 300000
+                    max_segments = 750000 if cad_defaults else 300000
                 expand_inserts = bool(data.get('expandInserts') if 'expandInserts' in data else True)
-                max_insert_segs = int(data.get('maxInsertSegs') or (qs.get('maxInsertSegs', ['20000' if mode == 'cad' else '2500'])[0] if qs else ('20000' if mode == 'cad' else '2500')))
+                max_insert_segs = int(data.get('maxInsertSegs') or (qs.get('maxInsertSegs', ['20000' if cad_defaults else '2500'])[0] if qs else ('20000' if cad_defaults else '2500')))
                 if max_insert_segs <= 0:
-                    max_insert_segs = 20000 if mode == 'cad' else 2500
+                    max_insert_segs = 20000 if cad_defaults else 2500
+
+                # Binary DXF is smaller and skips text-to-float conversion. Only templates that use the
+                # {dxf_type} placeholder can switch output type (e.g. ODA: 'ACAD2013 {dxf_type} 0 1').
+                binary_dxf = str(os.environ.get('GABLOK_DWG2DXF_BINARY', '')).lower() in ('1', 'true', 'yes', 'on')
+                if 'binaryDxf' in data:
+                    binary_dxf = bool(data.get('binaryDxf'))
+                elif qs and 'binaryDxf' in qs:
+                    binary_dxf = str(qs.get('binaryDxf', ['0'])[0]).lower() in ('1', 'true', 'yes', 'on')
+
+                # NDJSON streaming: a header line now, preview batches of the segments parsed so far
+                # (meters, at most previewMax), then the elements in batches and a final meta line.
+                stream_ndjson = data.get('stream') if 'stream' in data else (qs.get('stream', ['0'])[0] if qs else '0')
+                if isinstance(stream_ndjson, str):
+                    stream_ndjson = stream_ndjson.lower() in ('1', 'true', 'yes', 'on')
+                stream_ndjson = bool(stream_ndjson) or ('application/x-ndjson' in str(self.headers.get('Accept') or ''))
+                stream_batch = max(100, min(100000, _number_option('streamBatch', data.get('streamBatch') or (qs.get('streamBatch', ['5000'])[0] if qs else '5000'), int)))
+                preview_max = max(0, _number_option('previewMax', data.get('previewMax') if data.get('previewMax') is not None else (qs.get('previewMax', ['100000'])[0] if qs else '100000'), int))
+                preview = { 'segs': None, 'sent': 0, 'total': 0, 'batches': 0 }
+                preview_scale = 0.001 if units == 'mm' else 1.0
+                if tracker is not None:
+                    tracker.enter('convert', len(raw_in))
+
+                def _stream_preview(store, _parse_meta):
+                    if store is not preview['segs']:
+                        # Re-parse (relaxed layer defaults): the earlier preview is stale.
+                        if preview['segs'] is not None and preview['sent']:
+                            _stream_line({ 'type': 'preview-reset' })
+                        preview['segs'] = store
+                        preview['sent'] = 0
+                    lo = preview['sent']
+                    hi = min(len(store), preview_max)
+                    if hi <= lo:
+                        return
+                    sc = preview_scale
+                    lines = [0.0] * (4 * (hi - lo))
+                    lines[0::4] = [round(v * sc, 3) for v in store.x0[lo:hi]]
+                    lines[1::4] = [round(v * sc, 3) for v in store.y0[lo:hi]]
+                    lines[2::4] = [round(v * sc, 3) for v in store.x1[lo:hi]]
+                    lines[3::4] = [round(v * sc, 3) for v in store.y1[lo:hi]]
+                    _stream_line({ 'type': 'preview', 'lines': lines, 'rgb': store.rgb[lo:hi].tolist(), 'segments': len(store) })
+                    preview['sent'] = hi
+                    preview['total'] += hi - lo
+                    preview['batches'] += 1
+
+                # Sampled parse callback (every N pairs, see dxf.dxf_to_segments): progress and previews.
+                def _on_parse(store, parse_meta):
+                    if tracker is not None:
+                        tracker.update(
+                            bytes_read=parse_meta.get('bytesRead'),
+                            segments=len(store),
+                            inserts=parse_meta.get('insertsExpanded'),
+                            curves=sum(int(parse_meta.get(k) or 0) for k in ('arcs', 'circles', 'ellipses', 'splines', 'bulgeArcs')),
+                            excluded=parse_meta.get('excludedEntities')
+                        )
+                    if stream_ndjson and preview_max > 0:
+                        _stream_preview(store, parse_meta)
+
+                if stream_ndjson:
+                    _stream_start({ 'type': 'header', 'ok': True, 'format': 'gablok-2d-plan', 'source': 'dwg', 'mode': mode, 'units': units, 'batch': stream_batch })
 
                 with tempfile.TemporaryDirectory(prefix='gablok-dwg-') as td:
                     in_dir = os.path.join(td, 'in')
@@ -2601,14 +1370,17 @@ class NoCacheHandler(SimpleHTTPRequestHandler):
 
                     in_path = os.path.join(in_dir, filename)
                     out_path = os.path.join(out_dir, 'out.dxf')
+                    timings.enter('write', inBytes=len(raw_in))
                     with open(in_path, 'wb') as f:
                         f.write(raw_in)
+                    timings.leave()
 
                     expanded = (cmd_tpl
                                 .replace('{in}', in_path)
                                 .replace('{out}', out_path)
                                 .replace('{in_dir}', in_dir)
-                                .replace('{out_dir}', out_dir))
+                                .replace('{out_dir}', out_dir)
+                                .replace('{dxf_type}', 'DXB' if binary_dxf else 'DXF'))
                     try:
                         args = shlex.split(expanded)
                     except Exception:
@@ -2616,6 +1388,7 @@ class NoCacheHandler(SimpleHTTPRequestHandler):
                     if not args or not args[0]:
                         return _send_json(500, { 'error': 'converter-misconfigured', 'message': f"{cmd_key} is empty after expansion." })
 
+                    timings.enter('convert', inBytes=len(raw_in))
                     try:
                         proc = subprocess.run(
                             args,
@@ -2630,6 +1403,7 @@ class NoCacheHandler(SimpleHTTPRequestHandler):
                         return _send_json(504, { 'error': 'converter-timeout', 'message': 'Conversion timed out.' })
                     except Exception as exc:
                         return _send_json(500, { 'error': 'converter-failed', 'message': 'Conversion failed to execute.', 'detail': str(exc) })
+                    timings.note(stdoutBytes=len(proc.stdout or b''), stderrBytes=len(proc.stderr or b''))
 
                     if proc.returncode != 0:
                         return _send_json(502, {
@@ -2644,7 +1418,7 @@ class NoCacheHandler(SimpleHTTPRequestHandler):
                         found = None
                         try:
                             for name in os.listdir(out_dir):
-                                if name.lower().endswith('.dxf'):
+                                if name.lower().endswith(('.dxf', '.dxb')):
                                     found = os.path.join(out_dir, name)
                                     break
                         except Exception:
@@ -2657,6 +1431,7 @@ class NoCacheHandler(SimpleHTTPRequestHandler):
                                 'stderr': (proc.stderr or b'')[:4000].decode('utf-8', errors='replace')
                             })
                         out_path = found
+                    timings.leave(outBytes=os.path.getsize(out_path))
 
                     # Curve tessellation controls (reduces "30 tiny lines" on big-radius arcs).
                     curve_radius_frac = float(data.get('curveRadiusFrac') or (qs.get('curveRadiusFrac', ['0.25'])[0] if qs else '0.25'))
@@ -2666,22 +1441,160 @@ class NoCacheHandler(SimpleHTTPRequestHandler):
                     spline_samples_per_ctrl = int(data.get('splineSamplesPerCtrl') or (qs.get('splineSamplesPerCtrl', ['4'])[0] if qs else '4'))
                     spline_samples_min = int(data.get('splineSamplesMin') or (qs.get('splineSamplesMin', ['16'])[0] if qs else '16'))
                     spline_samples_max = int(data.get('splineSamplesMax') or (qs.get('splineSamplesMax', ['256'])[0] if qs else '256'))
-
-                    segs, parse_meta = _dxf_to_segments(
-                        out_path,
-                        max_segments=max_segments,
-                        expand_inserts=expand_inserts,
-                        max_insert_segs=max_insert_segs,
-                        curve_radius_frac=curve_radius_frac,
-                        curve_max_chord=curve_max_chord,
-                        curve_min_segs=curve_min_segs,
-                        curve_max_segs=curve_max_segs,
-                        spline_samples_per_ctrl=spline_samples_per_ctrl,
-                        spline_samples_min=spline_samples_min,
-                        spline_samples_max=spline_samples_max,
-                    )
-                    if mode == 'cad':
-                        elements, simp_meta = _segments_to_plan2d_cad_elements(
+                    # Error-bounded tessellation: maximum chord deviation in drawing units, either given
+                    # directly (curveTolerance) or as paper millimetres at 1:curveToleranceScale.
+                    # Default 0.1 mm at 1:100 (0.2 mm for simplified). Requests that only set the legacy
+                    # curve*/spline* counts keep those heuristics.
+                    def _opt(name, default=None):
+                        if name in data:
+                            return data.get(name)
+                        return qs.get(name, [default])[0] if qs else default
+                    curve_tolerance = _opt('curveTolerance')
+                    if curve_tolerance is not None:
+                        curve_tolerance = _number_option('curveTolerance', curve_tolerance)
+                    elif _opt('curveToleranceMm') is not None or _opt('curveToleranceScale') is not None:
+                        curve_tolerance = _number_option('curveToleranceMm', _opt('curveToleranceMm') or (0.1 if cad_defaults else 0.2)) * _number_option('curveToleranceScale', _opt('curveToleranceScale') or 100)
+                        if units == 'm':
+                            curve_tolerance /= 1000.0
+                    elif any(_opt(k) is not None for k in ('curveRadiusFrac', 'curveMaxChordMm', 'curveMinSegs', 'curveMaxSegs', 'splineSamplesPerCtrl', 'splineSamplesMin', 'splineSamplesMax')):
+                        curve_tolerance = 0.0
+                    else:
+                        curve_tolerance = (10.0 if cad_defaults else 20.0) * (0.001 if units == 'm' else 1.0)
+                    if not (curve_tolerance > 0.0):
+                        curve_tolerance = 0.0
+                    # CAD modes: keep ARC/CIRCLE/ELLIPSE and bulges as analytic elements for the renderer.
+                    native_curves = _opt('nativeCurves', '0')
+                    if isinstance(native_curves, str):
+                        native_curves = native_curves.lower() in ('1', 'true', 'yes', 'on')
+                    native_curves = bool(native_curves) and mode != 'simplified'
+                    curves = [] if native_curves else None
+                    # CAD modes: join segments that share endpoints, layer and color into polylines.
+                    chain_polylines = _opt('chainPolylines', '0')
+                    if isinstance(chain_polylines, str):
+                        chain_polylines = chain_polylines.lower() in ('1', 'true', 'yes', 'on')
+                    chain_polylines = bool(chain_polylines)
+                    # CAD modes: merge collinear overlapping/touching pieces (tolerance in input units).
+                    # Opt-in, as it is the costliest CAD pass; a tolerance alone also turns it on.
+                    merge_collinear = _opt('mergeCollinear', '1' if _opt('mergeTolMm') is not None else '0')
+                    if isinstance(merge_collinear, str):
+                        merge_collinear = merge_collinear.lower() in ('1', 'true', 'yes', 'on')
+                    merge_tol_mm = _number_option('mergeTolMm', _opt('mergeTolMm', weld_mm or 1.0) or 0.0) if merge_collinear else 0.0
+                    if not (merge_tol_mm > 0.0):
+                        merge_tol_mm = 0.0
+                    # Tolerance-based simplification of the chained polylines (input units); implies chaining.
+                    simplify_tol_mm = _number_option('simplifyTolMm', _opt('simplifyTolMm', 0) or 0.0)
+                    if not (simplify_tol_mm > 0.0):
+                        simplify_tol_mm = 0.0
+                    simplify_method = str(_opt('simplifyMethod', 'dp') or 'dp').strip().lower()
+                    if simplify_method not in ('dp', 'vw'):
+                        simplify_method = 'dp'
+                    if simplify_tol_mm > 0.0:
+                        chain_polylines = True
+                    # CAD mode: index the linework in quadtree tiles and return it through the tiles endpoint.
+                    build_tiles = _opt('tiles', '0')
+                    if isinstance(build_tiles, str):
+                        build_tiles = build_tiles.lower() in ('1', 'true', 'yes', 'on')
+                    build_tiles = bool(build_tiles) and mode == 'cad' and _plan2d_tiles is not None
+                    # Coarser copies of the tiled linework for zoomed-out views (?lod=k on the tile URL).
+                    lod_levels = max(0, min(6, _number_option('lodLevels', _opt('lodLevels', 3) or 0, int))) if build_tiles else 0
+                    # Simplified mode: pair parallel wall faces into centerline walls with their thickness.
+                    pair_walls = _opt('pairWalls', '1')
+                    if isinstance(pair_walls, str):
+                        pair_walls = pair_walls.lower() in ('1', 'true', 'yes', 'on')
+                    pair_walls = bool(pair_walls) and mode == 'simplified'
+                    wall_min_mm = _number_option('wallMinMm', _opt('wallMinMm', 50.0) or 0.0)
+                    wall_max_mm = _number_option('wallMaxMm', _opt('wallMaxMm', 600.0) or 0.0)
+                    # ENTITIES parsing workers (opt-in, 1 = in-process); only large drawings are split into chunks.
+                    parse_workers = _number_option('parseWorkers', _opt('parseWorkers') or os.environ.get('GABLOK_DXF_PARSE_WORKERS') or 1, int)
+                    # RSS budget in MB (0 = none): above it, segment, weld and dedup columns spill to
+                    # memory-mapped files in the temp dir. Peak RSS per stage is reported either way.
+                    memory_budget_mb = max(0.0, _number_option('memoryBudgetMb', _opt('memoryBudgetMb', os.environ.get('GABLOK_IMPORT_MEMORY_MB') or 0) or 0.0))
+                    memory = dwg_memory.MemoryBudget(memory_budget_mb, spill_dir=td) if dwg_memory is not None else None
+                    low_memory['on'] = memory_budget_mb > 0.0
+                    # With a budget, CAD elements built over it leave in batches instead of one list
+                    # (not with tiles, which index them all): as 'elements' lines when streaming,
+                    # else into a temp file the reply is copied from.
+                    emit = None
+                    emitted = { 'count': 0, 'batches': 0 }
+                    element_spill = None
+                    if memory is not None and memory.bounded and mode != 'simplified' and not build_tiles:
+                        if not stream_ndjson:
+                            element_spill = dwg_memory.ElementSpill(td)
+
+                        def emit(batch):
+                            if element_spill is not None:
+                                element_spill(batch)
+                            else:
+                                for i in range(0, len(batch), stream_batch):
+                                    _stream_line({ 'type': 'elements', 'elements': batch[i:i + stream_batch] })
+                                    emitted['batches'] += 1
+                            emitted['count'] += len(batch)
+
+                    curve_opts = {
+                        'curve_radius_frac': curve_radius_frac,
+                        'curve_max_chord': curve_max_chord,
+                        'curve_min_segs': curve_min_segs,
+                        'curve_max_segs': curve_max_segs,
+                        'spline_samples_per_ctrl': spline_samples_per_ctrl,
+                        'spline_samples_min': spline_samples_min,
+                        'spline_samples_max': spline_samples_max,
+                        'curve_tolerance': curve_tolerance,
+                    }
+                    block_defs, block_instances, instances_meta = None, None, None
+                    if tracker is not None:
+                        tracker.enter('parse', os.path.getsize(out_path))
+                    if memory is not None:
+                        memory.enter('parse')
+                    timings.enter('parse', inBytes=os.path.getsize(out_path))
+
+                    def _parse_done(store, parse_meta):
+                        timings.leave(outItems=len(store))
+                        # Parts of the parse, timed by the parser itself.
+                        parts = parse_meta.get('parseTimes') or {}
+                        timings.add('parse.tessellate', parts.get('tessellateMs') or 0.0)
+                        timings.add('parse.flatten', parts.get('flattenMs') or 0.0)
+                    if mode == 'instances' and expand_inserts:
+                        segs, dxf_blocks, dxf_inserts, parse_meta = dwg_dxf.dxf_to_block_instances(
+                            out_path,
+                            max_segments=max_segments,
+                            workers=parse_workers,
+                            layer_filter=layer_filter,
+                            clip=clip_region,
+                            curves=curves,
+                            progress=(_on_parse if tracker is not None or (stream_ndjson and preview_max > 0) else None),
+                            **curve_opts
+                        )
+                        if tracker is not None:
+                            tracker.enter('flatten')
+                        if memory is not None:
+                            memory.enter('flatten')
+                        _parse_done(segs, parse_meta)
+                        timings.enter('flatten', inItems=len(dxf_inserts))
+                        block_defs, block_instances, instances_meta = dwg_plan2d.block_instances_to_plan2d(
+                            dxf_blocks,
+                            dxf_inserts,
+                            units=units
+                        )
+                        timings.leave(outItems=len(block_instances))
+                    else:
+                        segs, parse_meta = dwg_dxf.dxf_to_segments(
+                            out_path,
+                            max_segments=max_segments,
+                            expand_inserts=expand_inserts,
+                            max_insert_segs=max_insert_segs,
+                            workers=parse_workers,
+                            layer_filter=layer_filter,
+                            clip=clip_region,
+                            curves=curves,
+                            progress=(_on_parse if tracker is not None or (stream_ndjson and preview_max > 0) else None),
+                            **curve_opts
+                        )
+                        _parse_done(segs, parse_meta)
+                    if tracker is not None:
+                        tracker.enter('simplify')
+                        tracker.update(segments=len(segs))
+                    if mode != 'simplified':
+                        elements, simp_meta = dwg_plan2d.segments_to_plan2d_cad_elements(
                             segs,
                             units=units,
                             thickness_m=thickness_m,
@@ -2689,20 +1602,71 @@ class NoCacheHandler(SimpleHTTPRequestHandler):
                             weld_mm=weld_mm,
                             max_walls=max_walls,
                             min_len_mm=min_len_mm,
-                            auto_clean=auto_clean
+                            # The parse-time layer filter (relaxed or not) already did the cleanup.
+                            auto_clean=(auto_clean and layer_filter is None),
+                            chain=chain_polylines,
+                            merge_tol=merge_tol_mm,
+                            simplify_tol=simplify_tol_mm,
+                            simplify_method=simplify_method,
+                            memory=memory,
+                            timings=timings,
+                            emit=emit
                         )
+                        if curves is not None:
+                            if memory is not None:
+                                memory.enter('curves')
+                            timings.enter('curves', inItems=len(curves))
+                            curve_elements, curves_meta = dwg_plan2d.curves_to_plan2d_elements(
+                                curves,
+                                units=units,
+                                thickness_m=thickness_m,
+                                level=level
+                            )
+                            timings.leave(outItems=len(curve_elements))
+                            if emitted['count']:
+                                emit(curve_elements)
+                            else:
+                                elements.extend(curve_elements)
+                            simp_meta['curves'] = curves_meta
                     else:
-                        elements, simp_meta = _simplify_to_plan2d_elements(
+                        if memory is not None:
+                            memory.enter('simplify')
+                        timings.enter('simplify', inItems=len(segs))
+                        elements, simp_meta = dwg_plan2d.simplify_to_plan2d_elements(
                             segs,
                             units=units,
                             max_walls=max_walls,
                             min_len_mm=min_len_mm,
                             quant_mm=quant_mm,
                             thickness_m=thickness_m,
-                            level=level
+                            level=level,
+                            pair_walls=pair_walls,
+                            wall_min_mm=wall_min_mm,
+                            wall_max_mm=wall_max_mm
                         )
-
-                    return _send_json(200, {
+                        timings.leave(outItems=len(elements))
+
+                    tiles_meta = None
+                    if build_tiles:
+                        if memory is not None:
+                            memory.enter('tiles')
+                        timings.enter('tiles', inItems=len(elements))
+                        layer_classes = simp_meta.get('layerClasses') or {}
+                        tile_index = dwg_tiles.build_tile_index(
+                            elements,
+                            lod_levels=lod_levels,
+                            coarse_layers=[name for (name, info) in layer_classes.items() if info.get('class') in ('hatch', 'underlay')]
+                        )
+                        import_id = _plan2d_tiles.put(tile_index)
+                        tiles_meta = tile_index.describe()
+                        tiles_meta['import'] = import_id
+                        tiles_meta['url'] = '/api/plan2d/tiles/' + import_id + '/{z}/{x}/{y}'
+                        tiles_meta['lodUrl'] = tiles_meta['url'] + '?lod={lod}'
+                        # The CAD linework is served by tile; anything else stays inline.
+                        elements = [el for el in elements if not (isinstance(el, dict) and (el.get('meta') or {}).get('cad'))]
+                        timings.leave(outItems=len(elements), tiles=int(tiles_meta.get('tiles') or 0))
+
+                    result = {
                         'ok': True,
                         'format': 'gablok-2d-plan',
                         'elements': elements,
@@ -2714,7 +1678,56 @@ class NoCacheHandler(SimpleHTTPRequestHandler):
                             'simplify': simp_meta,
                             'generatedAt': int(time.time() * 1000)
                         }
-                    })
+                    }
+                    if tiles_meta is not None:
+                        result['meta']['tiles'] = tiles_meta
+                    if block_defs is not None:
+                        result['blocks'] = block_defs
+                        result['instances'] = block_instances
+                        result['meta']['instances'] = instances_meta
+                    if stream_ndjson:
+                        if tracker is not None:
+                            tracker.enter('encode')
+                            tracker.update(elements=emitted['count'] + len(elements))
+                        result['meta']['stream'] = {
+                            'previewSegments': preview['total'],
+                            'previewBatches': preview['batches'],
+                            'elementBatches': emitted['batches'] + (len(elements) + stream_batch - 1) // stream_batch
+                        }
+                        if memory is not None:
+                            memory.enter('encode')
+                        timings.enter('encode', inItems=len(elements))
+                        sent = 0
+                        for i in range(0, len(elements), stream_batch):
+                            sent += _stream_line({ 'type': 'elements', 'elements': elements[i:i + stream_batch] })
+                        if block_defs is not None:
+                            sent += _stream_line({ 'type': 'blocks', 'blocks': block_defs, 'instances': block_instances })
+                        timings.leave(outBytes=sent)
+                        if memory is not None:
+                            result['meta']['memory'] = memory.describe()
+                            memory.close()
+                        result['meta']['timings'] = timings.describe()
+                        _stream_line({ 'type': 'meta', 'meta': result['meta'] })
+                        _stream_end()
+                        if tracker is not None:
+                            tracker.finish()
+                        _dwg_import_stats.add(timings)
+                        return
+                    if tracker is not None:
+                        tracker.update(elements=emitted['count'] + len(elements))
+                    if memory is not None:
+                        # The body is encoded after this, so its peak is only reported when streaming.
+                        result['meta']['memory'] = memory.describe()
+                        memory.close()
+                    result['meta']['timings'] = timings.describe()
+                    if element_spill is not None:
+                        try:
+                            return _send_json(200, result, spill=(element_spill if element_spill.count else None))
+                        finally:
+                            element_spill.close()
+                    return _send_json(200, result)
+            except _BadOption as exc:
+                return _send_json(400, { 'error': 'bad-request', 'message': str(exc), 'option': exc.name })
             except Exception as exc:
                 return _send_json(500, { 'error': 'dwg-to-plan2d-failed', 'message': str(exc) })
 
@@ -2801,12 +1814,14 @@ class NoCacheHandler(SimpleHTTPRequestHandler):
 
                     # Expand placeholders
                     # Supported placeholders:
-                    #  {in} {out} {in_dir} {out_dir}
+                    #  {in} {out} {in_dir} {out_dir} {dxf_type}
+                    # The client parses the returned DXF as text, so {dxf_type} is always ASCII here.
                     expanded = (cmd_tpl
                                 .replace('{in}', in_path)
                                 .replace('{out}', out_path)
                                 .replace('{in_dir}', in_dir)
-                                .replace('{out_dir}', out_dir))
+                                .replace('{out_dir}', out_dir)
+                                .replace('{dxf_type}', 'DXF'))
                     try:
                         args = shlex.split(expanded)
                     except Exception: